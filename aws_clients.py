@@ -0,0 +1,71 @@
+"""
+Process-wide boto3 client registry shared by the video reader tools.
+
+Building a client costs tens of milliseconds and each one owns its own
+connection pool, so clients are created once per (service, region, profile)
+and reused. boto3 clients are thread-safe; Sessions are not, so creation
+happens under a lock.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+_max_pool_connections = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+
+_sessions: Dict[Tuple[str, Optional[str]], boto3.Session] = {}
+_clients: Dict[Tuple[str, str, Optional[str]], Any] = {}
+_lock = threading.Lock()
+
+
+def get_session(region: Optional[str] = None, profile: Optional[str] = None) -> boto3.Session:
+    """Return the shared boto3 Session for (region, profile)."""
+    region = region or os.getenv('AWS_REGION', 'us-west-2')
+    profile = profile or os.getenv('AWS_PROFILE')
+    key = (region, profile)
+
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = boto3.Session(region_name=region, profile_name=profile)
+            _sessions[key] = session
+        return session
+
+
+def get_client(service: str, region: Optional[str] = None, profile: Optional[str] = None) -> Any:
+    """Return the shared client for (service, region, profile), creating it on first use."""
+    region = region or os.getenv('AWS_REGION', 'us-west-2')
+    profile = profile or os.getenv('AWS_PROFILE')
+    key = (service, region, profile)
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    session = get_session(region, profile)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = session.client(
+                service,
+                config=Config(max_pool_connections=_max_pool_connections)
+            )
+            _clients[key] = client
+        return client
+
+
+def set_max_pool_connections(size: int) -> None:
+    """Change the connection pool size for clients created from now on."""
+    global _max_pool_connections
+    with _lock:
+        _max_pool_connections = size
+        _clients.clear()
+
+
+def clear_clients() -> None:
+    """Drop all cached sessions and clients (e.g. after credentials change)."""
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
@@ -0,0 +1,131 @@
+"""
+Bedrock ConverseStream helpers for the video reader tools.
+
+The streaming tools yield the model's text as it is generated instead of
+waiting for the whole answer. boto3's event stream is blocking, so it is read
+on a worker thread and handed to the tool's event loop through a queue.
+Time-to-first-token and the usage/latency numbers from the stream's metadata
+event are collected for the Technical Details.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+
+
+def converse_stream_events(
+    client,
+    model_id: str,
+    system_prompt: str,
+    content: List[Dict[str, Any]]
+) -> Iterator[Tuple[str, Any]]:
+    """
+    One ConverseStream call as ("delta", text) events, then one ("metrics", dict).
+
+    The metrics dict holds time_to_first_token_s, total_s, stop_reason,
+    input_tokens, output_tokens, total_tokens and latency_ms (server side).
+    """
+    started = time.monotonic()
+    response = client.converse_stream(
+        modelId=model_id,
+        messages=[{"role": "user", "content": content}],
+        system=[{"text": system_prompt}]
+    )
+
+    first_token_s = None
+    stop_reason = None
+    usage: Dict[str, Any] = {}
+    server_metrics: Dict[str, Any] = {}
+    stream = response['stream']
+    try:
+        for event in stream:
+            if 'contentBlockDelta' in event:
+                text = event['contentBlockDelta']['delta'].get('text')
+                if text:
+                    if first_token_s is None:
+                        first_token_s = time.monotonic() - started
+                    yield 'delta', text
+            elif 'messageStop' in event:
+                stop_reason = event['messageStop'].get('stopReason')
+            elif 'metadata' in event:
+                usage = event['metadata'].get('usage', {})
+                server_metrics = event['metadata'].get('metrics', {})
+    finally:
+        # Also runs when the caller stops early: release the HTTP connection
+        if hasattr(stream, 'close'):
+            stream.close()
+
+    yield 'metrics', {
+        'time_to_first_token_s': first_token_s,
+        'total_s': time.monotonic() - started,
+        'stop_reason': stop_reason,
+        'input_tokens': usage.get('inputTokens'),
+        'output_tokens': usage.get('outputTokens'),
+        'total_tokens': usage.get('totalTokens'),
+        'latency_ms': server_metrics.get('latencyMs'),
+    }
+
+
+async def aconverse_stream_events(
+    client,
+    model_id: str,
+    system_prompt: str,
+    content: List[Dict[str, Any]]
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Async version of converse_stream_events that keeps the event loop free.
+
+    When the consumer stops iterating (break, cancellation, an exception), the
+    worker thread stops reading at the next event and closes the stream.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stopped.set()  # Event loop already closed
+
+    def pump() -> None:
+        events = converse_stream_events(client, model_id, system_prompt, content)
+        try:
+            for event in events:
+                if stopped.is_set():
+                    break
+                put(event)
+        except Exception as e:
+            put(('error', e))
+        finally:
+            events.close()
+            put(done)
+
+    threading.Thread(target=pump, name="converse-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if item[0] == 'error':
+                raise item[1]
+            yield item
+    finally:
+        stopped.set()
+
+
+def format_stream_details(metrics: Dict[str, Any]) -> str:
+    """Technical Details lines for a streamed call."""
+    ttft = metrics.get('time_to_first_token_s')
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a (no text)"
+    lines = [
+        f"- Streaming: first token after {ttft_text}, complete after {metrics['total_s']:.2f}s",
+    ]
+    if metrics.get('total_tokens') is not None:
+        lines.append(
+            f"- Tokens: {metrics['input_tokens']} in / {metrics['output_tokens']} out "
+            f"({metrics['total_tokens']} total)"
+        )
+    if metrics.get('latency_ms') is not None:
+        lines.append(f"- Bedrock Latency: {metrics['latency_ms']}ms")
+    return "\n".join(lines)
@@ -0,0 +1,456 @@
+# bench_meds_db.py - Synthetic meds.db generator and SQL benchmark runner
+#
+# generate: fills a database with the app's schema, a medication list and years of
+#           dose_logs with realistic timing (scheduled hours, jitter, missed doses,
+#           as-needed meds, later weekend mornings), ending now.
+# run:      times every SQL statement the Streamlit app, the MCP servers and the
+#           health planner issue, shows each query plan and writes a regression report.
+#           The database is opened read-only; INSERTs are only timed with --writes.
+#
+# Usage:
+#   python bench_meds_db.py generate --db /tmp/meds_1m.db --medications 40 --doses 1000000
+#   python bench_meds_db.py run --db /tmp/meds_1m.db --json before.json
+#   sqlite3 /tmp/meds_1m.db "CREATE INDEX ..."   # try a schema change
+#   python bench_meds_db.py run --db /tmp/meds_1m.db --compare before.json --max-regression 10
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+import file_mcp_server
+import health_planner
+import med_names
+import meds_store
+from context_builder import window_start
+
+# name, dosage, frequency, daily dose hours (None = as needed)
+MEDICATION_CATALOG = [
+    ("Metformin", "500mg", "Twice daily", [8, 20]),
+    ("Lisinopril", "10mg", "Once daily", [8]),
+    ("Atorvastatin", "20mg", "Once daily at bedtime", [22]),
+    ("Levothyroxine", "50mcg", "Once daily in the morning", [7]),
+    ("Amlodipine", "5mg", "Once daily", [9]),
+    ("Omeprazole", "20mg", "Once daily before breakfast", [7]),
+    ("Vitamin D3", "1000 IU", "Once daily", [12]),
+    ("Sertraline", "50mg", "Once daily", [9]),
+    ("Gabapentin", "300mg", "Three times daily", [8, 14, 20]),
+    ("Amoxicillin", "500mg", "Every 8 hours", [6, 14, 22]),
+    ("Insulin Glargine", "20 units", "Once daily at bedtime", [21]),
+    ("Losartan", "50mg", "Once daily", [8]),
+    ("Ibuprofen", "200mg", "As needed", None),
+    ("Acetaminophen", "500mg", "Every 6 hours as needed", None),
+    ("Albuterol", "90mcg", "As needed", None),
+]
+PRN_DOSES_PER_DAY = 1.2
+PLAN_GOALS = ["Lower blood pressure", "Manage diabetes", "Lose weight", "Sleep better"]
+
+
+# --- generate ---
+
+def create_schema(conn):
+    """Same tables as med_tracker.init_db"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS medications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            dosage TEXT,
+            frequency TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dose_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            medication_id INTEGER,
+            taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (medication_id) REFERENCES medications (id)
+        )
+    """)
+    med_names.ensure_schema(conn)
+
+
+def build_medications(rng, count, max_days):
+    """Medication profiles; most run for the whole history, some start later"""
+    medications = []
+    for i in range(count):
+        name, dosage, frequency, hours = MEDICATION_CATALOG[i % len(MEDICATION_CATALOG)]
+        if i >= len(MEDICATION_CATALOG):
+            name = f"{name} {i // len(MEDICATION_CATALOG) + 1}"
+        medications.append({
+            "name": name,
+            "dosage": dosage,
+            "frequency": frequency,
+            "hours": hours,
+            "adherence": rng.uniform(0.75, 0.98),
+            # days before today the medication was added
+            "start_back": max_days if rng.random() < 0.7 else rng.randint(7, max_days),
+        })
+    return medications
+
+
+def expected_daily_doses(med):
+    if med["hours"] is None:
+        return PRN_DOSES_PER_DAY
+    return len(med["hours"]) * med["adherence"]
+
+
+def history_days(medications, doses, max_days):
+    """Days of history needed for about `doses` rows, given when each medication starts"""
+    total = 0.0
+    for days_back in range(max_days):
+        total += sum(expected_daily_doses(m) for m in medications if m["start_back"] > days_back)
+        if total >= doses:
+            return days_back + 1
+    return max_days
+
+
+def day_doses(rng, med, day):
+    """Dose times for one medication on one day"""
+    weekend = day.weekday() >= 5
+    if med["hours"] is None:
+        # As needed: Poisson count at random waking hours
+        count, threshold, p = 0, math.exp(-PRN_DOSES_PER_DAY), rng.random()
+        while p > threshold:
+            count += 1
+            p *= rng.random()
+        minutes = sorted(rng.randint(7 * 60, 23 * 60) for _ in range(count))
+    else:
+        minutes = []
+        for hour in med["hours"]:
+            if rng.random() > med["adherence"]:
+                continue  # missed
+            shift = 60 if weekend and hour < 11 else 0
+            minute = int(rng.gauss(hour * 60 + shift, 25))
+            minutes.append(min(max(minute, 0), 24 * 60 - 1))
+    start = datetime.datetime.combine(day, datetime.time())
+    return [start + datetime.timedelta(minutes=m, seconds=rng.randint(0, 59)) for m in minutes]
+
+
+def generate(args):
+    if os.path.exists(args.db):
+        if not args.force:
+            sys.exit(f"{args.db} exists; pass --force to replace it")
+        os.remove(args.db)
+
+    rng = random.Random(args.seed)
+    max_days = int(args.years * 365)
+    medications = build_medications(rng, args.medications, max_days)
+    days = args.days or history_days(medications, args.doses, max_days)
+    if not args.days and days == max_days:
+        print(f"History capped at {args.years:g} years; raise --medications or --years to reach {args.doses} doses")
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    first_day = now.date() - datetime.timedelta(days=days - 1)
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    create_schema(conn)
+
+    for med in medications:
+        start_day = max(first_day, now.date() - datetime.timedelta(days=med["start_back"] - 1))
+        med["start_day"] = start_day
+        created = datetime.datetime.combine(start_day, datetime.time(7)) - datetime.timedelta(minutes=rng.randint(0, 600))
+        med["id"] = conn.execute(
+            "INSERT INTO medications (name, dosage, frequency, created_at) VALUES (?, ?, ?, ?)",
+            (med["name"], med["dosage"], med["frequency"], created.strftime("%Y-%m-%d %H:%M:%S")),
+        ).lastrowid
+    med_names.refresh(conn)
+
+    # Rows go in day by day so ids follow time, as they do when doses are logged live.
+    # The history always runs up to now, so the row count lands near --doses, not on it.
+    started = time.perf_counter()
+    inserted, batch = 0, []
+    day = first_day
+    while day <= now.date():
+        rows = []
+        for med in medications:
+            if day >= med["start_day"]:
+                rows.extend((t, med["id"]) for t in day_doses(rng, med, day) if t <= now)
+        rows.sort()
+        batch.extend((med_id, t.strftime("%Y-%m-%d %H:%M:%S")) for t, med_id in rows)
+        if len(batch) >= 50000:
+            conn.executemany("INSERT INTO dose_logs (medication_id, taken_at) VALUES (?, ?)", batch)
+            inserted += len(batch)
+            batch = []
+        day += datetime.timedelta(days=1)
+    conn.executemany("INSERT INTO dose_logs (medication_id, taken_at) VALUES (?, ?)", batch)
+    inserted += len(batch)
+    conn.commit()
+    conn.close()
+
+    plans = 0
+    if args.plans:
+        # The planner creates health_plans and its index; one real plan per goal
+        # supplies the step lists, the rest are bulk-inserted with random progress
+        planner = health_planner.HealthPlanner(db_path=args.db)
+        goal_steps = {goal: planner.create_plan("user_1", goal, "")["steps"] for goal in PLAN_GOALS}
+        rows = []
+        for _ in range(args.plans - len(PLAN_GOALS)):
+            goal = rng.choice(PLAN_GOALS)
+            steps = goal_steps[goal]
+            completed = sorted(rng.sample(range(len(steps)), rng.randint(0, len(steps))))
+            next_step = next((s for s in range(len(steps)) if s not in completed), len(steps))
+            rows.append((f"user_{rng.randint(1, args.users)}", goal, json.dumps(steps), json.dumps(completed),
+                         next_step, int(len(completed) / len(steps) * 100), now.strftime("%Y-%m-%d")))
+        conn = sqlite3.connect(args.db)
+        conn.executemany(
+            "INSERT INTO health_plans (user_id, goal, steps, completed_steps, next_step, progress, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+        conn.close()
+        plans = len(rows) + len(goal_steps)
+
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(args.db) / (1024 * 1024)
+    print(f"Generated {args.db}: {len(medications)} medications, {inserted} doses over {days} days "
+          f"({first_day} .. {now.date()}), {plans} plans, {size_mb:.1f}MB in {elapsed:.1f}s")
+
+
+# --- run ---
+
+def log_cutoff(days):
+    """The cutoff get_medication_logs computes for `days`"""
+    return (window_start(days).isoformat(),)
+
+
+# name, callers, SQL, params(context) -> tuple, writes
+QUERIES = [
+    ("medications", "MedsStore.medications (dashboard, medications tab, symptoms tab, status)",
+     meds_store.MEDICATIONS_SQL, None, False),
+    ("doses_today", "MedsStore.dose_stats (dashboard, status)",
+     meds_store.DOSES_TODAY_SQL, None, False),
+    ("missed_today_not_in", "MedsStore.dose_stats (dashboard)",
+     meds_store.MISSED_TODAY_SQL, None, False),
+    ("tracking_days", "MedsStore.dose_stats (status)",
+     meds_store.TRACKING_DAYS_SQL, None, False),
+    ("recent_activity", "MedsStore.dose_stats (dashboard)",
+     meds_store.RECENT_DOSES_SQL, None, False),
+    ("logs_7_days", "get_medication_logs, FileMCPClient._get_local_logs",
+     file_mcp_server.RECENT_LOGS_SQL, lambda ctx: log_cutoff(7), False),
+    ("logs_30_days", "get_medication_logs(days=30)",
+     file_mcp_server.RECENT_LOGS_SQL, lambda ctx: log_cutoff(30), False),
+    ("active_medications", "check_medication_schedule, get_active_medications, _get_local_schedule",
+     file_mcp_server.SCHEDULE_SQL, None, False),
+    ("missed_today_not_exists", "check_medication_schedule",
+     file_mcp_server.MISSED_TODAY_SQL, None, False),
+    ("report_medications", "export_health_report, _export_local_report",
+     file_mcp_server.REPORT_MEDICATIONS_SQL, None, False),
+    ("report_dose_history", "export_health_report, _export_local_report",
+     file_mcp_server.DOSE_HISTORY_SQL, None, False),
+    ("log_dose_lookup", "log_dose, Add to My Meds dedup",
+     med_names.EXACT_SQL, lambda ctx: (med_names.normalize_name(ctx["medication_name"]),), False),
+    ("log_dose_partial", "log_dose (no exact match)",
+     med_names.PARTIAL_FTS_SQL, lambda ctx: (med_names.fts_query(med_names.normalize_name(ctx["medication_name"])[1:]),),
+     False),
+    ("log_dose_insert", "log_dose, med_tracker Taken buttons",
+     "INSERT INTO dose_logs (medication_id) VALUES (?)", lambda ctx: (ctx["medication_id"],), True),
+    ("add_medication", "med_tracker add form, Add to My Meds",
+     "INSERT INTO medications (name, dosage, frequency) VALUES (?, ?, ?)",
+     lambda ctx: ("Benchmark Med", "10mg", "Once daily"), True),
+    ("plan_suggestion", "HealthPlanner.get_suggestion",
+     health_planner.PLAN_SUGGESTION_SQL, lambda ctx: (ctx["user_id"],), False),
+    ("plan_by_id", "HealthPlanner.get_plan",
+     health_planner.PLAN_BY_ID_SQL, lambda ctx: (ctx["plan_id"],), False),
+]
+
+
+# Queries against tables that older databases may lack (regenerate them to include these)
+REQUIRED_TABLES = {
+    "log_dose_lookup": "medication_names",
+    "log_dose_partial": "medication_names_fts",
+    "plan_suggestion": "health_plans",
+    "plan_by_id": "health_plans",
+}
+
+
+def connect(db, writes=False):
+    """Read-only connection unless the statement writes (and --writes allowed it)"""
+    if writes:
+        return sqlite3.connect(db)
+    return sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+
+
+def query_context(conn):
+    """Parameters that hit real rows in the database under test"""
+    row = conn.execute("SELECT id, name FROM medications ORDER BY id DESC LIMIT 1").fetchone()
+    context = {"medication_id": row[0] if row else 1, "medication_name": row[1] if row else "Metformin"}
+    try:
+        row = conn.execute("SELECT id, user_id FROM health_plans ORDER BY id DESC LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    context["has_plans"] = row is not None
+    context["plan_id"], context["user_id"] = row if row else (0, "")
+    return context
+
+
+def query_plan(conn, sql, params):
+    return " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def time_query(db, sql, params, writes, rounds, warmup):
+    """Median-friendly timings; each round opens its own connection like the app does.
+    Writes run inside a transaction that is rolled back so the data stays fixed."""
+    timings, rows = [], 0
+    for i in range(warmup + rounds):
+        started = time.perf_counter()
+        conn = connect(db, writes)
+        try:
+            cursor = conn.execute(sql, params)
+            rows = cursor.rowcount if writes else len(cursor.fetchall())
+        finally:
+            if writes:
+                conn.rollback()
+            conn.close()
+        if i >= warmup:
+            timings.append(time.perf_counter() - started)
+    return timings, rows
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def change_pct(before, after):
+    """Median change in percent (positive = slower)"""
+    return (after["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0.0
+
+
+def run(args):
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} not found; create it with: python bench_meds_db.py generate --db {args.db}")
+
+    conn = connect(args.db)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    context = query_context(conn)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ("medications", "dose_logs")}
+    counts["health_plans"] = (conn.execute("SELECT COUNT(*) FROM health_plans").fetchone()[0]
+                              if context["has_plans"] else 0)
+
+    results, skipped = [], []
+    for name, callers, sql, params, writes in QUERIES:
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        if writes and not args.writes:
+            skipped.append(f"{name} (writes; pass --writes)")
+            continue
+        required = REQUIRED_TABLES.get(name)
+        if required and required not in tables:
+            skipped.append(f"{name} (no {required} table)")
+            continue
+        values = params(context) if params else ()
+        timings, rows = time_query(args.db, sql, values, writes, args.rounds, args.warmup)
+        results.append({
+            "name": name,
+            "callers": callers,
+            "rows": rows,
+            "min_ms": min(timings) * 1000,
+            "median_ms": statistics.median(timings) * 1000,
+            "p95_ms": percentile(timings, 95) * 1000,
+            "max_ms": max(timings) * 1000,
+            "plan": query_plan(conn, sql, values),
+        })
+    conn.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["name"]: r for r in json.load(f)["queries"]}
+
+    print(f"{args.db}: " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+    header = f"{'query':<26} {'rows':>9} {'min':>10} {'median':>10} {'p95':>10} {'max':>10}"
+    if baseline:
+        header += f" {'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (f"{r['name']:<26} {r['rows']:>9} {r['min_ms']:8.2f}ms {r['median_ms']:8.2f}ms "
+                f"{r['p95_ms']:8.2f}ms {r['max_ms']:8.2f}ms")
+        if baseline and r["name"] in baseline:
+            line += f" {change_pct(baseline[r['name']], r):+8.1f}%"
+        print(line)
+        if args.explain:
+            print(f"{'':<26} plan: {r['plan']}")
+
+    if skipped:
+        print(f"Skipped: {', '.join(skipped)}")
+
+    regressions = []
+    if baseline:
+        print("\nRegression report (median vs baseline):")
+        for r in results:
+            before = baseline.get(r["name"])
+            if not before:
+                print(f"  {r['name']:<26} new")
+                continue
+            change = change_pct(before, r)
+            verdict = "same"
+            slower_ms = r["median_ms"] - before["median_ms"]
+            if args.max_regression is not None and change > args.max_regression and slower_ms > args.min_delta_ms:
+                verdict = "REGRESSED"
+                regressions.append(r["name"])
+            elif change < -10:
+                verdict = "faster"
+            elif change > 10:
+                verdict = "slower"
+            plan_note = "" if before.get("plan") == r["plan"] else f"  plan: {before.get('plan')} -> {r['plan']}"
+            print(f"  {r['name']:<26} {before['median_ms']:9.2f}ms -> {r['median_ms']:9.2f}ms "
+                  f"({change:+.1f}%) {verdict}{plan_note}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"db": args.db, "counts": counts, "rounds": args.rounds, "queries": results}, f, indent=2)
+
+    if regressions:
+        print(f"Regressed more than {args.max_regression:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic meds.db generator and SQL benchmark runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="create a synthetic database")
+    gen.add_argument("--db", default="meds_bench.db")
+    gen.add_argument("--medications", type=int, default=20)
+    gen.add_argument("--doses", type=int, default=50000, help="approximate dose_logs rows")
+    gen.add_argument("--days", type=int, help="history length (default: enough for --doses)")
+    gen.add_argument("--years", type=float, default=10, help="longest history --doses may imply")
+    gen.add_argument("--plans", type=int, default=1000, help="health_plans rows (0 to skip)")
+    gen.add_argument("--users", type=int, default=200, help="distinct plan owners")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--force", action="store_true", help="replace an existing database")
+
+    bench = commands.add_parser("run", help="time the app's queries against a database")
+    bench.add_argument("--db", default="meds_bench.db")
+    bench.add_argument("--rounds", type=int, default=5)
+    bench.add_argument("--warmup", type=int, default=1)
+    bench.add_argument("--only", nargs="*", help="run queries whose name contains any of these")
+    bench.add_argument("--explain", action="store_true", help="print each query plan")
+    bench.add_argument("--writes", action="store_true",
+                       help="also time the INSERTs (opens the database read-write; each is rolled back)")
+    bench.add_argument("--json", help="write results to this file")
+    bench.add_argument("--compare", help="baseline results file from an earlier --json run")
+    bench.add_argument("--max-regression", type=float,
+                       help="exit 1 if any median is this many percent slower than --compare")
+    bench.add_argument("--min-delta-ms", type=float, default=0.5,
+                       help="ignore regressions smaller than this (sub-millisecond queries are noisy)")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
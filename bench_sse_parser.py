@@ -0,0 +1,74 @@
+# bench_sse_parser.py - Benchmark the incremental SSE decoder (correctness: test_sse_parser.py)
+#
+# Usage:
+#   python bench_sse_parser.py
+#   python bench_sse_parser.py --mb 16
+import argparse
+import time
+
+from sse_parser import iter_sse
+
+
+def legacy_read_sse_stream(chunks):
+    """The previous parser (str buffer, split on every chunk) for comparison"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line.startswith("data:"):
+                data = line[5:].strip()
+                if data:
+                    yield data
+
+
+def bench_case(name, payload, chunk_size=1024, legacy=True):
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    mb = len(payload) / (1024 * 1024)
+
+    started = time.perf_counter()
+    events = sum(1 for _ in iter_sse(chunks))
+    elapsed = time.perf_counter() - started
+    line = f"{name:<34} {mb:7.1f}MB {events:7d} events  new: {elapsed:7.3f}s ({mb / elapsed:7.1f} MB/s)"
+
+    if legacy:
+        text_chunks = [c.decode("utf-8", errors="replace") for c in chunks]
+        started = time.perf_counter()
+        sum(1 for _ in legacy_read_sse_stream(text_chunks))
+        old = time.perf_counter() - started
+        line += f"  old: {old:7.3f}s ({old / elapsed:5.1f}x)"
+    print(line)
+
+
+def bench(mb):
+    size = int(mb * 1024 * 1024)
+    many = b"".join(
+        b'id: %d\nevent: message\ndata: {"jsonrpc": "2.0", "id": %d, "result": "%s"}\n\n'
+        % (i, i, b"x" * 200)
+        for i in range(size // 260)
+    )
+    bench_case("many small events", many)
+
+    # The legacy parser is quadratic on long lines; keep its input smaller
+    legacy_mb = min(mb, 2)
+    for label, event_mb, legacy in (("one long data line", legacy_mb, True),
+                                    ("one long data line", mb, False)):
+        big = b"data: " + b"y" * int(event_mb * 1024 * 1024) + b"\n\n"
+        bench_case(f"{label} ({event_mb:g}MB)", big, legacy=legacy)
+
+    multiline = b"".join(b"data: " + b"z" * 1000 + b"\r\n" for _ in range(size // 1008)) + b"\r\n"
+    bench_case("one event, many data lines (CRLF)", multiline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the incremental SSE decoder")
+    parser.add_argument("--mb", type=float, default=8, help="benchmark stream size in MB")
+    args = parser.parse_args()
+
+    bench(args.mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# bench_symptoms.py - Offline benchmarks for the symptom pipeline
+#
+# Runs each stage of get_medications_for_symptoms and the full agent path against a
+# local openFDA stub (fda_stub_server.py) and the mock LLM backend, so results are
+# reproducible without network access or API keys.
+#
+# Usage:
+#   python bench_symptoms.py                                  # default stub, no injected faults
+#   python bench_symptoms.py --latency-ms 50 --error-rate 0.1 --rounds 50
+#   python bench_symptoms.py --json after.json --compare before.json --max-regression 10
+#   python bench_symptoms.py --fda-url https://api.fda.gov --rounds 3   # live API
+#   python bench_symptoms.py --mirror-db fda_labels.db                  # local label mirror (fda_mirror.py)
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# The agent path must not need real credentials or servers
+os.environ.setdefault("LLM_BACKEND", "mock")
+
+import symptom_db
+from fda_stub_server import start_stub, synthetic_labels
+
+MAPPED_SYMPTOM = "extreme thirst"
+UNMAPPED_SYMPTOM = "bleeding from cut"
+
+
+def measure(name, fn, rounds, warmup=1):
+    """Time fn over rounds calls (stdout suppressed); returns pytest-benchmark style stats"""
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        for _ in range(warmup):
+            fn()
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+            sink.seek(0)
+            sink.truncate()
+
+    mean = statistics.fmean(timings)
+    return {
+        "name": name,
+        "rounds": rounds,
+        "min": min(timings),
+        "max": max(timings),
+        "mean": mean,
+        "stddev": statistics.stdev(timings) if rounds > 1 else 0.0,
+        "median": statistics.median(timings),
+        "ops": 1 / mean if mean else 0.0,
+    }
+
+
+def format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:8.3f}s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.3f}ms"
+    return f"{seconds * 1e6:8.2f}us"
+
+
+def print_table(results, baseline=None):
+    header = f"{'benchmark':<34} {'min':>10} {'median':>10} {'mean':>10} {'stddev':>10} {'max':>10} {'ops/s':>10}"
+    if baseline:
+        header += f" {'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (f"{r['name']:<34} {format_time(r['min'])} {format_time(r['median'])} "
+                f"{format_time(r['mean'])} {format_time(r['stddev'])} {format_time(r['max'])} {r['ops']:10.1f}")
+        if baseline and r["name"] in baseline:
+            line += f" {change_pct(baseline[r['name']], r):+8.1f}%"
+        print(line)
+
+
+def change_pct(before, after):
+    """Median change in percent (positive = slower)"""
+    return (after["median"] - before["median"]) / before["median"] * 100 if before["median"] else 0.0
+
+
+def fetch_once(condition):
+    """One FDA fetch; injected drops surface as errors here, as in the pipeline"""
+    try:
+        return symptom_db.fetch_fda_labels(condition)
+    except Exception:
+        return []
+
+
+def run_benchmarks(rounds, fda_url, mirror_db=None):
+    if mirror_db:
+        symptom_db.FDA_BACKEND = "mirror"
+        symptom_db.FDA_MIRROR_DB = mirror_db
+    else:
+        symptom_db.FDA_API_URL = fda_url
+    labels = synthetic_labels("diabetes", 3)
+    conditions = symptom_db.lookup_conditions(MAPPED_SYMPTOM)
+
+    from health_planner import HealthPlanner
+    from med_agent import TrueMedicationAgent
+    # The agent's planner creates its tables on construction; keep them out of ./meds.db
+    scratch = tempfile.TemporaryDirectory(prefix="bench_symptoms_")
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = TrueMedicationAgent(planner=HealthPlanner(os.path.join(scratch.name, "meds.db")))
+
+    # Cheap in-process stages get more rounds so their timings are stable
+    fast_rounds = max(rounds * 100, 1000)
+    cases = [
+        ("lookup: mapped symptom", lambda: symptom_db.lookup_conditions(MAPPED_SYMPTOM), fast_rounds),
+        ("lookup: unmapped symptom", lambda: symptom_db.lookup_conditions(UNMAPPED_SYMPTOM), fast_rounds),
+        ("shape: 3 labels", lambda: symptom_db.shape_results("diabetes", labels), fast_rounds),
+        ("fetch: one condition", lambda: fetch_once(conditions[0]), rounds),
+        (f"pipeline: mapped ({len(conditions)} conditions)",
+         lambda: symptom_db.get_medications_for_symptoms(MAPPED_SYMPTOM), rounds),
+        ("pipeline: unmapped (1 condition)",
+         lambda: symptom_db.get_medications_for_symptoms(UNMAPPED_SYMPTOM), rounds),
+        ("agent: analyze_symptoms", lambda: agent.analyze_symptoms(MAPPED_SYMPTOM), rounds),
+    ]
+    with scratch:
+        return [measure(name, fn, n) for name, fn, n in cases]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the symptom pipeline")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds for the network-bound benchmarks")
+    parser.add_argument("--fda-url", help="benchmark against this FDA API instead of a local stub")
+    parser.add_argument("--mirror-db", help="benchmark the local label mirror backend (FDA_BACKEND=mirror)")
+    parser.add_argument("--fixtures", help="recorded responses for the stub to replay")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file from an earlier --json run")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit 1 if any median is this many percent slower than --compare")
+    args = parser.parse_args()
+
+    stub = None
+    fda_url = args.fda_url
+    if not fda_url and not args.mirror_db:
+        stub = start_stub(
+            fixtures_path=args.fixtures,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            drop_rate=args.drop_rate,
+            seed=args.seed,
+        )
+        fda_url = stub.url
+
+    try:
+        results = run_benchmarks(args.rounds, fda_url, args.mirror_db)
+        stub_counts = dict(stub.counts) if stub else None
+    finally:
+        if stub:
+            stub.shutdown()
+            stub.server_close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["name"]: r for r in json.load(f)["benchmarks"]}
+
+    if args.mirror_db:
+        print(f"FDA label mirror: {args.mirror_db}")
+    else:
+        print(f"FDA API: {fda_url}" + (f"  stub requests: {stub_counts}" if stub_counts else ""))
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+                "fda_url": fda_url,
+                "stub": stub_counts,
+                "benchmarks": results,
+            }, f, indent=2)
+
+    if baseline and args.max_regression is not None:
+        regressions = [r["name"] for r in results
+                       if r["name"] in baseline and change_pct(baseline[r["name"]], r) > args.max_regression]
+        if regressions:
+            print(f"Regressed more than {args.max_regression:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
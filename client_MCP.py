@@ -3,6 +3,8 @@ import requests
 import json
 import time
 
+from sse_parser import iter_sse
+
 
 def test_calculator():
     print("=" * 60)
@@ -15,15 +17,12 @@ def test_calculator():
     print(f"   Status: {sse_response.status_code}")
 
     session_id = None
-    for line in sse_response.iter_lines():
-        if line:
-            decoded = line.decode("utf-8").strip()
-            print(f"   SSE: {decoded}")
-            if decoded.startswith("data:"):
-                endpoint = decoded[5:].strip()
-                session_id = endpoint.split("session_id=")[1].split("&")[0]
-                print(f"   ✓ Session ID: {session_id}")
-                break
+    for event in iter_sse(sse_response.iter_content(chunk_size=None)):
+        print(f"   SSE: {event.event}: {event.data}")
+        if event.event == "endpoint":
+            session_id = event.data.split("session_id=")[1].split("&")[0]
+            print(f"   ✓ Session ID: {session_id}")
+            break
 
     if not session_id:
         print("   ✗ No session received")
@@ -40,14 +39,11 @@ def test_calculator():
 
     def listen_for_results():
         resp = requests.get(messages_url, stream=True)
-        for line in resp.iter_lines():
-            if line:
-                decoded = line.decode("utf-8").strip()
-                if decoded.startswith("data:"):
-                    data = json.loads(decoded[5:].strip())
-                    print(f"\n   📨 RESULT RECEIVED: {data}")
-                    if "result" in data:
-                        result["value"] = data
+        for event in iter_sse(resp.iter_content(chunk_size=None)):
+            data = event.json()
+            print(f"\n   📨 RESULT RECEIVED: {data}")
+            if "result" in data:
+                result["value"] = data
 
     listener = threading.Thread(target=listen_for_results, daemon=True)
     listener.start()
@@ -0,0 +1,153 @@
+# context_builder.py - Compact, token-budgeted prompt context from MCP tool output
+import datetime
+import re
+
+DEFAULT_TOKEN_BUDGET = 600
+
+# Matches both "• X taken at <ts>" (MCP server) and "• X at <ts>" (local fallback)
+_LOG_LINE = re.compile(
+    r"^\s*•\s*(?P<name>.+?)\s+(?:taken\s+)?at\s+"
+    r"(?P<ts>\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?)"
+)
+
+_encoder = None
+
+
+def estimate_tokens(text):
+    """Token count via tiktoken when installed, otherwise ~4 characters per token"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+
+    if _encoder:
+        return len(_encoder.encode(text))
+    return (len(text) + 3) // 4
+
+
+def window_start(days, today=None):
+    """First calendar day of a `days`-day window ending today (today counts as one day).
+
+    get_medication_logs filters on this date too, so the logs, the missed-day
+    counts and the context header all cover the same days.
+    """
+    today = today or datetime.date.today()
+    return today - datetime.timedelta(days=days - 1)
+
+
+def summarize_logs(logs_text, days=7, today=None):
+    """Aggregate dose log lines into per-medication counts, last taken and missed days"""
+    today = today or datetime.date.today()
+    start = window_start(days, today)
+    per_med = {}
+
+    for line in str(logs_text).splitlines():
+        match = _LOG_LINE.match(line)
+        if not match:
+            continue
+
+        name = match.group("name").strip()
+        taken_at = match.group("ts").replace("T", " ")
+        stats = per_med.setdefault(name, {"count": 0, "last_taken": "", "days": set()})
+        stats["count"] += 1
+        if taken_at > stats["last_taken"]:
+            stats["last_taken"] = taken_at
+
+        try:
+            day = datetime.date.fromisoformat(taken_at[:10])
+        except ValueError:
+            continue
+        if start <= day <= today:
+            stats["days"].add(day)
+
+    return {
+        name: {
+            "count": stats["count"],
+            "last_taken": stats["last_taken"],
+            "missed_days": days - len(stats["days"]),
+        }
+        for name, stats in per_med.items()
+    }
+
+
+def build_context(logs_text, schedule_text, days=7, token_budget=DEFAULT_TOKEN_BUDGET, today=None):
+    """Build a compact context string that stays within `token_budget`.
+
+    Returns (context_str, stats) where stats reports the prompt-size savings
+    against the raw tool output.
+    """
+    raw = f"medication_logs: {logs_text}\nschedule: {schedule_text}"
+    today = today or datetime.date.today()
+    summary = summarize_logs(logs_text, days, today)
+
+    lines = []
+    if summary:
+        total = sum(s["count"] for s in summary.values())
+        lines.append(
+            f"Medication logs (last {days} days, {window_start(days, today)} to {today}, {total} doses):"
+        )
+        ranked = sorted(summary.items(), key=lambda item: (-item[1]["count"], item[0]))
+        for name, s in ranked:
+            lines.append(
+                f"- {name}: {s['count']} doses, last {s['last_taken']}, "
+                f"missed {s['missed_days']}/{days} days"
+            )
+    else:
+        # "No logs" / error messages are short; pass them through
+        lines.append(f"Medication logs: {str(logs_text).strip()}")
+
+    schedule_lines = [l.strip() for l in str(schedule_text).splitlines() if l.strip()]
+    if schedule_lines:
+        lines.append("Schedule:")
+        lines.extend(schedule_lines[1:] if schedule_lines[0].endswith(":") else schedule_lines)
+
+    context_str = _fit_to_budget(lines, token_budget)
+    raw_tokens = estimate_tokens(raw)
+    compact_tokens = estimate_tokens(context_str)
+
+    return context_str, {
+        "raw_tokens": raw_tokens,
+        "compact_tokens": compact_tokens,
+        "saved_tokens": max(0, raw_tokens - compact_tokens),
+        "saved_pct": round(100 * (1 - compact_tokens / raw_tokens), 1) if raw_tokens else 0.0,
+        "medications_summarized": len(summary),
+    }
+
+
+def _fit_to_budget(lines, token_budget):
+    """Keep whole lines in priority order until the budget is reached"""
+    kept = []
+    used = 0
+    reserve = 8  # room for the "omitted" marker
+    for i, line in enumerate(lines):
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget - reserve:
+            omitted = len(lines) - i
+            kept.append(f"... {omitted} more lines omitted")
+            break
+        kept.append(line)
+        used += cost
+
+    # A single oversized line can still exceed the budget; hard-cap it
+    return _truncate_tokens("\n".join(kept), token_budget)
+
+
+def _truncate_tokens(text, token_budget):
+    """Cut text so estimate_tokens(text) <= token_budget"""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    if not _encoder:
+        return text[: token_budget * 4]
+
+    # Cut on token boundaries; a decoded prefix can re-encode to a few more
+    # tokens, so drop tokens until it fits
+    tokens = _encoder.encode(text)[:token_budget]
+    text = _encoder.decode(tokens)
+    while tokens and estimate_tokens(text) > token_budget:
+        tokens = tokens[:-1]
+        text = _encoder.decode(tokens)
+    return text
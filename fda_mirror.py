@@ -0,0 +1,376 @@
+# fda_mirror.py - Local SQLite mirror of openFDA drug labels for offline symptom search
+#
+# Streams openFDA's bulk drug-label downloads (zipped JSON, hundreds of MB each)
+# into SQLite one label at a time, so memory stays flat however large the dump,
+# then builds an FTS5 index over brand name, purpose and indications. With
+# FDA_BACKEND=mirror, symptom_db searches this database instead of api.fda.gov.
+#
+# Usage:
+#   python fda_mirror.py download --db fda_labels.db          # every partition in download.json
+#   python fda_mirror.py import drug-label-0001-of-0013.json.zip ... --db fda_labels.db
+#   python fda_mirror.py search diabetes --db fda_labels.db
+#   FDA_BACKEND=mirror FDA_MIRROR_DB=fda_labels.db streamlit run med_tracker.py
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import zipfile
+from contextlib import contextmanager
+
+from med_names import fts_query
+
+DOWNLOAD_INDEX_URL = "https://api.fda.gov/download.json"
+CHUNK_SIZE = 1 << 20
+# A single label is rarely over 1MB; anything this big means the file is not JSON we understand
+MAX_RECORD_SIZE = 64 << 20
+
+_NON_WHITESPACE = re.compile(r"\S")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    id TEXT PRIMARY KEY,            -- openFDA label id
+    set_id TEXT,
+    effective_time TEXT,
+    brand_name TEXT,
+    generic_name TEXT,
+    manufacturer_name TEXT,
+    purpose TEXT,
+    indications_and_usage TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS labels_fts USING fts5(
+    brand_name, purpose, indications_and_usage,
+    content='labels', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS mirror_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT_SQL = """
+    INSERT INTO labels (id, set_id, effective_time, brand_name, generic_name, manufacturer_name,
+                        purpose, indications_and_usage)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        set_id = excluded.set_id,
+        effective_time = excluded.effective_time,
+        brand_name = excluded.brand_name,
+        generic_name = excluded.generic_name,
+        manufacturer_name = excluded.manufacturer_name,
+        purpose = excluded.purpose,
+        indications_and_usage = excluded.indications_and_usage
+"""
+
+# Purpose matches first (what the live API searches), then indications, in rowid order.
+# No bm25 ranking: it would score every match for common terms like "pain".
+SEARCH_SQL = """
+    SELECT l.rowid, l.brand_name, l.generic_name, l.manufacturer_name, l.purpose, l.indications_and_usage
+    FROM labels_fts
+    JOIN labels l ON l.rowid = labels_fts.rowid
+    WHERE labels_fts MATCH ?
+    LIMIT ?
+"""
+
+
+class _JSONStream:
+    """Incremental reader over a text stream: decodes one JSON value at a time with raw_decode"""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if len(self.buffer) > MAX_RECORD_SIZE:
+            raise ValueError(f"JSON value larger than {MAX_RECORD_SIZE >> 20}MB")
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, not consumed"""
+        while True:
+            match = _NON_WHITESPACE.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, *chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected {' or '.join(chars)} but found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut off by the chunk edge ("-1." of "-1.25") still decodes; read on
+            if (isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(self.buffer, end)
+                    and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_labels(stream, chunk_size=CHUNK_SIZE):
+    """Yield each label of a bulk file's "results" array ({"meta": ..., "results": [...]})"""
+    reader = _JSONStream(stream, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "results":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(",", "]") == "]":
+                        break
+        else:
+            reader.value()  # meta is small
+        if reader.expect(",", "}") == "}":
+            return
+
+
+@contextmanager
+def open_bulk_file(path):
+    """Text stream of a bulk file; .zip archives are decompressed on the fly"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            member = next(name for name in archive.namelist() if name.endswith(".json"))
+            with archive.open(member) as raw:
+                yield io.TextIOWrapper(raw, encoding="utf-8")
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield f
+
+
+def _text(label, field):
+    return "\n".join(label.get(field) or []) or None
+
+
+def label_row(label):
+    openfda = label.get("openfda") or {}
+    return (
+        label.get("id"),
+        label.get("set_id"),
+        label.get("effective_time"),
+        (openfda.get("brand_name") or [None])[0],
+        (openfda.get("generic_name") or [None])[0],
+        (openfda.get("manufacturer_name") or [None])[0],
+        _text(label, "purpose"),
+        _text(label, "indications_and_usage"),
+    )
+
+
+def create_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def import_files(paths, db_path, batch_size=1000, progress=print):
+    """Stream bulk files into db_path, then rebuild the full-text index; returns labels imported
+
+    paths may be a generator: each path is fully imported before the next one is requested.
+    """
+    conn = sqlite3.connect(db_path)
+    # A failed import is simply rerun, so skip fsyncs
+    conn.execute("PRAGMA synchronous = OFF")
+    create_schema(conn)
+
+    total = 0
+    sources = []
+    started = time.perf_counter()
+    for path in paths:
+        sources.append(os.path.basename(path))
+        imported, batch = 0, []
+        with open_bulk_file(path) as stream:
+            for label in iter_labels(stream):
+                if not label.get("id"):
+                    continue
+                batch.append(label_row(label))
+                if len(batch) >= batch_size:
+                    conn.executemany(UPSERT_SQL, batch)
+                    conn.commit()
+                    imported += len(batch)
+                    batch = []
+        conn.executemany(UPSERT_SQL, batch)
+        conn.commit()
+        imported += len(batch)
+        total += imported
+        progress(f"{os.path.basename(path)}: {imported} labels")
+
+    # One rebuild is much faster than keeping the index in step row by row
+    progress("Building full-text index...")
+    conn.execute("INSERT INTO labels_fts (labels_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO labels_fts (labels_fts) VALUES ('optimize')")
+    conn.executemany(
+        "INSERT OR REPLACE INTO mirror_meta (key, value) VALUES (?, ?)",
+        [("imported_at", time.strftime("%Y-%m-%dT%H:%M:%S")),
+         ("sources", json.dumps(sources))],
+    )
+    conn.commit()
+    conn.close()
+    progress(f"Imported {total} labels into {db_path} in {time.perf_counter() - started:.1f}s")
+    return total
+
+
+def partition_urls(index_url=DOWNLOAD_INDEX_URL):
+    """Download URLs of the drug label partitions listed in openFDA's download.json"""
+    with urllib.request.urlopen(index_url, timeout=30) as response:
+        index = json.load(response)
+    return [p["file"] for p in index["results"]["drug"]["label"]["partitions"]]
+
+
+def _download_each(urls, workdir, progress=print):
+    """Download partitions one at a time; each file is deleted before the next is fetched"""
+    for url in urls:
+        path = os.path.join(workdir, os.path.basename(url))
+        progress(f"Downloading {url}")
+        with urllib.request.urlopen(url, timeout=60) as response, open(path, "wb") as f:
+            shutil.copyfileobj(response, f, CHUNK_SIZE)
+        try:
+            yield path
+        finally:
+            os.remove(path)
+
+
+def download_and_import(db_path, index_url=DOWNLOAD_INDEX_URL, progress=print):
+    """Fetch and import each partition in turn, so only one is ever on disk"""
+    urls = partition_urls(index_url)
+    workdir = tempfile.mkdtemp(prefix="fda_labels_")
+    try:
+        return import_files(_download_each(urls, workdir, progress), db_path, progress=progress)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class LabelMirror:
+    """Read-only label search over a mirror database (one connection per thread)"""
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"FDA label mirror {db_path} not found; build it with fda_mirror.py")
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def search(self, condition, limit=3):
+        """Labels for a condition, shaped like openFDA API results"""
+        conn = self._conn()
+        phrase = fts_query(condition)
+        rows = conn.execute(SEARCH_SQL, (f"purpose : {phrase}", limit)).fetchall()
+        if len(rows) < limit:
+            seen = {row[0] for row in rows}
+            more = conn.execute(SEARCH_SQL, (f"indications_and_usage : {phrase}", limit + len(rows))).fetchall()
+            rows += [row for row in more if row[0] not in seen][: limit - len(rows)]
+        return [_as_result(row) for row in rows]
+
+    def stats(self):
+        conn = self._conn()
+        meta = dict(conn.execute("SELECT key, value FROM mirror_meta"))
+        meta["labels"] = conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+        return meta
+
+
+def _as_result(row):
+    _, brand, generic, manufacturer, purpose, indications = row
+    openfda = {}
+    if brand:
+        openfda["brand_name"] = [brand]
+    if generic:
+        openfda["generic_name"] = [generic]
+    if manufacturer:
+        openfda["manufacturer_name"] = [manufacturer]
+    result = {"openfda": openfda}
+    # Labels without a purpose section (most prescription drugs) describe themselves in indications
+    if purpose or indications:
+        result["purpose"] = [purpose or indications]
+    if indications:
+        result["indications_and_usage"] = [indications]
+    return result
+
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(db_path):
+    """Shared LabelMirror per database path"""
+    with _mirrors_lock:
+        if db_path not in _mirrors:
+            _mirrors[db_path] = LabelMirror(db_path)
+        return _mirrors[db_path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SQLite mirror of openFDA drug labels")
+    parser.add_argument("--db", default=os.getenv("FDA_MIRROR_DB", "fda_labels.db"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import downloaded bulk files (.json.zip or .json)")
+    import_parser.add_argument("files", nargs="+")
+    download_parser = commands.add_parser("download", help="download and import every drug label partition")
+    download_parser.add_argument("--index-url", default=DOWNLOAD_INDEX_URL)
+    search_parser = commands.add_parser("search", help="search the mirror like symptom_db does")
+    search_parser.add_argument("condition")
+    search_parser.add_argument("--limit", type=int, default=3)
+    commands.add_parser("stats", help="label count and import details")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_files(args.files, args.db)
+    elif args.command == "download":
+        download_and_import(args.db, args.index_url)
+    elif args.command == "search":
+        started = time.perf_counter()
+        results = LabelMirror(args.db).search(args.condition, args.limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for result in results:
+            brand = result["openfda"].get("brand_name", ["Generic medication"])[0]
+            print(f"- {brand}: {result.get('purpose', [''])[0][:100]}")
+        print(f"{len(results)} labels in {elapsed_ms:.1f}ms", file=sys.stderr)
+    else:
+        for key, value in LabelMirror(args.db).stats().items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# fda_stub_server.py - Local openFDA drug label stub for offline runs and benchmarks
+#
+# Serves /drug/label.json like api.fda.gov: recorded responses are replayed from a
+# fixtures file, anything else gets deterministic synthetic labels of realistic size.
+# Latency and errors can be injected to exercise the symptom pipeline's slow paths.
+#
+# Usage:
+#   python fda_stub_server.py --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.05
+#   FDA_API_URL=http://127.0.0.1:8765 streamlit run med_tracker.py
+#
+#   # Record live responses once, replay them offline afterwards
+#   python fda_stub_server.py --fixtures fda_fixtures.json --record
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+UPSTREAM_URL = "https://api.fda.gov"
+PURPOSE_SEARCH = re.compile(r'purpose:"?([^"]*)"?')
+
+LABEL_SECTIONS = (
+    "indications_and_usage",
+    "warnings",
+    "do_not_use",
+    "stop_use",
+    "dosage_and_administration",
+    "inactive_ingredient",
+)
+
+
+def synthetic_labels(term, count=3, label_kb=8):
+    """Deterministic label results for a search term, shaped like openFDA's"""
+    results = []
+    for i in range(count):
+        digest = hashlib.sha256(f"{term}:{i}".encode("utf-8")).hexdigest()
+        brand = f"{term.title()} Relief {digest[:4].upper()}"
+        section = (f"Use for {term}. " + "Lorem ipsum dolor sit amet. " * 40)[: label_kb * 1024 // len(LABEL_SECTIONS)]
+        result = {
+            "id": digest[:32],
+            "set_id": digest[32:],
+            "effective_time": "20240101",
+            "version": "1",
+            "purpose": [f"Purpose {term} reliever {digest[:8]} " + "temporarily relieves minor symptoms " * (i + 1)],
+            "openfda": {
+                "brand_name": [brand],
+                "generic_name": [f"{term} {digest[8:12]}"],
+                "manufacturer_name": ["Stub Pharma"],
+                "product_type": ["HUMAN OTC DRUG"],
+                "route": ["ORAL"],
+            },
+        }
+        for name in LABEL_SECTIONS:
+            result[name] = [section]
+        results.append(result)
+    return results
+
+
+class FDAStubServer(ThreadingHTTPServer):
+    """Threaded openFDA stub; one instance holds fixtures, fault settings and counters"""
+
+    daemon_threads = True
+
+    def __init__(self, address, fixtures_path=None, record=False, upstream=UPSTREAM_URL,
+                 latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=500,
+                 drop_rate=0.0, strict=False, label_kb=8, seed=0, verbose=False):
+        super().__init__(address, FDAStubHandler)
+        self.fixtures_path = fixtures_path
+        self.record = record
+        self.upstream = upstream.rstrip("/")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.strict = strict
+        self.label_kb = label_kb
+        self.verbose = verbose
+
+        self.fixtures = {}
+        if fixtures_path and os.path.exists(fixtures_path):
+            with open(fixtures_path, encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "replayed": 0, "synthetic": 0, "recorded": 0,
+                       "not_found": 0, "errors": 0, "dropped": 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def roll(self):
+        """(delay in seconds, fault) for one request: fault is None, "error" or "drop" """
+        with self._lock:
+            delay = self.latency_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            draw = self._rng.random()
+        if draw < self.drop_rate:
+            return delay / 1000, "drop"
+        if draw < self.drop_rate + self.error_rate:
+            return delay / 1000, "error"
+        return delay / 1000, None
+
+    def lookup(self, path, query):
+        """(status, body) for a label query: fixture, recorded upstream response or synthetic"""
+        params = parse_qs(query)
+        search = params.get("search", [""])[0]
+        limit = int(params.get("limit", ["1"])[0])
+        key = f"{path}?search={search}&limit={limit}"
+
+        with self._lock:
+            body = self.fixtures.get(key)
+        if body is not None:
+            self.count("replayed")
+            return (404 if "error" in body else 200), body
+
+        if self.record:
+            status, body = self._fetch_upstream(path, query)
+            if status in (200, 404):
+                with self._lock:
+                    self.fixtures[key] = body
+                    self._save_fixtures()
+                self.count("recorded")
+            return status, body
+
+        match = PURPOSE_SEARCH.search(search)
+        term = match.group(1).strip() if match else ("" if search else "label")
+        if self.strict or not term:
+            self.count("not_found")
+            return 404, {"error": {"code": "NOT_FOUND", "message": "No matches found!"}}
+
+        self.count("synthetic")
+        return 200, {
+            "meta": {"results": {"skip": 0, "limit": limit, "total": limit}},
+            "results": synthetic_labels(term, limit, self.label_kb),
+        }
+
+    def _fetch_upstream(self, path, query):
+        try:
+            with urllib.request.urlopen(f"{self.upstream}{path}?{query}", timeout=15) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read())
+            except ValueError:
+                return e.code, {"error": {"code": str(e.code), "message": e.reason}}
+
+    def _save_fixtures(self):
+        if not self.fixtures_path:
+            return
+        tmp_path = f"{self.fixtures_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.fixtures, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.fixtures_path)
+
+
+class FDAStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+
+        if parts.path == "/_stub/stats":
+            with server._lock:
+                return self._send_json(200, dict(server.counts))
+
+        server.count("requests")
+        delay, fault = server.roll()
+        if delay:
+            time.sleep(delay)
+
+        if fault == "drop":
+            # Close without a response, like a reset connection
+            server.count("dropped")
+            self.close_connection = True
+            return
+        if fault == "error":
+            server.count("errors")
+            return self._send_json(server.error_status, {
+                "error": {"code": "SERVER_ERROR", "message": "Injected error from fda_stub_server"}
+            })
+
+        if parts.path != "/drug/label.json":
+            return self._send_json(404, {"error": {"code": "NOT_FOUND", "message": "Unknown endpoint"}})
+
+        try:
+            status, body = server.lookup(parts.path, parts.query)
+        except (OSError, ValueError) as e:
+            server.count("errors")
+            status, body = 502, {"error": {"code": "UPSTREAM_ERROR", "message": str(e)}}
+        self._send_json(status, body)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_stub(host="127.0.0.1", port=0, **options):
+    """Run a stub in a background thread; returns the server (stop it with server.shutdown())"""
+    server = FDAStubServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, name="fda-stub", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local openFDA drug label stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="JSON file of recorded responses to replay")
+    parser.add_argument("--record", action="store_true", help="fetch misses from --upstream and save them to --fixtures")
+    parser.add_argument("--upstream", default=UPSTREAM_URL)
+    parser.add_argument("--strict", action="store_true", help="404 instead of synthetic labels on fixture misses")
+    parser.add_argument("--label-kb", type=int, default=8, help="approximate size of each synthetic label")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of connections closed without a response")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    server = FDAStubServer(
+        (args.host, args.port),
+        fixtures_path=args.fixtures,
+        record=args.record,
+        upstream=args.upstream,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        drop_rate=args.drop_rate,
+        strict=args.strict,
+        label_kb=args.label_kb,
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+    print(f"FDA stub serving {len(server.fixtures)} fixtures on {server.url} (FDA_API_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,18 @@ import base64
 import os
 import logging
 import json
-import sqlite3
 import datetime
+import functools
+import threading
+import time
+from collections import OrderedDict
+import tracing
+from context_builder import window_start
+from med_names import resolve_medication
 from fastmcp.server import FastMCP
+from starlette.requests import Request
+from starlette.responses import Response
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, generate_latest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,8 +22,114 @@ logger = logging.getLogger("file_mcp_server")
 # Initialize FastMCP server
 mcp = FastMCP("file_mcp_server")
 
+# --- METRICS (scraped from /metrics) ---
+TOOL_STARTS = Counter("mcp_tool_started_total", "Tool calls started", ["tool"])
+TOOL_CALLS = Counter("mcp_tool_calls_total", "Tool calls finished, by outcome", ["tool", "status"])
+TOOL_SECONDS = Histogram("mcp_tool_duration_seconds", "Tool latency in seconds", ["tool"])
+TOOL_IN_FLIGHT = Gauge("mcp_tool_in_flight", "Tool calls currently running", ["tool"])
+SQLITE_SECONDS = Histogram("mcp_sqlite_query_duration_seconds", "SQLite query latency by statement", ["statement"])
+FILE_BYTES = Counter("mcp_file_bytes_total", "Bytes the file tools read from or wrote to disk", ["tool", "direction"])
+CACHE_LOOKUPS = Counter("mcp_cache_lookups_total", "Cache lookups by result", ["cache", "result"])
+CACHE_HIT_RATIO = Gauge("mcp_cache_hit_ratio", "Cache hits / lookups since start", ["cache"])
+CACHE_BYTES = Gauge("mcp_cache_bytes", "Bytes held by the cache", ["cache"])
+
+
+def metered(func):
+    """Count, time and track in-flight calls of a tool (tools report errors as 'Error...' strings)"""
+    name = func.__name__
+    starts = TOOL_STARTS.labels(name)
+    seconds = TOOL_SECONDS.labels(name)
+    ok, error = TOOL_CALLS.labels(name, "ok"), TOOL_CALLS.labels(name, "error")
+    # Derived at scrape time, which saves an update per call
+    TOOL_IN_FLIGHT.labels(name).set_function(lambda: starts.get() - ok.get() - error.get())
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        starts.inc()
+        started = time.perf_counter()
+        outcome = error
+        try:
+            result = func(*args, **kwargs)
+            if not (isinstance(result, str) and result.startswith("Error")):
+                outcome = ok
+            return result
+        finally:
+            seconds.observe(time.perf_counter() - started)
+            outcome.inc()
+
+    return wrapper
+
+
+def _observe_sqlite(span):
+    # tracing.connect times every query; feed those timings into the histogram
+    if span.name.startswith("sqlite "):
+        SQLITE_SECONDS.labels(span.name[7:]).observe(span.duration_ms / 1000)
+
+
+tracing.tracer.add_listener(_observe_sqlite)
+
+
+class ReadFileCache:
+    """LRU of file contents keyed by real path, valid while mtime and size are unchanged"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> ((mtime_ns, size), content)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = CACHE_LOOKUPS.labels("read_file", "hit")
+        self._misses = CACHE_LOOKUPS.labels("read_file", "miss")
+        self._hit_count = 0
+        self._lookups = 0
+        CACHE_HIT_RATIO.labels("read_file").set_function(
+            lambda: self._hit_count / self._lookups if self._lookups else 0.0
+        )
+        CACHE_BYTES.labels("read_file").set_function(lambda: self._bytes)
+
+    def read(self, filepath):
+        path = os.path.realpath(filepath)
+        stat = os.stat(path)  # FileNotFoundError propagates to the tool
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            self._lookups += 1
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self._hit_count += 1
+                self._hits.inc()
+                return entry[1]
+        self._misses.inc()
+
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        FILE_BYTES.labels("read_file", "read").inc(stat.st_size)
+
+        if stat.st_size <= self.max_bytes // 4:
+            with self._lock:
+                old = self._entries.pop(path, None)
+                if old is not None:
+                    self._bytes -= old[0][1]
+                self._entries[path] = (version, content)
+                self._bytes += stat.st_size
+                while self._bytes > self.max_bytes:
+                    _, ((_, size), _) = self._entries.popitem(last=False)
+                    self._bytes -= size
+        return content
+
+
+read_cache = ReadFileCache(int(os.getenv("READ_FILE_CACHE_MB", "32")) * 1024 * 1024)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus scrape endpoint, served next to the SSE transport"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE)
+
+
 # --- YOUR ORIGINAL TOOLS ---
 @mcp.tool()
+@metered
 def list_files(directory: str = ".") -> str:
     """Lists all files and directories within a specified directory."""
     try:
@@ -24,18 +139,19 @@ def list_files(directory: str = ".") -> str:
         return f"Error: Directory '{directory}' not found."
 
 @mcp.tool()
+@metered
 def read_file(filepath: str) -> str:
     """Reads the content of a specified file."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-            return f"Content of {filepath}:\n\n{content}"
+        content = read_cache.read(filepath)
+        return f"Content of {filepath}:\n\n{content}"
     except FileNotFoundError:
         return f"Error: File '{filepath}' not found."
     except Exception as e:
         return f"Error reading file '{filepath}': {e}"
 
 @mcp.tool()
+@metered
 def analyze_image(filepath: str) -> str:
     """Analyze image files and describe their content."""
     try:
@@ -65,16 +181,20 @@ Image Analysis Results:
         return f"Error analyzing image '{filepath}': {e}"
 
 @mcp.tool()
+@metered
 def search_files(directory: str, keyword: str) -> str:
     """Searches for files containing a specific keyword within a directory."""
     found_files = []
+    scanned = FILE_BYTES.labels("search_files", "read")
     try:
         for root, _, files in os.walk(directory):
             for file in files:
                 filepath = os.path.join(root, file)
                 try:
                     with open(filepath, 'r') as f:
-                        if keyword in f.read():
+                        content = f.read()
+                        scanned.inc(os.fstat(f.fileno()).st_size)
+                        if keyword in content:
                             found_files.append(filepath)
                 except:
                     pass
@@ -86,12 +206,14 @@ def search_files(directory: str, keyword: str) -> str:
         return f"Error: Directory '{directory}' not found."
 
 @mcp.tool()
+@metered
 def analyze_image_with_claude(filepath: str) -> str:
     """Analyze image content using Claude's vision capabilities."""
     try:
         with open(filepath, 'rb') as f:
             image_bytes = f.read()
             base64_data = base64.b64encode(image_bytes).decode('utf-8')
+        FILE_BYTES.labels("analyze_image_with_claude", "read").inc(len(image_bytes))
         
         return f"""
 IMAGE_READY_FOR_ANALYSIS:
@@ -105,22 +227,43 @@ Use this image data with a multimodal model like Claude to analyze the visual co
         return f"Error processing image: {e}"
 
 # --- NEW MEDICATION TOOLS (FastMCP compatible) ---
+# meds.db reads issued by the tools below; bench_meds_db.py times these same statements
+RECENT_LOGS_SQL = """
+    SELECT m.name, l.taken_at
+    FROM dose_logs l
+    JOIN medications m ON l.medication_id = m.id
+    WHERE DATE(l.taken_at) >= DATE(?)
+    ORDER BY l.taken_at DESC
+"""
+SCHEDULE_SQL = "SELECT name, dosage, frequency FROM medications"
+MISSED_TODAY_SQL = """
+    SELECT m.name
+    FROM medications m
+    WHERE NOT EXISTS (
+        SELECT 1 FROM dose_logs l
+        WHERE l.medication_id = m.id
+        AND DATE(l.taken_at) = DATE('now')
+    )
+"""
+REPORT_MEDICATIONS_SQL = "SELECT * FROM medications"
+DOSE_HISTORY_SQL = """
+    SELECT m.name, l.taken_at
+    FROM dose_logs l
+    JOIN medications m ON l.medication_id = m.id
+    ORDER BY l.taken_at DESC
+"""
+
 @mcp.tool()
+@metered
 def get_medication_logs(days: int = 7) -> str:
     """Get recent medication dose logs from the database."""
     try:
-        conn = sqlite3.connect('meds.db')
+        conn = tracing.connect('meds.db')
         c = conn.cursor()
         
-        cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+        cutoff_date = window_start(days).isoformat()
         
-        c.execute('''
-            SELECT m.name, l.taken_at 
-            FROM dose_logs l
-            JOIN medications m ON l.medication_id = m.id
-            WHERE DATE(l.taken_at) >= DATE(?)
-            ORDER BY l.taken_at DESC
-        ''', (cutoff_date,))
+        c.execute(RECENT_LOGS_SQL, (cutoff_date,))
         
         logs = c.fetchall()
         conn.close()
@@ -138,13 +281,14 @@ def get_medication_logs(days: int = 7) -> str:
         return f"Error reading medication logs: {e}"
 
 @mcp.tool()
+@metered
 def check_medication_schedule() -> str:
     """Check today's medication schedule based on frequency."""
     try:
-        conn = sqlite3.connect('meds.db')
+        conn = tracing.connect('meds.db')
         c = conn.cursor()
         
-        c.execute("SELECT name, dosage, frequency FROM medications")
+        c.execute(SCHEDULE_SQL)
         medications = c.fetchall()
         conn.close()
         
@@ -162,17 +306,9 @@ def check_medication_schedule() -> str:
             result += "\n"
         
         # Check for missed doses today
-        conn = sqlite3.connect('meds.db')
+        conn = tracing.connect('meds.db')
         c = conn.cursor()
-        c.execute('''
-            SELECT m.name 
-            FROM medications m
-            WHERE NOT EXISTS (
-                SELECT 1 FROM dose_logs l 
-                WHERE l.medication_id = m.id 
-                AND DATE(l.taken_at) = DATE('now')
-            )
-        ''')
+        c.execute(MISSED_TODAY_SQL)
         missed = [row[0] for row in c.fetchall()]
         conn.close()
         
@@ -185,22 +321,18 @@ def check_medication_schedule() -> str:
         return f"Error checking schedule: {e}"
 
 @mcp.tool()
+@metered
 def export_health_report(directory: str = ".") -> str:
     """Export a health report with medication history."""
     try:
-        conn = sqlite3.connect('meds.db')
+        conn = tracing.connect('meds.db')
         c = conn.cursor()
         
         # Get all data
-        c.execute("SELECT * FROM medications")
+        c.execute(REPORT_MEDICATIONS_SQL)
         medications = c.fetchall()
         
-        c.execute('''
-            SELECT m.name, l.taken_at 
-            FROM dose_logs l
-            JOIN medications m ON l.medication_id = m.id
-            ORDER BY l.taken_at DESC
-        ''')
+        c.execute(DOSE_HISTORY_SQL)
         dose_history = c.fetchall()
         conn.close()
         
@@ -238,6 +370,7 @@ def export_health_report(directory: str = ".") -> str:
         
         with open(filepath, 'w') as f:
             json.dump(report, f, indent=2)
+            FILE_BYTES.labels("export_health_report", "written").inc(f.tell())
         
         return f"Health report exported to: {filepath}\n\nSummary:\n- Medications: {report['summary']['total_medications']}\n- Total Doses: {report['summary']['total_doses']}\n- Last 7 Days: {report['summary']['last_7_days']}"
         
@@ -246,12 +379,13 @@ def export_health_report(directory: str = ".") -> str:
 
 # --- NEW SIMPLE TOOLS FOR MEDICATION AGENT ---
 @mcp.tool()
+@metered
 def get_active_medications() -> str:
     """Get list of all active medications."""
     try:
-        conn = sqlite3.connect('meds.db')
+        conn = tracing.connect('meds.db')
         c = conn.cursor()
-        c.execute("SELECT name, dosage, frequency FROM medications")
+        c.execute(SCHEDULE_SQL)
         meds = c.fetchall()
         conn.close()
         
@@ -272,25 +406,25 @@ def get_active_medications() -> str:
         return f"Error: {e}"
 
 @mcp.tool()
+@metered
 def log_dose(medication_name: str, dose_amount: str = "") -> str:
     """Log a medication dose."""
     try:
-        conn = sqlite3.connect('meds.db')
+        conn = tracing.connect('meds.db')
         c = conn.cursor()
         
-        # Find medication
-        c.execute("SELECT id FROM medications WHERE name LIKE ?", (f"%{medication_name}%",))
-        result = c.fetchone()
+        # Find medication: exact normalized name first, then the closest partial match
+        result = resolve_medication(conn, medication_name)
         
         if result:
-            med_id = result[0]
+            med_id, name = result
             c.execute(
                 "INSERT INTO dose_logs (medication_id) VALUES (?)",
                 (med_id,)
             )
             conn.commit()
             
-            message = f"✅ Logged dose for {medication_name}"
+            message = f"✅ Logged dose for {name}"
             if dose_amount:
                 message += f" ({dose_amount})"
             message += f" at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
@@ -1,16 +1,53 @@
 # health_planner.py - Health Planning Agent
 import datetime
+import json
+import sqlite3
+
+# Plan reads; bench_meds_db.py times these same statements
+PLAN_BY_ID_SQL = (
+    "SELECT user_id, goal, steps, completed_steps, progress, created FROM health_plans WHERE id = ?"
+)
+PLAN_SUGGESTION_SQL = """
+    SELECT goal, steps, next_step FROM health_plans
+    WHERE user_id = ? AND progress < 100
+    ORDER BY id LIMIT 1
+"""
 
 class HealthPlanner:
-    """Simple health planning agent"""
+    """Simple health planning agent with plans persisted in SQLite"""
     
-    def __init__(self):
-        self.plans = {}
+    def __init__(self, db_path="meds.db"):
+        self.db_path = db_path
+        self._init_db()
+    
+    def _init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        
+        # completed_steps holds step indexes; next_step points at the first
+        # incomplete step (== number of steps once the plan is done)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS health_plans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                goal TEXT NOT NULL,
+                steps TEXT NOT NULL,
+                completed_steps TEXT NOT NULL DEFAULT '[]',
+                next_step INTEGER NOT NULL DEFAULT 0,
+                progress INTEGER NOT NULL DEFAULT 0,
+                created TEXT
+            )
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_health_plans_user_active
+            ON health_plans (user_id, id) WHERE progress < 100
+        """)
+        
+        conn.commit()
+        conn.close()
     
     def create_plan(self, user_id, goal, medications):
         """Create a health plan"""
-        plan_id = f"plan_{len(self.plans) + 1}"
-        
         # Simple rule-based plans
         if "blood pressure" in goal.lower():
             steps = [
@@ -45,34 +82,130 @@ class HealthPlanner:
                 "Maintain healthy diet"
             ]
         
-        plan = {
+        created = datetime.datetime.now().strftime("%Y-%m-%d")
+        
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO health_plans (user_id, goal, steps, created) VALUES (?, ?, ?, ?)",
+            (str(user_id), goal, json.dumps(steps), created)
+        )
+        plan_id = f"plan_{c.lastrowid}"
+        conn.commit()
+        conn.close()
+        
+        return {
             "id": plan_id,
+            "user_id": user_id,
             "goal": goal,
             "steps": steps,
-            "created": datetime.datetime.now().strftime("%Y-%m-%d"),
+            "created": created,
             "progress": 0,
             "completed_steps": []
         }
+    
+    def get_plan(self, plan_id):
+        """Load a plan by id, or None"""
+        row_id = self._row_id(plan_id)
+        if row_id is None:
+            return None
+        
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(PLAN_BY_ID_SQL, (row_id,))
+        row = c.fetchone()
+        conn.close()
+        
+        if not row:
+            return None
         
-        self.plans[plan_id] = plan
-        return plan
+        user_id, goal, steps, completed, progress, created = row
+        steps = json.loads(steps)
+        return {
+            "id": plan_id,
+            "user_id": user_id,
+            "goal": goal,
+            "steps": steps,
+            "created": created,
+            "progress": progress,
+            "completed_steps": [steps[i] for i in sorted(json.loads(completed))]
+        }
     
     def update_progress(self, plan_id, step):
-        """Update plan progress"""
-        if plan_id in self.plans:
-            if step not in self.plans[plan_id]["completed_steps"]:
-                self.plans[plan_id]["completed_steps"].append(step)
+        """Mark a step done (step may be the step text or its index).
+        
+        Returns True once the step is recorded as completed (also when it already
+        was), False when the plan or the step does not exist.
+        """
+        row_id = self._row_id(plan_id)
+        if row_id is None:
+            return False
+        
+        # Read-modify-write under the write lock, so concurrent updates to the
+        # same plan cannot drop each other's completed steps
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT steps, completed_steps, next_step FROM health_plans WHERE id = ?", (row_id,))
+            row = c.fetchone()
+            if not row:
+                c.execute("ROLLBACK")
+                return False
+            
+            steps = json.loads(row[0])
+            completed = set(json.loads(row[1]))
+            next_step = row[2]
+            
+            # bool is an int subclass, but True/False are not step indexes
+            if isinstance(step, bool):
+                index = None
+            elif isinstance(step, int):
+                index = step
+            else:
+                index = {s: i for i, s in enumerate(steps)}.get(step)
+            if index is None or not 0 <= index < len(steps):
+                c.execute("ROLLBACK")
+                return False
             
-            total = len(self.plans[plan_id]["steps"])
-            completed = len(self.plans[plan_id]["completed_steps"])
-            self.plans[plan_id]["progress"] = int((completed / total) * 100)
+            if index not in completed:
+                completed.add(index)
+                while next_step < len(steps) and next_step in completed:
+                    next_step += 1
+                
+                progress = int((len(completed) / len(steps)) * 100)
+                c.execute(
+                    "UPDATE health_plans SET completed_steps = ?, next_step = ?, progress = ? WHERE id = ?",
+                    (json.dumps(sorted(completed)), next_step, progress, row_id)
+                )
+            c.execute("COMMIT")
+            return True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
     
     def get_suggestion(self, user_id):
-        """Get a suggestion"""
-        for plan_id, plan in self.plans.items():
-            if plan["progress"] < 100:
-                for step in plan["steps"]:
-                    if step not in plan.get("completed_steps", []):
-                        return f"Next step for '{plan['goal']}': {step}"
+        """Get a suggestion from the user's oldest unfinished plan"""
+        # Partial index on active plans: one seek, independent of other users' plans
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(PLAN_SUGGESTION_SQL, (str(user_id),))
+        row = c.fetchone()
+        conn.close()
         
-        return "Set a new health goal to get started!"
\ No newline at end of file
+        if row:
+            goal, steps, next_step = row
+            steps = json.loads(steps)
+            if next_step < len(steps):
+                return f"Next step for '{goal}': {steps[next_step]}"
+        
+        return "Set a new health goal to get started!"
+    
+    def _row_id(self, plan_id):
+        try:
+            return int(str(plan_id).replace("plan_", ""))
+        except ValueError:
+            return None
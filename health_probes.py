@@ -0,0 +1,84 @@
+# health_probes.py - Health checks cached with a TTL and refreshed in the background
+#
+# A probe runs its check on a daemon thread at most once per TTL. Readers get the
+# last result immediately; only the very first read may wait (briefly) for it.
+import threading
+import time
+from collections import namedtuple
+
+ProbeResult = namedtuple("ProbeResult", ["value", "error", "checked_at"])
+
+
+class BackgroundProbe:
+    """Cached result of check(), refreshed on a background thread once it is older than ttl"""
+
+    def __init__(self, check, ttl=60, name="probe"):
+        self.check = check
+        self.ttl = ttl
+        self.name = name
+        self._result = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def result(self, timeout=0):
+        """Last ProbeResult (None while the first check is still running).
+
+        Starts a refresh when the result is stale. Only waits, up to timeout
+        seconds, when there is no earlier result to show.
+        """
+        with self._lock:
+            result = self._result
+            stale = result is None or time.time() - result.checked_at >= self.ttl
+            if stale and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name=f"probe-{self.name}", daemon=True)
+                self._thread.start()
+            thread = self._thread
+
+        if result is None and timeout != 0:
+            thread.join(timeout)
+            return self._result
+        return result
+
+    def wait(self, timeout=None):
+        """Block until the first check has finished; returns its result"""
+        return self.result(timeout=timeout)
+
+    def _run(self):
+        try:
+            result = ProbeResult(self.check(), None, time.time())
+        except Exception as e:
+            result = ProbeResult(None, str(e), time.time())
+        with self._lock:
+            self._result = result
+
+
+def wait_all(probes, timeout=3):
+    """Results of a {name: probe} dict, waiting at most timeout seconds in total.
+
+    Every probe is started before any is waited on, so first checks run in parallel.
+    """
+    for probe in probes.values():
+        probe.result()
+    deadline = time.time() + timeout
+    return {name: probe.result(timeout=max(0, deadline - time.time())) for name, probe in probes.items()}
+
+
+def check_fda(timeout=3):
+    """HTTP status of a one-label openFDA query (200 when the local mirror has labels)"""
+    from symptom_db import FDA_API_URL, FDA_BACKEND, FDA_MIRROR_DB
+
+    if FDA_BACKEND == "mirror":
+        from fda_mirror import get_mirror
+
+        return 200 if get_mirror(FDA_MIRROR_DB).stats()["labels"] else 404
+
+    import requests
+
+    return requests.get(f"{FDA_API_URL}/drug/label.json?limit=1", timeout=timeout).status_code
+
+
+def check_mcp(base_url="http://localhost:8080", timeout=2):
+    """Whether the MCP file server answers at base_url"""
+    import requests
+
+    return requests.get(base_url, timeout=timeout).status_code < 500
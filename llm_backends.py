@@ -0,0 +1,205 @@
+# llm_backends.py - Pluggable async LLM backends with request coalescing
+import asyncio
+import hashlib
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from tracing import in_current_trace, span
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful medical AI assistant. "
+    "Be cautious and always recommend consulting a doctor."
+)
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Seconds a synchronous caller waits for a completion before giving up
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+
+class LLMBackend(ABC):
+    """Base backend: async completions with in-flight coalescing and a concurrency cap.
+
+    Identical concurrent requests (same system prompt, prompt and sampling
+    settings) share one upstream call. Subclasses only implement `_complete`.
+    """
+
+    name = "base"
+
+    def __init__(self, model, max_concurrency=None):
+        self.model = model
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        # Semaphores and in-flight tasks are bound to an event loop
+        self._loop_state = weakref.WeakKeyDictionary()
+
+    async def complete(self, prompt, system=DEFAULT_SYSTEM_PROMPT, temperature=0.3, max_tokens=300):
+        """Return the completion text for `prompt`, sharing identical in-flight calls"""
+        semaphore, in_flight = self._state_for_loop()
+        key = self._request_key(prompt, system, temperature, max_tokens)
+
+        with span(f"llm.complete {self.name}", "client", model=self.model) as current:
+            task = in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self._limited_complete(semaphore, prompt, system, temperature, max_tokens)
+                )
+                in_flight[key] = task
+                task.add_done_callback(lambda _t: in_flight.pop(key, None))
+            else:
+                self.coalesced_calls += 1
+                current.set("llm.coalesced", True)
+
+            # Shield so one cancelled waiter does not cancel the shared call
+            return await asyncio.shield(task)
+
+    async def _limited_complete(self, semaphore, prompt, system, temperature, max_tokens):
+        async with semaphore:
+            self.upstream_calls += 1
+            return await self._complete(prompt, system, temperature, max_tokens)
+
+    @abstractmethod
+    async def _complete(self, prompt, system, temperature, max_tokens):
+        """One upstream completion call; returns the response text"""
+
+    def _state_for_loop(self):
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = (asyncio.Semaphore(self.max_concurrency), {})
+            self._loop_state[loop] = state
+        return state
+
+    def _request_key(self, prompt, system, temperature, max_tokens):
+        raw = f"{self.model}\x00{system}\x00{prompt}\x00{temperature}\x00{max_tokens}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def stats(self):
+        """Upstream vs. coalesced call counts"""
+        return {
+            "backend": self.name,
+            "model": self.model,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls,
+        }
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions via the async client"""
+
+    name = "openai"
+
+    def __init__(self, api_key=None, model=None, max_concurrency=None):
+        super().__init__(model or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"), max_concurrency)
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+    async def _complete(self, prompt, system, temperature, max_tokens):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+
+
+class BedrockBackend(LLMBackend):
+    """Amazon Bedrock Converse API (boto3 is blocking, so calls run in a worker thread)"""
+
+    name = "bedrock"
+
+    def __init__(self, model=None, region=None, max_concurrency=None):
+        super().__init__(
+            model or os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0"), max_concurrency
+        )
+        from aws_clients import get_client
+
+        self.region = region or os.getenv("AWS_REGION", "us-west-2")
+        self.client = get_client("bedrock-runtime", self.region)
+
+    async def _complete(self, prompt, system, temperature, max_tokens):
+        response = await asyncio.to_thread(
+            self.client.converse,
+            modelId=self.model,
+            messages=[{"role": "user", "content": [{"text": prompt}]}],
+            system=[{"text": system}],
+            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
+        )
+        return response["output"]["message"]["content"][0]["text"]
+
+
+class MockBackend(LLMBackend):
+    """Local deterministic backend for offline runs and benchmarks"""
+
+    name = "mock"
+
+    def __init__(self, model="mock-1", latency=0.0, max_concurrency=None):
+        super().__init__(model, max_concurrency)
+        self.latency = latency
+
+    async def _complete(self, prompt, system, temperature, max_tokens):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        digest = hashlib.sha256(f"{system}\n{prompt}".encode("utf-8")).hexdigest()[:12]
+        text = f"""[mock:{digest}]
+1. Consider common over-the-counter options appropriate for these symptoms.
+2. See a doctor if symptoms persist more than 3 days or get worse.
+3. Rest and stay hydrated."""
+        return text[: max_tokens * 4]
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "bedrock": BedrockBackend,
+    "mock": MockBackend,
+}
+
+
+def get_backend(name=None, api_key=None, **kwargs):
+    """Build a backend by name (or LLM_BACKEND env). Returns None when nothing is configured."""
+    name = (name or os.getenv("LLM_BACKEND") or ("openai" if api_key else "")).lower()
+    if not name:
+        return None
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available: {', '.join(BACKENDS)}")
+
+    if name == "openai":
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        return OpenAIBackend(api_key=api_key, **kwargs)
+
+    return BACKENDS[name](**kwargs)
+
+
+# Shared event loop so calls from different threads (e.g. Streamlit sessions) coalesce
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-backends", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro, timeout=DEFAULT_TIMEOUT):
+    """Run a backend coroutine from synchronous code on the shared loop (inside the caller's trace).
+
+    Raises TimeoutError after `timeout` seconds and cancels the coroutine.
+    """
+    future = asyncio.run_coroutine_threadsafe(in_current_trace(coro), _background_loop())
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
@@ -2,24 +2,15 @@ import requests
 import json
 import time
 
+from sse_parser import iter_sse
+
 
 def read_sse_stream(response):
-    """Manually read and parse an SSE stream from a requests response"""
-    buffer = ""
-    for chunk in response.iter_content(chunk_size=1024, decode_unicode=True):
-        if chunk:
-            buffer += chunk
-            lines = buffer.split("\n")
-            # Keep the last incomplete line in the buffer
-            buffer = lines.pop()
-
-            for line in lines:
-                line = line.strip()
-                if line.startswith("data:"):
-                    data = line[5:].strip()
-                    if data:  # Only yield non-empty data
-                        yield data
-                # You can also handle other SSE fields like 'event:' here
+    """Yield the data of each SSE event from a streaming requests response"""
+    # chunk_size=None hands over bytes as they arrive instead of waiting for 1KB
+    for event in iter_sse(response.iter_content(chunk_size=None)):
+        if event.data:  # Only yield non-empty data
+            yield event.data
 
 
 def test_sse_flow():
@@ -30,16 +21,12 @@ def test_sse_flow():
     print(f"Control channel status: {sse_response.status_code}")
 
     session_id = None
-    for line in sse_response.iter_lines():
-        if line:
-            decoded = line.decode("utf-8").strip()
-            print(f"SSE: {decoded}")
-            if decoded.startswith("data:"):
-                endpoint = decoded[5:].strip()
-                if "session_id=" in endpoint:
-                    session_id = endpoint.split("session_id=")[1].split("&")[0]
-                    print(f"Got session ID: {session_id}")
-                    break
+    for event in iter_sse(sse_response.iter_content(chunk_size=None)):
+        print(f"SSE: {event.event}: {event.data}")
+        if event.event == "endpoint" and "session_id=" in event.data:
+            session_id = event.data.split("session_id=")[1].split("&")[0]
+            print(f"Got session ID: {session_id}")
+            break
 
     if not session_id:
         print("No session ID")
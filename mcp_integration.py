@@ -2,46 +2,49 @@
 import requests
 import json
 import os
-import sqlite3
 import datetime
+import tracing
+from context_builder import window_start
+from health_probes import BackgroundProbe, check_mcp
 
 class FileMCPClient:
     """Client for MCP file server"""
     
     def __init__(self, base_url="http://localhost:8080"):
         self.base_url = base_url
-        self.connected = False
-        self._test_connection()
+        # Probe on a background thread so constructing the client never blocks
+        self._probe = BackgroundProbe(lambda: check_mcp(self.base_url), ttl=60, name="mcp")
+        self._probe.result()
     
-    def _test_connection(self):
-        """Test if MCP server is running"""
-        try:
-            # Simple connection test
-            response = requests.get(f"{self.base_url}", timeout=2)
-            self.connected = response.status_code < 500
-        except:
-            self.connected = False
+    @property
+    def connected(self):
+        """Whether the MCP server answered the last probe (waits for the first one)"""
+        return bool(self._probe.wait().value)
     
     def call_tool(self, tool_name, **kwargs):
         """Call an MCP tool"""
-        if not self.connected:
-            return self._local_fallback(tool_name, kwargs)
-        
-        try:
-            # For FastMCP, tools are typically POST endpoints
-            response = requests.post(
-                f"{self.base_url}/tools/{tool_name}",
-                json=kwargs,
-                timeout=10
-            )
+        with tracing.span(f"mcp.call_tool {tool_name}", "client") as current:
+            if not self.connected:
+                current.set("mcp.local_fallback", True)
+                return self._local_fallback(tool_name, kwargs)
             
-            if response.status_code == 200:
-                return response.json().get("content", "No content")
-            else:
-                return f"Error {response.status_code}: {response.text}"
+            try:
+                # For FastMCP, tools are typically POST endpoints
+                response = requests.post(
+                    f"{self.base_url}/tools/{tool_name}",
+                    json=kwargs,
+                    timeout=10
+                )
+                current.set("http.status_code", response.status_code)
                 
-        except Exception as e:
-            return self._local_fallback(tool_name, kwargs, str(e))
+                if response.status_code == 200:
+                    return response.json().get("content", "No content")
+                else:
+                    return f"Error {response.status_code}: {response.text}"
+                    
+            except Exception as e:
+                current.set("mcp.local_fallback", True)
+                return self._local_fallback(tool_name, kwargs, str(e))
     
     def _local_fallback(self, tool_name, args, error_msg=""):
         """Local fallback when MCP server is offline"""
@@ -80,11 +83,10 @@ class FileMCPClient:
     def _get_local_logs(self, days):
         """Get local medication logs"""
         try:
-            import datetime
-            conn = sqlite3.connect('meds.db')
+            conn = tracing.connect('meds.db')
             c = conn.cursor()
             
-            cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+            cutoff = window_start(days).isoformat()
             c.execute('''
                 SELECT m.name, l.taken_at 
                 FROM dose_logs l
@@ -108,7 +110,7 @@ class FileMCPClient:
     def _get_local_schedule(self):
         """Get local schedule"""
         try:
-            conn = sqlite3.connect('meds.db')
+            conn = tracing.connect('meds.db')
             c = conn.cursor()
             c.execute("SELECT name, dosage, frequency FROM medications")
             meds = c.fetchall()
@@ -134,7 +136,7 @@ class FileMCPClient:
             import datetime
             import json
             
-            conn = sqlite3.connect('meds.db')
+            conn = tracing.connect('meds.db')
             c = conn.cursor()
             
             # Get medications
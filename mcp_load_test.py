@@ -0,0 +1,359 @@
+# mcp_load_test.py - Concurrent load generator for the MCP SSE servers
+#
+# Opens N sessions against server_MCP_test.py ("custom") or file_mcp_server.py
+# ("fastmcp"), fires M tool calls per session at a fixed rate, and reports
+# throughput, latency percentiles, error rates and session setup cost as JSON.
+# Requires httpx (pip install httpx).
+#
+# Usage:
+#   python mcp_load_test.py --target custom --sessions 50 --calls 100 --rate 20
+#   python mcp_load_test.py --target fastmcp --url http://localhost:8080 --sessions 20
+#   python mcp_load_test.py --target custom --batch-size 50 --max-p95-ms 250 --output load.json
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+from urllib.parse import urljoin
+
+import httpx
+
+from sse_parser import aiter_sse, resume_headers
+
+DEFAULT_URLS = {"custom": "http://localhost:8000", "fastmcp": "http://localhost:8080"}
+DEFAULT_TOOLS = {
+    "custom": ("calculator", {"operation": "add", "a": 5, "b": 3}),
+    "fastmcp": ("list_files", {"directory": "."}),
+}
+
+
+class CallError(Exception):
+    """A failed call, labelled with an error kind for the report"""
+
+    def __init__(self, kind, detail=""):
+        super().__init__(f"{kind}: {detail}" if detail else kind)
+        self.kind = kind
+
+
+class MCPSession:
+    """One client session: opens the SSE channel(s) and matches responses to calls by id"""
+
+    def __init__(self, client, base_url, target, timeout):
+        self.client = client
+        self.base_url = base_url
+        self.target = target
+        self.timeout = timeout
+        self.post_url = None
+        self.pending = {}
+        self.closed = False
+        self._endpoint = None
+        self._stack = AsyncExitStack()
+        self._readers = []
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._endpoint = loop.create_future()
+        await self._stack.__aenter__()
+
+        # Both servers announce the POST endpoint as the first event on /sse;
+        # FastMCP then answers on that same stream, the custom server does not
+        await self._open_stream(urljoin(self.base_url, "/sse"), results=self.target == "fastmcp")
+        endpoint = await asyncio.wait_for(self._endpoint, self.timeout)
+        self.post_url = urljoin(self.base_url, endpoint)
+
+        if self.target == "custom":
+            # Results arrive on a separate private channel
+            await self._open_stream(self.post_url, results=True)
+        else:
+            # FastMCP answers on the /sse stream itself after the MCP handshake
+            await self._request({
+                "jsonrpc": "2.0",
+                "id": "init",
+                "method": "initialize",
+                "params": {
+                    "protocolVersion": "2024-11-05",
+                    "capabilities": {},
+                    "clientInfo": {"name": "mcp_load_test", "version": "1.0"},
+                },
+            }, ["init"])
+            await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def _open_stream(self, url, results):
+        response = await self._stack.enter_async_context(
+            self.client.stream("GET", url, headers=resume_headers())
+        )
+        if response.status_code != 200:
+            raise CallError(f"http_{response.status_code}", url)
+        self._readers.append(asyncio.create_task(self._read(response, results)))
+
+    async def _read(self, response, results):
+        try:
+            async for event in aiter_sse(response.aiter_bytes()):
+                if event.event == "endpoint":
+                    if not self._endpoint.done():
+                        self._endpoint.set_result(event.data)
+                    continue
+                try:
+                    message = event.json()
+                except ValueError:
+                    continue
+                for item in message if isinstance(message, list) else [message]:
+                    future = self.pending.get(item.get("id")) if isinstance(item, dict) else None
+                    if future is not None and not future.done():
+                        future.set_result(item)
+        except (httpx.HTTPError, asyncio.CancelledError):
+            pass
+        finally:
+            # Results stream closed: everything still waiting fails fast
+            if results:
+                self.closed = True
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(CallError("stream_closed"))
+            if not self._endpoint.done():
+                self._endpoint.set_exception(CallError("stream_closed", "no endpoint event"))
+
+    async def _post(self, payload):
+        try:
+            response = await self.client.post(self.post_url, json=payload)
+        except httpx.TimeoutException as e:
+            raise CallError("timeout", str(e))
+        except httpx.HTTPError as e:
+            raise CallError("connection", str(e))
+        if response.status_code >= 400:
+            raise CallError(f"http_{response.status_code}", response.text[:200])
+        if self.target == "custom":
+            body = response.json()
+            # The custom server reports some failures as [body, status] with HTTP 200
+            if isinstance(body, list) or "error" in body:
+                raise CallError("rejected", json.dumps(body)[:200])
+
+    async def _request(self, payload, request_ids):
+        """POST one request or batch and wait for every response; returns latency in seconds"""
+        if self.closed:
+            raise CallError("stream_closed")
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in request_ids]
+        self.pending.update(zip(request_ids, futures))
+        started = time.perf_counter()
+        try:
+            await self._post(payload)
+            try:
+                responses = await asyncio.wait_for(
+                    asyncio.gather(*futures, return_exceptions=True), self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise CallError("timeout", "no response on the SSE stream")
+        finally:
+            for request_id, future in zip(request_ids, futures):
+                self.pending.pop(request_id, None)
+                if future.done() and not future.cancelled():
+                    future.exception()  # mark retrieved when the POST failed first
+
+        elapsed = time.perf_counter() - started
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+            if "error" in response:
+                raise CallError("rpc_error", json.dumps(response["error"])[:200])
+            if isinstance(response.get("result"), dict) and response["result"].get("isError"):
+                raise CallError("tool_error", json.dumps(response["result"])[:200])
+        return elapsed
+
+    async def call_tools(self, request_ids, tool, arguments):
+        calls = [
+            {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": "tools/call",
+                "params": {"name": tool, "arguments": arguments},
+            }
+            for request_id in request_ids
+        ]
+        return await self._request(calls if len(calls) > 1 else calls[0], request_ids)
+
+    async def close(self):
+        for reader in self._readers:
+            reader.cancel()
+        await self._stack.aclose()
+
+
+async def run_session(index, args, client, report):
+    """One session: setup, then args.calls tool calls at args.rate per second"""
+    if args.ramp_up:
+        await asyncio.sleep(args.ramp_up * index / args.sessions)
+
+    session = MCPSession(client, args.url, args.target, args.timeout)
+    started = time.perf_counter()
+    try:
+        await session.open()
+    except Exception as e:
+        report["errors"][getattr(e, "kind", "setup")] += 1
+        report["setup_failures"] += 1
+        await session.close()
+        return
+    report["setup_s"].append(time.perf_counter() - started)
+
+    async def fire(request_ids):
+        try:
+            latency = await session.call_tools(request_ids, args.tool, args.arguments)
+            report["latencies_s"].extend([latency] * len(request_ids))
+        except CallError as e:
+            report["errors"][e.kind] += len(request_ids)
+        except Exception:
+            report["errors"]["client"] += len(request_ids)
+
+    # Request ids are unique across sessions
+    offsets = range(0, args.calls, args.batch_size)
+    first_id = index * args.calls + 1
+    try:
+        if args.rate:
+            # Open loop: calls start on schedule whether or not earlier ones finished
+            tasks, first = [], time.perf_counter()
+            for offset in offsets:
+                delay = first + offset / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                batch = list(range(first_id + offset, first_id + min(offset + args.batch_size, args.calls)))
+                tasks.append(asyncio.create_task(fire(batch)))
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: back-to-back calls
+            for offset in offsets:
+                await fire(list(range(first_id + offset, first_id + min(offset + args.batch_size, args.calls))))
+    finally:
+        await session.close()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize_ms(values_s):
+    values = sorted(v * 1000 for v in values_s)
+    if not values:
+        return None
+    return {
+        "min": round(values[0], 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2),
+        "mean": round(sum(values) / len(values), 2),
+    }
+
+
+async def run_load_test(args):
+    report = {"setup_s": [], "latencies_s": [], "errors": Counter(), "setup_failures": 0}
+    limits = httpx.Limits(max_connections=args.sessions * 3 + 10, max_keepalive_connections=args.sessions * 2)
+    timeout = httpx.Timeout(args.timeout, read=None)  # SSE streams stay open between events
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        await asyncio.gather(*(run_session(i, args, client, report) for i in range(args.sessions)))
+    wall_s = time.perf_counter() - started
+
+    ok = len(report["latencies_s"])
+    call_errors = sum(report["errors"].values()) - report["setup_failures"]
+    attempted = ok + call_errors
+    return {
+        "generated_at": datetime.datetime.now().isoformat(),
+        "config": {
+            "target": args.target,
+            "url": args.url,
+            "sessions": args.sessions,
+            "calls_per_session": args.calls,
+            "rate_per_session": args.rate,
+            "batch_size": args.batch_size,
+            "ramp_up_s": args.ramp_up,
+            "tool": args.tool,
+        },
+        "sessions": {
+            "established": len(report["setup_s"]),
+            "failed": report["setup_failures"],
+            "setup_ms": summarize_ms(report["setup_s"]),
+        },
+        "calls": {
+            "ok": ok,
+            "errors": call_errors,
+            "error_rate": round(call_errors / attempted, 4) if attempted else None,
+            "errors_by_kind": dict(report["errors"]),
+        },
+        "latency_ms": summarize_ms(report["latencies_s"]),
+        "throughput": {
+            "wall_s": round(wall_s, 3),
+            "calls_per_s": round(ok / wall_s, 1) if wall_s else None,
+        },
+    }
+
+
+def check_thresholds(result, args):
+    """Regression gates; returns a list of failures"""
+    failures = []
+    p95 = (result["latency_ms"] or {}).get("p95")
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"p95 latency {p95}ms exceeds {args.max_p95_ms}ms")
+    rate = result["calls"]["error_rate"]
+    if args.max_error_rate is not None and (rate is None or rate > args.max_error_rate):
+        failures.append(f"error rate {rate} exceeds {args.max_error_rate}")
+    if result["sessions"]["failed"] and args.max_error_rate is not None:
+        failures.append(f"{result['sessions']['failed']} sessions failed to set up")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the MCP SSE servers")
+    parser.add_argument("--target", choices=["custom", "fastmcp"], default="custom",
+                        help="custom = server_MCP_test.py, fastmcp = file_mcp_server.py")
+    parser.add_argument("--url", help="server base URL (default depends on target)")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--calls", type=int, default=20, help="tool calls per session")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="calls per second per session (0 = back-to-back)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="calls per JSON-RPC batch POST (custom target only)")
+    parser.add_argument("--ramp-up", type=float, default=0, help="seconds over which sessions start")
+    parser.add_argument("--tool", help="tool name (default depends on target)")
+    parser.add_argument("--arguments", help="tool arguments as JSON")
+    parser.add_argument("--timeout", type=float, default=30, help="per-call timeout in seconds")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if p95 latency is higher")
+    parser.add_argument("--max-error-rate", type=float, help="exit 1 if the error rate is higher")
+    args = parser.parse_args(argv)
+
+    args.url = args.url or DEFAULT_URLS[args.target]
+    default_tool, default_arguments = DEFAULT_TOOLS[args.target]
+    args.tool = args.tool or default_tool
+    args.arguments = json.loads(args.arguments) if args.arguments else default_arguments
+    if args.target == "fastmcp" and args.batch_size != 1:
+        parser.error("--batch-size is only supported by the custom server")
+    if args.batch_size < 1 or args.sessions < 1 or args.calls < 0:
+        parser.error("--sessions and --batch-size must be positive")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run_load_test(args))
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    failures = check_thresholds(result, args)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
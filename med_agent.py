@@ -1,16 +1,57 @@
 # med_agent.py - AI Agent with MCP tool access
+import os
+from functools import cached_property
 from symptom_db import get_medications_for_symptoms
 from simple_llm import SimpleMedAI
 from health_planner import HealthPlanner
 from mcp_integration import FileMCPClient
+from context_builder import build_context
+from user_context_store import DOSE_LOG, UserContextStore
+from tracing import span, traced
+
+class SymptomAnalysis:
+    """One symptom check: each piece is computed at most once and shared by all readers"""
+    
+    def __init__(self, agent, symptoms_text, user_medications=None):
+        self.agent = agent
+        self.symptoms_text = symptoms_text
+        self.user_medications = user_medications
+    
+    @cached_property
+    def fda_results(self):
+        """FDA medications for the symptoms (one lookup per query)"""
+        with span("agent.fda_results"):
+            return get_medications_for_symptoms(self.symptoms_text)
+    
+    @cached_property
+    def ai_analysis(self):
+        """LLM analysis for the symptoms (one call per query)"""
+        with span("agent.ai_analysis"):
+            try:
+                return self.agent.llm.analyze_symptoms(self.symptoms_text, self.user_medications)
+            except Exception:
+                return "AI analysis unavailable. Using basic matching."
+    
+    @cached_property
+    def summary(self):
+        return self.agent._summarize_results(self.fda_results, self.ai_analysis)
+    
+    def as_dict(self):
+        return {
+            "ai_analysis": self.ai_analysis,
+            "fda_recommendations": self.fda_results,
+            "summary": self.summary
+        }
+
 
 class TrueMedicationAgent:
     """TRUE AI Agent with MCP tool access"""
     
-    def __init__(self, openai_key=None):
+    def __init__(self, openai_key=None, planner=None):
         self.llm = SimpleMedAI(openai_key)
-        self.planner = HealthPlanner()
-        self.user_context = {}
+        self.planner = planner or HealthPlanner()
+        # Bounded per-user history; set USER_CONTEXT_DB to persist it across restarts
+        self.user_context = UserContextStore(db_path=os.getenv("USER_CONTEXT_DB"))
         
         # Connect to MCP server
         self.mcp_client = FileMCPClient("http://localhost:8080")
@@ -24,31 +65,22 @@ class TrueMedicationAgent:
             "export_health_report"
         ]
     
+    def analyze(self, symptoms_text, user_medications=None):
+        """Start a symptom check; results are computed lazily and memoized per query"""
+        return SymptomAnalysis(self, symptoms_text, user_medications)
+    
     def analyze_symptoms(self, symptoms_text, user_medications=None):
         """Analyze symptoms with AI and FDA data"""
         if not symptoms_text or not symptoms_text.strip():
             return "Please describe your symptoms."
         
-        # Try AI analysis first
-        try:
-            ai_analysis = self.llm.analyze_symptoms(symptoms_text, user_medications)
-        except Exception:
-            ai_analysis = "AI analysis unavailable. Using basic matching."
-        
-        # Get FDA data
-        fda_results = get_medications_for_symptoms(symptoms_text)
-        
-        # Combine results
-        return {
-            "ai_analysis": ai_analysis,
-            "fda_recommendations": fda_results,
-            "summary": self._summarize_results(fda_results, ai_analysis)
-        }
+        return self.analyze(symptoms_text, user_medications).as_dict()
     
     def create_health_plan(self, user_id, goal, medications):
         """Create a health plan"""
         return self.planner.create_plan(user_id, goal, medications)
     
+    @traced("agent.analyze_with_context")
     def analyze_with_context(self, query):
         """Analyze query using MCP tools for context"""
         if not query:
@@ -74,8 +106,12 @@ class TrueMedicationAgent:
         except Exception as e:
             context["schedule"] = f"Error: {str(e)}"
         
-        # Analyze with AI
-        context_str = "\n".join([f"{k}: {v}" for k, v in context.items()])
+        # Analyze with AI, using aggregates instead of raw log lines
+        context_str, context_stats = build_context(
+            context["medication_logs"],
+            context["schedule"],
+            days=7
+        )
         full_prompt = f"Query: {query}\n\nContext:\n{context_str}\n\nProvide analysis and recommendations."
         
         try:
@@ -86,7 +122,8 @@ class TrueMedicationAgent:
         return {
             "context_gathered": context,
             "ai_analysis": ai_response,
-            "tools_used": list(context.keys())
+            "tools_used": list(context.keys()),
+            "context_stats": context_stats
         }
     
     def _simple_context_analysis(self, query, context):
@@ -130,24 +167,13 @@ class TrueMedicationAgent:
     
     def log_user_action(self, user_id, action, outcome):
         """Log user action for learning"""
-        if user_id not in self.user_context:
-            self.user_context[user_id] = {"actions": [], "preferences": {}}
-        
-        self.user_context[user_id]["actions"].append({
-            "action": action,
-            "outcome": outcome,
-            "timestamp": "now"
-        })
+        self.user_context.log_action(user_id, action, outcome)
     
     def get_personalized_tip(self, user_id):
         """Get personalized tip based on user history"""
-        if user_id in self.user_context and self.user_context[user_id]["actions"]:
-            actions = self.user_context[user_id]["actions"]
-            
+        if user_id in self.user_context:
             # Simple logic: if user logs doses regularly, encourage continuation
-            dose_logs = [a for a in actions if "log" in a["action"].lower() or "taken" in a["action"].lower()]
-            
-            if len(dose_logs) > 3:
+            if self.user_context.count(user_id, DOSE_LOG) > 3:
                 return "Great job with medication adherence! Keep tracking consistently."
             else:
                 return "Try to log your medications daily for better health management."
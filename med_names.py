@@ -0,0 +1,160 @@
+# med_names.py - Normalized medication names and deterministic name resolution
+#
+# medication_names holds one normalized key per medications row (casefolded,
+# strengths and punctuation stripped), indexed for exact lookups, plus an FTS5
+# trigram index over the keys for partial matches. Plain-SQL triggers keep the
+# rows in step with medications for every writer; keys are filled in from Python
+# (normalize_name) the next time a name is resolved.
+import re
+import sqlite3
+import unicodedata
+
+# "500mg", "20 mg", "0.5%", "1000 IU", "10 mg/5 mL", "20 units"
+_STRENGTH = re.compile(
+    r"\b\d+(?:[.,]\d+)?\s*(?:mg|mcg|μg|ug|g|ml|l|iu|units?|meq|%)"
+    r"(?:\s*/\s*\d*(?:[.,]\d+)?\s*(?:ml|l|g|tablets?|tabs?|doses?|h|hr))?(?!\w)"
+)
+_SEPARATORS = re.compile(r"[\W_]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS medication_names (
+    medication_id INTEGER PRIMARY KEY,  -- medications.id
+    name_key TEXT                       -- normalize_name(name); NULL until filled in
+);
+CREATE INDEX IF NOT EXISTS idx_medication_names_key ON medication_names (name_key, medication_id);
+
+CREATE TRIGGER IF NOT EXISTS medication_names_on_insert AFTER INSERT ON medications BEGIN
+    INSERT OR IGNORE INTO medication_names (medication_id) VALUES (new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS medication_names_on_rename AFTER UPDATE OF name ON medications BEGIN
+    UPDATE medication_names SET name_key = NULL WHERE medication_id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS medication_names_on_delete AFTER DELETE ON medications BEGIN
+    DELETE FROM medication_names WHERE medication_id = old.id;
+END;
+
+INSERT OR IGNORE INTO medication_names (medication_id) SELECT id FROM medications;
+"""
+
+# External-content trigram index over medication_names.name_key
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS medication_names_fts USING fts5(
+    name_key, content='medication_names', content_rowid='medication_id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS medication_names_fts_insert AFTER INSERT ON medication_names BEGIN
+    INSERT INTO medication_names_fts (rowid, name_key) VALUES (new.medication_id, new.name_key);
+END;
+CREATE TRIGGER IF NOT EXISTS medication_names_fts_update AFTER UPDATE ON medication_names BEGIN
+    INSERT INTO medication_names_fts (medication_names_fts, rowid, name_key)
+        VALUES ('delete', old.medication_id, old.name_key);
+    INSERT INTO medication_names_fts (rowid, name_key) VALUES (new.medication_id, new.name_key);
+END;
+CREATE TRIGGER IF NOT EXISTS medication_names_fts_delete AFTER DELETE ON medication_names BEGIN
+    INSERT INTO medication_names_fts (medication_names_fts, rowid, name_key)
+        VALUES ('delete', old.medication_id, old.name_key);
+END;
+"""
+
+# Lowest id wins among equal keys; partial matches prefer the shortest (closest) key
+EXACT_SQL = "SELECT medication_id FROM medication_names WHERE name_key = ? ORDER BY medication_id LIMIT 1"
+PARTIAL_FTS_SQL = """
+    SELECT rowid FROM medication_names_fts WHERE name_key MATCH ?
+    ORDER BY length(name_key), rowid LIMIT 1
+"""
+PARTIAL_LIKE_SQL = """
+    SELECT medication_id FROM medication_names WHERE name_key LIKE ? ESCAPE '\\'
+    ORDER BY length(name_key), medication_id LIMIT 1
+"""
+
+# database file -> whether the trigram index exists
+_ready = {}
+
+
+def normalize_name(name):
+    """Lookup key for a medication name: "Tylenol® Extra Strength 500 mg" -> "tylenol extra strength"
+
+    Falls back to the unstripped key when the name is nothing but a strength.
+    """
+    text = unicodedata.normalize("NFKC", str(name or "")).casefold()
+    key = _SEPARATORS.sub(" ", _STRENGTH.sub(" ", text)).strip()
+    return key or _SEPARATORS.sub(" ", text).strip()
+
+
+def fts_query(key):
+    """FTS5 phrase query for a string (a substring match on a trigram index)"""
+    return '"' + key.replace('"', '""') + '"'
+
+
+def ensure_schema(conn):
+    """Create the name table, triggers and (if SQLite supports it) the trigram index.
+
+    Runs the DDL once per database file per process; returns whether the trigram
+    index is available.
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if path and path in _ready:
+        return _ready[path]
+
+    conn.executescript(SCHEMA)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'medication_names_fts'").fetchone():
+            conn.executescript(FTS_SCHEMA)
+            # Index the rows that already exist
+            conn.execute("INSERT INTO medication_names_fts (medication_names_fts) VALUES ('rebuild')")
+            conn.commit()
+        has_fts = True
+    except sqlite3.OperationalError:
+        # FTS5 or its trigram tokenizer (SQLite 3.34+) missing; partial matches use LIKE
+        has_fts = False
+
+    if path:
+        _ready[path] = has_fts
+    return has_fts
+
+
+def refresh(conn):
+    """Fill in keys for medications added or renamed since the last lookup"""
+    pending = conn.execute(
+        """
+        SELECT n.medication_id, m.name
+        FROM medication_names n
+        JOIN medications m ON m.id = n.medication_id
+        WHERE n.name_key IS NULL
+        """
+    ).fetchall()
+    if pending:
+        conn.executemany(
+            "UPDATE medication_names SET name_key = ? WHERE medication_id = ?",
+            [(normalize_name(name), med_id) for med_id, name in pending],
+        )
+        conn.commit()
+    return len(pending)
+
+
+def resolve_medication(conn, name, partial=True):
+    """(id, name) of the medication matching name, or None.
+
+    An exact normalized match always wins (lowest id among duplicates). With
+    partial=True, otherwise the medication whose key contains the query and is
+    shortest wins, so "metformin" picks "Metformin" over "Metformin ER".
+    """
+    has_fts = ensure_schema(conn)
+    refresh(conn)
+
+    key = normalize_name(name)
+    if not key:
+        return None
+
+    row = conn.execute(EXACT_SQL, (key,)).fetchone()
+    if row is None and partial:
+        # Trigrams need at least 3 characters
+        if has_fts and len(key) >= 3:
+            row = conn.execute(PARTIAL_FTS_SQL, (fts_query(key),)).fetchone()
+        else:
+            pattern = "%" + key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            row = conn.execute(PARTIAL_LIKE_SQL, (pattern,)).fetchone()
+    if row is None:
+        return None
+
+    found = conn.execute("SELECT id, name FROM medications WHERE id = ?", (row[0],)).fetchone()
+    return tuple(found) if found else None
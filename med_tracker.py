@@ -1,10 +1,10 @@
 # med_tracker.py - Clean AI Medication Tracker
 import streamlit as st
-import sqlite3
-import requests
+import tracing
 from datetime import datetime
-from med_agent import TrueMedicationAgent
-from symptom_db import get_medications_for_symptoms
+from health_probes import BackgroundProbe, check_fda, check_mcp, wait_all
+from med_names import ensure_schema
+from meds_store import MedsStore
 
 # HIDE STREAMLIT DEPLOY BUTTON
 hide_deploy_button = """
@@ -21,9 +21,10 @@ st.set_page_config(page_title="Agentic Med Tracker", layout="centered")
 st.title("🧠 Agentic AI Medication Tracker")
 
 
-# Initialize database
+# Initialize database (once per server process, not on every rerun)
+@st.cache_resource
 def init_db():
-    conn = sqlite3.connect("meds.db")
+    conn = tracing.connect("meds.db")
     c = conn.cursor()
 
     c.execute(
@@ -49,6 +50,9 @@ def init_db():
     """
     )
 
+    # Normalized name index used to resolve and dedup medication names
+    ensure_schema(conn)
+
     conn.commit()
     conn.close()
 
@@ -57,10 +61,20 @@ def init_db():
 init_db()
 
 
+# Query results are cached until one of the store's writes bumps its version
+@st.cache_resource
+def get_store():
+    return MedsStore("meds.db")
+
+
+store = get_store()
+
+
 # Initialize AI Agent
-# Initialize AI Agent
+# Created on first use: importing med_agent pulls in requests, the LLM backends and the MCP client
 @st.cache_resource
 def get_agent():
+    from med_agent import TrueMedicationAgent
 
     # ONLY use st.secrets - nothing else
     if "OPENAI_API_KEY" in st.secrets:
@@ -71,58 +85,52 @@ def get_agent():
     return TrueMedicationAgent(openai_key=api_key)
 
 
-agent = get_agent()
+# Health checks shared by all sessions; refreshed in the background at most once a minute
+@st.cache_resource
+def get_probes():
+    return {
+        "fda": BackgroundProbe(check_fda, ttl=60, name="fda"),
+        "mcp": BackgroundProbe(check_mcp, ttl=60, name="mcp"),
+    }
+
 
 # --- TABBED INTERFACE ---
-tab1, tab2, tab3, tab4 = st.tabs(
-    ["🏠 Dashboard", "🤖 Check Symptoms", "💊 Medications", "🔌 Status"]
+# Widgets on hidden pages lose their state; carry the symptom text across page switches
+if "symptoms_input" in st.session_state:
+    st.session_state.symptoms_input = st.session_state.symptoms_input
+
+# st.tabs runs every tab body on each rerun; only render (and query for) the selected one
+page = st.radio(
+    "Page",
+    ["🏠 Dashboard", "🤖 Check Symptoms", "💊 Medications", "🔌 Status"],
+    horizontal=True,
+    label_visibility="collapsed",
+    key="page",
 )
 
 # --- TAB 1: DASHBOARD ---
-with tab1:
+if page == "🏠 Dashboard":
     st.header("📊 Dashboard")
 
     # Quick stats
     col1, col2, col3 = st.columns(3)
+    meds = store.medications()
+    stats = store.dose_stats()
 
     with col1:
-        conn = sqlite3.connect("meds.db")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM medications")
-        med_count = c.fetchone()[0]
-        conn.close()
-        st.metric("Active Medications", med_count)
+        st.metric("Active Medications", len(meds))
 
     with col2:
-        conn = sqlite3.connect("meds.db")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM dose_logs WHERE DATE(taken_at) = DATE('now')")
-        today_doses = c.fetchone()[0]
-        conn.close()
-        st.metric("Doses Today", today_doses)
+        st.metric("Doses Today", stats["doses_today"])
 
     with col3:
-        conn = sqlite3.connect("meds.db")
-        c = conn.cursor()
-        c.execute(
-            "SELECT COUNT(*) FROM medications WHERE id NOT IN (SELECT medication_id FROM dose_logs WHERE DATE(taken_at) = DATE('now'))"
-        )
-        missed = c.fetchone()[0]
-        conn.close()
-        st.metric("Missed Today", missed)
+        st.metric("Missed Today", stats["missed_today"])
 
     # Today's schedule
     st.subheader("📅 Today's Schedule")
-    conn = sqlite3.connect("meds.db")
-    c = conn.cursor()
-    c.execute(
-        "SELECT id, name, dosage, frequency FROM medications"
-    )  # CHANGED: Added id
-    meds = c.fetchall()
-    conn.close()
 
     if meds:
-        for med_id, name, dosage, freq in meds:  # CHANGED: Unpack med_id
+        for med_id, name, dosage, freq, _ in meds:  # CHANGED: Unpack med_id
             col1, col2, col3 = st.columns([3, 2, 1])
             with col1:
                 st.write(f"**{name}**")
@@ -134,13 +142,7 @@ with tab1:
             with col3:
                 # CHANGED: Key uses med_id instead of name
                 if st.button("✅ Taken", key=f"dash_taken_{med_id}"):
-                    conn = sqlite3.connect("meds.db")
-                    c = conn.cursor()
-                    c.execute(
-                        "INSERT INTO dose_logs (medication_id) VALUES (?)", (med_id,)
-                    )
-                    conn.commit()
-                    conn.close()
+                    store.log_dose(med_id)
                     st.success(f"Logged {name}!")
                     st.rerun()
     else:
@@ -148,19 +150,7 @@ with tab1:
 
     # Recent activity
     st.subheader("📝 Recent Activity")
-    conn = sqlite3.connect("meds.db")
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT m.name, l.taken_at 
-        FROM dose_logs l
-        JOIN medications m ON l.medication_id = m.id
-        ORDER BY l.taken_at DESC
-        LIMIT 5
-    """
-    )
-    recent = c.fetchall()
-    conn.close()
+    recent = stats["recent"]
 
     if recent:
         for name, taken_at in recent:
@@ -169,7 +159,7 @@ with tab1:
         st.info("No recent doses logged")
 
 # --- TAB 2: SYMPTOM CHECKER ---
-with tab2:
+elif page == "🤖 Check Symptoms":
     st.header("🤖 AI Symptom Checker")
 
     st.write(
@@ -213,30 +203,23 @@ with tab2:
 
     # Process symptom analysis when button is clicked
     if analyze_clicked and symptoms:
-        with st.spinner("🔍 Analyzing symptoms..."):
+        # One trace per check; the Status tab's Performance panel breaks it down
+        with st.spinner("🔍 Analyzing symptoms..."), tracing.span("symptom_check"):
             # Get user's current medications for context
-            conn = sqlite3.connect("meds.db")
-            c = conn.cursor()
-            c.execute("SELECT name FROM medications")
-            user_meds = [row[0] for row in c.fetchall()]
-            conn.close()
+            user_meds = store.medication_names()
 
             try:
-                # 1. Get FDA medications (this is the working function)
-                fda_medications = get_medications_for_symptoms(symptoms)
+                # One analysis object computes the FDA lookup and AI analysis once each
+                analysis = get_agent().analyze(symptoms, user_meds)
+
+                # 1. Get FDA medications
+                fda_medications = analysis.fda_results
 
-                # 2. Get AI analysis (now actually used!)
+                # 2. Get AI analysis (reuses the same query, no second FDA lookup)
                 try:
-                    ai_analysis = agent.analyze_symptoms(symptoms, user_meds)
-
-                    # Check if we got real AI results
-                    if (
-                        ai_analysis
-                        and isinstance(ai_analysis, dict)
-                        and "ai_analysis" in ai_analysis
-                    ):
-                        ai_text = ai_analysis["ai_analysis"]
-                    else:
+                    ai_text = analysis.ai_analysis
+
+                    if not ai_text:
                         ai_text = (
                             "AI analysis completed. Review FDA recommendations above."
                         )
@@ -313,24 +296,22 @@ with tab2:
                             col1, col2 = st.columns([4, 1])
                             with col2:
                                 if st.button("➕ Add to My Meds", key=f"add_{i}"):
-                                    # Actually add to database
-                                    conn = sqlite3.connect("meds.db")
-                                    c = conn.cursor()
-                                    c.execute(
-                                        "INSERT INTO medications (name, dosage, frequency) VALUES (?, ?, ?)",
-                                        (
+                                    # FDA brand names often differ only in case or strength
+                                    existing = store.find_medication(med.get("name", ""))
+                                    if existing:
+                                        st.info(f"ℹ️ Already in your medications as {existing[1]}")
+                                    else:
+                                        # Actually add to database
+                                        store.add_medication(
                                             med.get("name", ""),
                                             "As directed",
                                             f"For {med.get('condition', 'general use')}",
-                                        ),
-                                    )
-                                    conn.commit()
-                                    conn.close()
+                                        )
 
-                                    st.success(
-                                        f"✅ Added {med.get('name', 'medication')}!"
-                                    )
-                                    st.rerun()
+                                        st.success(
+                                            f"✅ Added {med.get('name', 'medication')}!"
+                                        )
+                                        st.rerun()
 
                             st.divider()
                 else:
@@ -418,7 +399,7 @@ with tab2:
         )
 
 # --- TAB 3: MEDICATIONS ---
-with tab3:
+elif page == "💊 Medications":
     st.header("💊 Medication Management")
 
     # Auto-fill from AI suggestions
@@ -435,14 +416,7 @@ with tab3:
 
         if submitted:
             if name:
-                conn = sqlite3.connect("meds.db")
-                c = conn.cursor()
-                c.execute(
-                    "INSERT INTO medications (name, dosage, frequency) VALUES (?, ?, ?)",
-                    (name, dosage, frequency),
-                )
-                conn.commit()
-                conn.close()
+                store.add_medication(name, dosage, frequency)
 
                 # Clear auto-fill
                 if "auto_fill_med" in st.session_state:
@@ -455,11 +429,8 @@ with tab3:
 
     # List medications
     st.subheader("Your Medications")
-    conn = sqlite3.connect("meds.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM medications ORDER BY created_at DESC")
-    meds = c.fetchall()
-    conn.close()
+    # Newest first; the sort is stable, so same-second adds keep their order
+    meds = sorted(store.medications(), key=lambda med: med[4] or "", reverse=True)
 
     if meds:
         for med in meds:
@@ -478,24 +449,13 @@ with tab3:
 
                 with col2:
                     if st.button("✅ Taken Today", key=f"med_taken_{med_id}"):
-                        conn = sqlite3.connect("meds.db")
-                        c = conn.cursor()
-                        c.execute(
-                            "INSERT INTO dose_logs (medication_id) VALUES (?)",
-                            (med_id,),
-                        )
-                        conn.commit()
-                        conn.close()
+                        store.log_dose(med_id)
                         st.success(f"Logged dose for {name}!")
                         st.rerun()
 
                 with col3:
                     if st.button("🗑️", key=f"delete_{med_id}"):
-                        conn = sqlite3.connect("meds.db")
-                        c = conn.cursor()
-                        c.execute("DELETE FROM medications WHERE id = ?", (med_id,))
-                        conn.commit()
-                        conn.close()
+                        store.delete_medication(med_id)
                         st.success(f"Deleted {name}")
                         st.rerun()
 
@@ -504,7 +464,7 @@ with tab3:
         st.info("No medications yet. Add your first medication above!")
 
 # --- TAB 4: STATUS ---
-with tab4:
+elif page == "🔌 Status":
     # AI Status - ONLY checks st.secrets
     st.subheader("🧠 AI Status")
 
@@ -522,27 +482,26 @@ with tab4:
 
     # FDA API Status
     st.subheader("💊 FDA API Status")
-    try:
-        test_response = requests.get(
-            "https://api.fda.gov/drug/label.json?limit=1", timeout=3
-        )
-        if test_response.status_code == 200:
-            st.success("✅ FDA API Connected")
-            st.caption("Medication search active")
-        else:
-            st.warning(f"⚠️ FDA API Issue: Status {test_response.status_code}")
-    except Exception as e:
-        st.error(f"❌ FDA API Error: {str(e)[:50]}...")
+    # Both checks start at once; waits (3s at most) only on the first visit,
+    # later reruns show the cached results
+    statuses = wait_all(get_probes(), timeout=3)
+    fda_status = statuses["fda"]
+    if fda_status is None:
+        st.info("⏳ Checking FDA API...")
+        st.caption("Refresh to see the result")
+    elif fda_status.error:
+        st.error(f"❌ FDA API Error: {fda_status.error[:50]}...")
         st.caption("Check internet connection")
+    elif fda_status.value == 200:
+        st.success("✅ FDA API Connected")
+        st.caption("Medication search active")
+    else:
+        st.warning(f"⚠️ FDA API Issue: Status {fda_status.value}")
 
     # Database Status
     st.subheader("💾 Database Status")
     try:
-        conn = sqlite3.connect("meds.db")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM medications")
-        med_count = c.fetchone()[0]
-        conn.close()
+        med_count = len(store.medications())
         st.success(f"✅ Database Connected ({med_count} medications)")
         st.caption("meds.db active")
     except Exception as e:
@@ -550,43 +509,60 @@ with tab4:
 
     # MCP Server Status (if exists)
     st.subheader("🔧 MCP Server")
-    try:
-        if hasattr(agent, "mcp_client") and agent.mcp_client.connected:
-            st.success("✅ MCP Server Connected")
-            st.caption("File tools available")
-        else:
-            st.info("ℹ️ MCP Server Not Detected")
-            st.caption("Optional for file operations")
-    except:
-        st.info("ℹ️ MCP Not Configured")
-        st.caption("Optional component")
+    mcp_status = statuses["mcp"]
+    if mcp_status is None:
+        st.info("⏳ Checking MCP Server...")
+        st.caption("Refresh to see the result")
+    elif mcp_status.value:
+        st.success("✅ MCP Server Connected")
+        st.caption("File tools available")
+    else:
+        st.info("ℹ️ MCP Server Not Detected")
+        st.caption("Optional for file operations")
+
+    # Performance
+    st.subheader("⏱️ Performance")
+    latencies = tracing.latency_summary()
+    if latencies:
+        st.dataframe(latencies, use_container_width=True, hide_index=True)
+
+        # Sampled traces only; pick the slowest recent symptom check
+        traces = tracing.recent_traces("symptom_check")
+        if traces:
+            slowest = max(traces, key=lambda rows: rows[0][1].duration_ms)
+            with st.expander(f"Slowest recent symptom check ({slowest[0][1].duration_ms:.0f}ms)"):
+                st.code(
+                    "\n".join(
+                        f"{'  ' * depth}{s.name:<{60 - 2 * depth}} {s.duration_ms:9.1f}ms"
+                        + (" ❌" if s.error else "")
+                        for depth, s in slowest
+                    )
+                )
+    else:
+        st.info("ℹ️ No timings yet")
+        st.caption("Run a symptom check to record latencies")
+    st.caption(
+        f"Tracing {tracing.tracer.sample_rate:.0%} of requests"
+        + (f", exporting to {tracing.EXPORTER}" if tracing.tracer.exporter else "")
+    )
 
     # Quick Stats
     st.subheader("📊 Quick Stats")
     col1, col2 = st.columns(2)
+    stats = store.dose_stats()
 
     with col1:
-        conn = sqlite3.connect("meds.db")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM dose_logs WHERE DATE(taken_at) = DATE('now')")
-        today_doses = c.fetchone()[0]
-        conn.close()
-        st.metric("Doses Today", today_doses)
+        st.metric("Doses Today", stats["doses_today"])
 
     with col2:
-        conn = sqlite3.connect("meds.db")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(DISTINCT DATE(taken_at)) FROM dose_logs")
-        active_days = c.fetchone()[0]
-        conn.close()
-        st.metric("Tracking Days", active_days)
+        st.metric("Tracking Days", stats["tracking_days"])
 
     # Health Tips
     st.subheader("💡 Tips")
     st.info(
         """
-    • Check symptoms in Tab 2 for AI + FDA analysis
-    • Add medications in Tab 3 for tracking
+    • Check symptoms on the Check Symptoms page for AI + FDA analysis
+    • Add medications on the Medications page for tracking
     • Log doses daily for best insights
     • Export data before major updates
     """
@@ -608,6 +584,8 @@ with col1:
 
 with col2:
     if st.button("🔄 Refresh App"):
+        # Also picks up writes made outside the app (e.g. doses logged over MCP)
+        store.invalidate()
         st.rerun()
 
 # Session state initialization
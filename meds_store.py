@@ -0,0 +1,128 @@
+# meds_store.py - Read-through cache for the tracker's meds.db queries
+import threading
+from datetime import datetime, timezone
+
+import tracing
+from med_names import resolve_medication
+
+# Every read the tracker issues; bench_meds_db.py times these same statements
+MEDICATIONS_SQL = "SELECT id, name, dosage, frequency, created_at FROM medications ORDER BY id"
+DOSES_TODAY_SQL = "SELECT COUNT(*) FROM dose_logs WHERE DATE(taken_at) = DATE('now')"
+MISSED_TODAY_SQL = (
+    "SELECT COUNT(*) FROM medications WHERE id NOT IN "
+    "(SELECT medication_id FROM dose_logs WHERE DATE(taken_at) = DATE('now'))"
+)
+TRACKING_DAYS_SQL = "SELECT COUNT(DISTINCT DATE(taken_at)) FROM dose_logs"
+RECENT_DOSES_SQL = """
+    SELECT m.name, l.taken_at
+    FROM dose_logs l
+    JOIN medications m ON l.medication_id = m.id
+    ORDER BY l.taken_at DESC
+    LIMIT 5
+"""
+
+
+class MedsStore:
+    """Cached reads of medications and dose stats, invalidated by a write version.
+
+    Reads are served from memory until a write through this store (add, delete,
+    log dose) or invalidate() bumps the version, so reruns that change nothing
+    never open meds.db. Dose stats are also keyed by the UTC date that SQLite's
+    DATE('now') uses, so "today" rolls over at midnight. Writers outside this
+    process (e.g. the MCP server's log_dose tool) are only picked up after
+    invalidate().
+    """
+
+    def __init__(self, db_path="meds.db"):
+        self.db_path = db_path
+        self.version = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def _cached(self, name, key, load):
+        with self._lock:
+            entry = self._cache.get(name)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+        # Tagged with the version seen before loading: a write that lands mid-read
+        # leaves this entry stale, so the next read reloads
+        value = load()
+        with self._lock:
+            self._cache[name] = (key, value)
+        return value
+
+    def _connect(self):
+        return tracing.connect(self.db_path)
+
+    # --- Reads ---
+
+    def medications(self):
+        """(id, name, dosage, frequency, created_at) rows in insertion order"""
+        return self._cached("medications", self.version, self._load_medications)
+
+    def medication_names(self):
+        return [name for _, name, _, _, _ in self.medications()]
+
+    def dose_stats(self):
+        """Today's dose and missed counts, tracking days and the 5 latest doses"""
+        today = datetime.now(timezone.utc).date()
+        return self._cached("dose_stats", (self.version, today), self._load_dose_stats)
+
+    def find_medication(self, name):
+        """(id, name) of a medication with the same normalized name, or None"""
+        conn = self._connect()
+        try:
+            return resolve_medication(conn, name, partial=False)
+        finally:
+            conn.close()
+
+    def _load_medications(self):
+        conn = self._connect()
+        try:
+            return tuple(conn.execute(MEDICATIONS_SQL).fetchall())
+        finally:
+            conn.close()
+
+    def _load_dose_stats(self):
+        conn = self._connect()
+        try:
+            doses_today = conn.execute(DOSES_TODAY_SQL).fetchone()[0]
+            missed_today = conn.execute(MISSED_TODAY_SQL).fetchone()[0]
+            tracking_days = conn.execute(TRACKING_DAYS_SQL).fetchone()[0]
+            recent = tuple(conn.execute(RECENT_DOSES_SQL).fetchall())
+        finally:
+            conn.close()
+        return {
+            "doses_today": doses_today,
+            "missed_today": missed_today,
+            "tracking_days": tracking_days,
+            "recent": recent,
+        }
+
+    # --- Writes (each one bumps the version) ---
+
+    def _write(self, sql, params):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            conn.close()
+            self.invalidate()
+
+    def add_medication(self, name, dosage, frequency):
+        return self._write(
+            "INSERT INTO medications (name, dosage, frequency) VALUES (?, ?, ?)",
+            (name, dosage, frequency),
+        )
+
+    def delete_medication(self, med_id):
+        self._write("DELETE FROM medications WHERE id = ?", (med_id,))
+
+    def log_dose(self, med_id):
+        return self._write("INSERT INTO dose_logs (medication_id) VALUES (?)", (med_id,))
@@ -0,0 +1,264 @@
+# metrics.py - In-process Prometheus metrics (counters, gauges, histograms)
+#
+# Label children are created once and cached, and each thread updates its own
+# slots (summed at scrape time), so a hot-path update is a dict lookup plus an
+# add with no lock. Render the registry in the Prometheus text exposition
+# format with generate_latest().
+import math
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans sub-millisecond SQLite reads to multi-second exports
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+
+    def collect(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """The child for these label values (created once, then cached)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        """(suffix, labels dict, value) tuples for exposition"""
+        with self._lock:
+            children = {key: child for key, child in self._children.items()
+                        if all(isinstance(v, str) for v in key)}
+        for key, child in sorted(children.items()):
+            yield from child._samples(dict(zip(self.labelnames, key)))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _Shards:
+    """Per-thread value slots, summed at scrape time, so updates take no lock.
+
+    Hot paths read `local.shard` directly and only call new() on a thread's
+    first update.
+    """
+
+    __slots__ = ("size", "local", "_shards", "_lock")
+
+    def __init__(self, size):
+        self.size = size
+        self.local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def new(self):
+        shard = [0] * self.size
+        with self._lock:
+            self._shards.append(shard)
+        self.local.shard = shard
+        return shard
+
+    def totals(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self.size
+
+
+class _CounterChild:
+    __slots__ = ("_shards", "_local")
+
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._local = self._shards.local
+
+    def inc(self, amount=1):
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            self._shards.new()[0] += amount
+
+    def get(self):
+        return self._shards.totals()[0]
+
+    def _samples(self, labels):
+        yield "", labels, self.get()
+
+
+class Counter(_Metric):
+    """Monotonic count; the name always ends in _total"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        super().__init__(name if name.endswith("_total") else f"{name}_total", documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class _GaugeChild:
+    """inc/dec are sharded like counters; set() and set_function() replace the value"""
+
+    __slots__ = ("value", "function", "_shards", "_local")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self._shards = _Shards(1)
+        self._local = self._shards.local
+
+    def inc(self, amount=1):
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            self._shards.new()[0] += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time"""
+        self.function = function
+
+    def _samples(self, labels):
+        if self.function:
+            yield "", labels, self.function()
+        else:
+            yield "", labels, self.value + self._shards.totals()[0]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (in-flight requests, ratios)"""
+
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "_shards", "_local")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket, then +Inf, then the sum
+        self._shards = _Shards(len(upper_bounds) + 2)
+        self._local = self._shards.local
+
+    def observe(self, value):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shards.new()
+        shard[bisect_left(self.upper_bounds, value)] += 1
+        shard[-1] += value
+
+    def _samples(self, labels):
+        totals = self._shards.totals()
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (math.inf,), totals):
+            cumulative += count
+            yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+        yield "_count", labels, cumulative
+        yield "_sum", labels, totals[-1]
+
+
+class Histogram(_Metric):
+    """Bucketed observations (latencies in seconds by default)"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.upper_bounds = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def generate_latest(registry=REGISTRY):
+    """All metrics in the Prometheus text exposition format (0.0.4)"""
+    return "\n".join(metric.render() for metric in registry.collect()) + "\n"
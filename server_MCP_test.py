@@ -1,24 +1,98 @@
 # mcp_server.py
 import asyncio
 import json
-import uuid
+import os
+import time
 from contextlib import asynccontextmanager
-from typing import Dict
 from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
+from session_broker import DROPPED, GONE, REJECTED, get_broker
+from tool_registry import ToolRegistry
 
-# Store active sessions
-sessions: Dict[str, asyncio.Queue] = {}
+# SSE timing (environment overridable); session limits live in session_broker
+PING_INTERVAL = int(os.getenv("MCP_SSE_PING", "15"))
+SWEEP_INTERVAL = float(os.getenv("MCP_SWEEP_INTERVAL", "30"))
+
+# Largest count_primes limit accepted (the sieve needs this many bytes)
+MAX_PRIME_LIMIT = int(os.getenv("MCP_MAX_PRIME_LIMIT", "50000000"))
+
+# Sessions live in a broker: "memory" (one worker) or "sqlite" (shared by workers)
+broker = get_broker()
+
+# Tools callable through tools/call (and listed by tools/list)
+registry = ToolRegistry()
+
+
+@registry.register(
+    description="Basic arithmetic on two numbers",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "operation": {"type": "string", "enum": ["add", "subtract", "multiply", "divide"]},
+            "a": {"type": "number"},
+            "b": {"type": "number"},
+        },
+    },
+)
+def calculator(operation="add", a=0, b=0):
+    if operation == "add":
+        result = a + b
+    elif operation == "subtract":
+        result = a - b
+    elif operation == "multiply":
+        result = a * b
+    else:
+        result = a / b if b != 0 else "Error: Division by zero"
+
+    return {
+        "result": result,
+        "operation": f"{a} + {b}" if operation == "add" else f"{a} {operation} {b}",
+        "a": a,
+        "b": b,
+    }
+
+
+@registry.register(
+    description="Count the primes below a limit (CPU-heavy, runs in the process pool)",
+    input_schema={
+        "type": "object",
+        # The sieve holds one byte per number below limit
+        "properties": {"limit": {"type": "integer", "minimum": 0, "maximum": MAX_PRIME_LIMIT}},
+        "required": ["limit"],
+    },
+    cpu_bound=True,
+)
+def count_primes(limit):
+    if limit < 3:
+        return {"limit": limit, "primes": 0}
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b"\x00\x00"
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytearray(len(range(i * i, limit, i)))
+    return {"limit": limit, "primes": sum(sieve)}
+
+
+async def sweep_sessions():
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        evicted = await broker.evict_idle()
+        if evicted:
+            print(f"Evicted {evicted} idle sessions")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("MCP Server starting on http://localhost:8000")
+    print(f"MCP Server starting on http://localhost:8000 (pid {os.getpid()}, {broker.name} sessions)")
+    await broker.start()
+    sweeper = asyncio.create_task(sweep_sessions())
     yield
     # Cleanup on shutdown
-    sessions.clear()
+    sweeper.cancel()
+    registry.shutdown()
+    await broker.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -28,102 +102,69 @@ app = FastAPI(lifespan=lifespan)
 @app.get("/sse")
 async def sse_endpoint(request: Request):
     """Initial SSE endpoint that provides a private message channel"""
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = asyncio.Queue()
+    session_id = await broker.create_session()
+    if session_id is None:
+        return JSONResponse({"error": "Too many sessions"}, status_code=503)
 
     async def event_generator():
         # Send the private channel URL to the client
         yield {"event": "endpoint", "data": f"/messages/?session_id={session_id}"}
 
-    return EventSourceResponse(event_generator())
+    return EventSourceResponse(event_generator(), ping=PING_INTERVAL)
 
 
 # Channel 2: Private message channel for this session
 @app.get("/messages/")
 async def messages_endpoint(request: Request, session_id: str):
     """Private SSE channel for a specific session"""
-    if session_id not in sessions:
+    if not await broker.exists(session_id):
         return {"error": "Invalid session"}, 404
 
     async def event_generator():
-        queue = sessions[session_id]
+        stream = broker.subscribe(session_id)
         try:
-            while True:
-                # Wait for messages to send to this client
-                message = await queue.get()
-                if message == "TERMINATE":
-                    break
+            # Wait for messages to send to this client
+            async for message in stream:
                 yield {"data": json.dumps(message)}
         except asyncio.CancelledError:
             print(f"Client disconnected from session {session_id}")
         finally:
-            # Cleanup
-            if session_id in sessions:
-                del sessions[session_id]
+            # Cleanup (the broker removes the session)
+            await stream.aclose()
 
-    return EventSourceResponse(event_generator())
+    # Pings keep proxies from closing quiet streams and surface dead clients
+    return EventSourceResponse(event_generator(), ping=PING_INTERVAL)
 
 
-# Endpoint to receive calculation requests
+# Endpoint to receive tool calls
 @app.post("/messages/")
 async def post_message(request: Request, session_id: str):
-    """Receive calculation requests and send results via SSE"""
-    if session_id not in sessions:
+    """Receive JSON-RPC requests (single or batch array) and send results via SSE"""
+    if not await broker.exists(session_id):
         return {"error": "Invalid session"}, 404
 
     try:
         data = await request.json()
-        print(f"Received request for session {session_id}: {data}")
-
-        # Parse the calculator request (following your JSON-RPC structure)
-        if data.get("method") == "tools/call":
-            params = data.get("params", {})
-            if params.get("name") == "calculator":
-                args = params.get("arguments", {})
-                operation = args.get("operation", "add")
-                a = args.get("a", 0)
-                b = args.get("b", 0)
-
-                # Perform calculation
-                if operation == "add":
-                    result = a + b
-                elif operation == "subtract":
-                    result = a - b
-                elif operation == "multiply":
-                    result = a * b
-                elif operation == "divide":
-                    result = a / b if b != 0 else "Error: Division by zero"
-                else:
-                    result = "Error: Unknown operation"
-
-                # Prepare the result message
-                result_message = {
-                    "jsonrpc": "2.0",
-                    "id": data.get("id", 1),
-                    "result": {
-                        "name": "calculator",
-                        "content": {
-                            "result": result,
-                            "operation": (
-                                f"{a} + {b}"
-                                if operation == "add"
-                                else f"{a} {operation} {b}"
-                            ),
-                            "a": a,
-                            "b": b,
-                        },
-                    },
-                }
-
-                # Send result to client via SSE
-                await sessions[session_id].put(result_message)
-                print(f"Sent result to session {session_id}: {result}")
-
-                return {"status": "accepted", "result_queued": True}
-
-        # If not a calculator request
-        await sessions[session_id].put({"error": "Unknown method"})
-        return {"status": "accepted", "message": "Request queued"}
+        calls = len(data) if isinstance(data, list) else 1
+        print(f"Received {calls} request(s) for session {session_id}")
+
+        started = time.perf_counter()
+        response = await registry.dispatch(data)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        # A batch is answered with one SSE message holding the response array
+        outcome = await broker.publish(session_id, response)
+        if outcome == GONE:
+            # The SSE channel closed while the request was running
+            return JSONResponse({"error": "Session closed"}, status_code=404)
+        if outcome == REJECTED:
+            return queue_full_response()
+
+        result = {"status": "accepted", "result_queued": True, "calls": calls, "elapsed_ms": elapsed_ms}
+        if outcome == DROPPED:
+            # drop_new discarded the result; the call ran but the client won't see it
+            result.update(result_queued=False, dropped=True, policy=broker.overflow_policy)
+        return result
 
     except json.JSONDecodeError:
         return {"error": "Invalid JSON"}, 400
@@ -132,15 +173,33 @@ async def post_message(request: Request, session_id: str):
         return {"error": str(e)}, 500
 
 
+def queue_full_response():
+    return JSONResponse(
+        {"error": "Session queue full", "policy": broker.overflow_policy},
+        status_code=429,
+    )
+
+
+@app.get("/stats")
+async def session_stats():
+    """Session counts and overflow/eviction totals"""
+    return {
+        **await broker.stats(),
+        "limits": {**broker.limits(), "ping_interval": PING_INTERVAL},
+    }
+
+
 # Root endpoint for testing
 @app.get("/")
 async def root():
     return {
         "message": "MCP Server with Calculator",
+        "tools": [tool["name"] for tool in registry.list_tools()],
         "endpoints": {
             "sse": "GET /sse - Get SSE session",
             "messages": "GET /messages/?session_id={id} - Private message channel",
-            "post": "POST /messages/?session_id={id} - Send calculation request",
+            "post": "POST /messages/?session_id={id} - Send a JSON-RPC request or batch array",
+            "stats": "GET /stats - Session and queue statistics",
         },
         "example": {
             "calculator_request": {
@@ -151,7 +210,16 @@ async def root():
                     "name": "calculator",
                     "arguments": {"operation": "add", "a": 5, "b": 3},
                 },
-            }
+            },
+            "batch_request": [
+                {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+                {
+                    "jsonrpc": "2.0",
+                    "id": 2,
+                    "method": "tools/call",
+                    "params": {"name": "count_primes", "arguments": {"limit": 100000}},
+                },
+            ],
         },
     }
 
@@ -159,4 +227,16 @@ async def root():
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    # MCP_WORKERS=auto runs one worker per CPU core (needs a shared broker)
+    workers = os.getenv("MCP_WORKERS", "1")
+    workers = (os.cpu_count() or 1) if workers == "auto" else int(workers)
+    if workers > 1 and broker.name == "memory":
+        print("In-memory sessions cannot be shared between workers; "
+              "set MCP_SESSION_BROKER=sqlite. Starting 1 worker.")
+        workers = 1
+
+    if workers > 1:
+        # Workers import the app themselves, so pass it by import string
+        uvicorn.run("server_MCP_test:app", host="0.0.0.0", port=8000, log_level="info", workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
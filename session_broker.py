@@ -0,0 +1,416 @@
+# session_broker.py - Session and message brokers for the SSE tool server
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict
+
+# Session limits (environment overridable)
+QUEUE_SIZE = int(os.getenv("MCP_SESSION_QUEUE_SIZE", "100"))
+OVERFLOW_POLICY = os.getenv("MCP_QUEUE_OVERFLOW", "drop_oldest")
+OVERFLOW_POLICIES = ("drop_oldest", "drop_new", "reject")
+IDLE_TTL = float(os.getenv("MCP_SESSION_IDLE_TTL", "300"))
+MAX_SESSIONS = int(os.getenv("MCP_MAX_SESSIONS", "1000"))
+
+# SessionBroker.publish outcomes
+QUEUED = "queued"
+DROPPED = "dropped"      # queue full under drop_new: the message was discarded
+REJECTED = "rejected"    # queue full under reject: the caller should back off
+GONE = "gone"            # the session does not exist (never did, or just closed)
+
+
+class Session:
+    """One client session: a bounded outbound queue plus idle tracking"""
+
+    __slots__ = ("queue", "last_active", "connected", "dropped")
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.last_active = time.monotonic()
+        self.connected = False
+        self.dropped = 0
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def offer(self, message, policy=OVERFLOW_POLICY):
+        """Queue a message without blocking; returns False if it was not queued"""
+        self.touch()
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if policy != "drop_oldest":
+                return False
+            # Slow consumer: discard the oldest message to make room
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            return True
+
+    def is_idle(self, now, ttl):
+        # Connected streams are cleaned up on disconnect; only orphans expire
+        return not self.connected and now - self.last_active > ttl
+
+
+class SessionBroker(ABC):
+    """Holds sessions and their pending messages for the SSE server.
+
+    `publish` is called by whichever worker receives the POST; `subscribe`
+    streams a session's messages on whichever worker holds its SSE channel.
+    """
+
+    name = "base"
+
+    def __init__(self, queue_size=None, overflow_policy=None, idle_ttl=None, max_sessions=None):
+        self.queue_size = queue_size or QUEUE_SIZE
+        self.overflow_policy = overflow_policy or OVERFLOW_POLICY
+        self.idle_ttl = idle_ttl or IDLE_TTL
+        self.max_sessions = max_sessions or MAX_SESSIONS
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {self.overflow_policy}")
+        # Per-process totals
+        self.counters = {"created": 0, "evicted": 0, "rejected_sessions": 0}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def create_session(self):
+        """New session id, or None when the session limit is reached"""
+
+    @abstractmethod
+    async def exists(self, session_id):
+        """Whether the session is still open"""
+
+    @abstractmethod
+    async def publish(self, session_id, message):
+        """Queue a message; returns QUEUED, DROPPED, REJECTED or GONE"""
+
+    @abstractmethod
+    def subscribe(self, session_id):
+        """Async iterator over the session's messages; removes the session when done"""
+
+    @abstractmethod
+    async def evict_idle(self):
+        """Remove idle sessions; returns how many were evicted"""
+
+    @abstractmethod
+    async def stats(self):
+        """Session, queue and drop counts"""
+
+    def limits(self):
+        return {
+            "broker": self.name,
+            "max_sessions": self.max_sessions,
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "idle_ttl": self.idle_ttl,
+        }
+
+
+class InMemoryBroker(SessionBroker):
+    """Sessions in this process only (single uvicorn worker)"""
+
+    name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sessions: Dict[str, Session] = {}
+        self.dropped_closed = 0
+
+    async def create_session(self):
+        if len(self.sessions) >= self.max_sessions and not await self.evict_idle():
+            self.counters["rejected_sessions"] += 1
+            return None
+
+        session_id = str(uuid.uuid4())
+        self.sessions[session_id] = Session(self.queue_size)
+        self.counters["created"] += 1
+        return session_id
+
+    async def exists(self, session_id):
+        return session_id in self.sessions
+
+    async def publish(self, session_id, message):
+        session = self.sessions.get(session_id)
+        if session is None:
+            return GONE
+        if session.offer(message, self.overflow_policy):
+            return QUEUED
+        return DROPPED if self.overflow_policy == "drop_new" else REJECTED
+
+    async def subscribe(self, session_id):
+        session = self.sessions[session_id]
+        session.connected = True
+        session.touch()
+        try:
+            while True:
+                message = await session.queue.get()
+                session.touch()
+                if message == "TERMINATE":
+                    return
+                yield message
+        finally:
+            self._remove(session_id)
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        expired = [sid for sid, s in self.sessions.items() if s.is_idle(now, self.idle_ttl)]
+        for sid in expired:
+            self._remove(sid)
+        self.counters["evicted"] += len(expired)
+        return len(expired)
+
+    def _remove(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.dropped_closed += session.dropped
+
+    async def stats(self):
+        return {
+            "active_sessions": len(self.sessions),
+            "connected_sessions": sum(1 for s in self.sessions.values() if s.connected),
+            "queued_messages": sum(s.queue.qsize() for s in self.sessions.values()),
+            "dropped_messages": self.dropped_closed + sum(s.dropped for s in self.sessions.values()),
+            **self.counters,
+        }
+
+
+class SQLiteBroker(SessionBroker):
+    """Sessions and messages in a shared SQLite file, usable from many workers.
+
+    Subscribers poll with a short adaptive interval and refresh the session's
+    last_active as a heartbeat, so sessions of crashed workers expire too.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path=None, poll_interval=None, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path or os.getenv("MCP_BROKER_DB", "mcp_sessions.db")
+        self.poll_interval = poll_interval or float(os.getenv("MCP_BROKER_POLL", "0.05"))
+        self.heartbeat = min(10.0, self.idle_ttl / 3)
+        self._local = threading.local()
+        self._init_db()
+
+    def _conn(self):
+        # One connection per thread (calls run in the default executor)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                created REAL NOT NULL,
+                last_active REAL NOT NULL,
+                connected INTEGER NOT NULL DEFAULT 0,
+                dropped INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, seq);
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active);
+        """)
+
+    async def create_session(self):
+        session_id = await asyncio.to_thread(self._create)
+        if session_id is None:
+            self.counters["rejected_sessions"] += 1
+        else:
+            self.counters["created"] += 1
+        return session_id
+
+    def _create(self):
+        now = time.time()
+        with self._transaction() as conn:
+            (count,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            if count >= self.max_sessions:
+                evicted = self._evict(conn, now)
+                self.counters["evicted"] += evicted
+                if not evicted:
+                    return None
+
+            session_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO sessions (id, created, last_active) VALUES (?, ?, ?)",
+                (session_id, now, now),
+            )
+            return session_id
+
+    async def exists(self, session_id):
+        return await asyncio.to_thread(self._exists, session_id)
+
+    def _exists(self, session_id):
+        row = self._conn().execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row is not None
+
+    async def publish(self, session_id, message):
+        return await asyncio.to_thread(self._publish, session_id, json.dumps(message))
+
+    def _publish(self, session_id, payload):
+        now = time.time()
+        with self._transaction() as conn:
+            if not conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone():
+                return GONE
+
+            (queued,) = conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if queued >= self.queue_size:
+                conn.execute("UPDATE sessions SET dropped = dropped + 1 WHERE id = ?", (session_id,))
+                if self.overflow_policy == "drop_new":
+                    return DROPPED
+                if self.overflow_policy == "reject":
+                    return REJECTED
+                conn.execute(
+                    "DELETE FROM messages WHERE seq = "
+                    "(SELECT MIN(seq) FROM messages WHERE session_id = ?)",
+                    (session_id,),
+                )
+
+            conn.execute(
+                "INSERT INTO messages (session_id, payload) VALUES (?, ?)", (session_id, payload)
+            )
+            conn.execute("UPDATE sessions SET last_active = ? WHERE id = ?", (now, session_id))
+            return QUEUED
+
+    async def subscribe(self, session_id):
+        await asyncio.to_thread(self._set_connected, session_id)
+        delay = min_delay = 0.005
+        last_heartbeat = time.monotonic()
+        try:
+            while True:
+                heartbeat = time.monotonic() - last_heartbeat >= self.heartbeat
+                alive, rows = await asyncio.to_thread(self._take, session_id, heartbeat)
+                if heartbeat:
+                    last_heartbeat = time.monotonic()
+                if not alive:
+                    return
+
+                for payload in rows:
+                    message = json.loads(payload)
+                    if message == "TERMINATE":
+                        return
+                    yield message
+
+                if rows:
+                    delay = min_delay
+                else:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.poll_interval)
+        finally:
+            # Shielded: on client disconnect the server cancels this task, and
+            # an unshielded await here would be cancelled before the delete ran
+            await asyncio.shield(asyncio.to_thread(self._delete, session_id))
+
+    def _set_connected(self, session_id):
+        self._conn().execute(
+            "UPDATE sessions SET connected = 1, last_active = ? WHERE id = ?",
+            (time.time(), session_id),
+        )
+
+    def _take(self, session_id, heartbeat):
+        """Pop pending messages for a session; returns (session still exists, payloads)"""
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT seq, payload FROM messages WHERE session_id = ? ORDER BY seq LIMIT 100",
+            (session_id,),
+        ).fetchall()
+        if not rows and not heartbeat:
+            alive = conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            return alive is not None, []
+
+        with self._transaction() as conn:
+            if rows:
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq <= ?",
+                    (session_id, rows[-1][0]),
+                )
+            cursor = conn.execute(
+                "UPDATE sessions SET last_active = ? WHERE id = ?", (time.time(), session_id)
+            )
+        return cursor.rowcount > 0, [payload for _, payload in rows]
+
+    def _delete(self, session_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    async def evict_idle(self):
+        evicted = await asyncio.to_thread(self._evict_now)
+        self.counters["evicted"] += evicted
+        return evicted
+
+    def _evict_now(self):
+        with self._transaction() as conn:
+            return self._evict(conn, time.time())
+
+    def _evict(self, conn, now):
+        # Connected subscribers heartbeat, so anything this stale is orphaned
+        cursor = conn.execute("DELETE FROM sessions WHERE last_active < ?", (now - self.idle_ttl,))
+        if cursor.rowcount:
+            conn.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT id FROM sessions)")
+        return cursor.rowcount
+
+    async def stats(self):
+        return await asyncio.to_thread(self._stats)
+
+    def _stats(self):
+        conn = self._conn()
+        active, connected, dropped = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(connected), 0), COALESCE(SUM(dropped), 0) FROM sessions"
+        ).fetchone()
+        (queued,) = conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+        return {
+            "active_sessions": active,
+            "connected_sessions": connected,
+            "queued_messages": queued,
+            "dropped_messages": dropped,
+            # Counters below are for this worker process only
+            "worker_pid": os.getpid(),
+            **self.counters,
+        }
+
+
+BROKERS = {
+    "memory": InMemoryBroker,
+    "sqlite": SQLiteBroker,
+}
+
+
+def get_broker(name=None, **kwargs):
+    """Build a broker by name (or MCP_SESSION_BROKER env, default memory)"""
+    name = (name or os.getenv("MCP_SESSION_BROKER", "memory")).lower()
+    if name not in BROKERS:
+        raise ValueError(f"Unknown session broker '{name}'. Available: {', '.join(BROKERS)}")
+    return BROKERS[name](**kwargs)
@@ -1,38 +1,50 @@
 # simple_llm.py - Simple LLM Wrapper
 import os
+from llm_backends import DEFAULT_SYSTEM_PROMPT, get_backend, run_sync
 
 class SimpleMedAI:
     """Simple AI for medical reasoning"""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, backend=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.has_llm = bool(self.api_key)
         
-        if self.has_llm:
+        # backend may be an LLMBackend instance, a backend name, or None (LLM_BACKEND env / OpenAI key)
+        if backend is None or isinstance(backend, str):
             try:
-                from openai import OpenAI
-                self.client = OpenAI(api_key=self.api_key)
-                self.model = "gpt-3.5-turbo"
-            except ImportError:
-                self.has_llm = False
+                backend = get_backend(backend, api_key=self.api_key)
+            except Exception as e:
+                # Missing client library, unknown LLM_BACKEND or a client that fails to build
+                print(f"LLM backend unavailable, using basic analysis: {e}")
+                backend = None
+        
+        self.backend = backend
+        self.has_llm = backend is not None
+        self.model = backend.model if backend else None
     
     def analyze_symptoms(self, symptoms_text, user_medications=None):
         """Analyze symptoms with AI"""
         if not self.has_llm:
             return self._basic_analysis(symptoms_text, user_medications)
         
+        try:
+            return run_sync(self.analyze_symptoms_async(symptoms_text, user_medications))
+        except Exception:
+            # Includes TimeoutError when the backend does not answer within LLM_TIMEOUT
+            return self._basic_analysis(symptoms_text, user_medications)
+    
+    async def analyze_symptoms_async(self, symptoms_text, user_medications=None):
+        """Analyze symptoms with AI (async; identical concurrent prompts share one call)"""
+        if not self.has_llm:
+            return self._basic_analysis(symptoms_text, user_medications)
+        
         try:
             prompt = self._build_prompt(symptoms_text, user_medications)
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful medical AI assistant. Be cautious and always recommend consulting a doctor."},
-                    {"role": "user", "content": prompt}
-                ],
+            return await self.backend.complete(
+                prompt,
+                system=DEFAULT_SYSTEM_PROMPT,
                 temperature=0.3,
                 max_tokens=300
             )
-            return response.choices[0].message.content
         except Exception:
             return self._basic_analysis(symptoms_text, user_medications)
     
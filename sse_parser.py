@@ -0,0 +1,192 @@
+# sse_parser.py - Incremental Server-Sent Events decoder shared by the MCP clients
+import json
+import re
+import time
+
+_LINE_END_TEXT = re.compile("\r\n|\r|\n")
+
+
+class ServerSentEvent:
+    """One dispatched SSE event"""
+
+    __slots__ = ("event", "data", "id", "retry")
+
+    def __init__(self, event="message", data="", id="", retry=None):
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+
+    def json(self):
+        return json.loads(self.data)
+
+    def __eq__(self, other):
+        return isinstance(other, ServerSentEvent) and (
+            (self.event, self.data, self.id, self.retry)
+            == (other.event, other.data, other.id, other.retry)
+        )
+
+    def __repr__(self):
+        return f"ServerSentEvent(event={self.event!r}, data={self.data!r}, id={self.id!r})"
+
+
+class SSEDecoder:
+    """Bytes-level, incremental SSE decoder following the WHATWG event-stream rules.
+
+    Feed raw chunks as they arrive; complete events come back from `feed`.
+    Lines may end in CR, LF or CRLF (even when split across chunks), multiple
+    data fields are joined with newlines, and `last_event_id` tracks the id to
+    send as Last-Event-ID when reconnecting. Only the unterminated tail of the
+    stream is buffered and it is never rescanned, so decoding is linear in the
+    stream size; completed lines are decoded per chunk, not per line.
+    """
+
+    def __init__(self, last_event_id=""):
+        self.last_event_id = last_event_id
+        self.retry = None
+        self._buffer = bytearray()
+        self._skip_lf = False
+        self._started = False
+        self._data = []
+        self._event = ""
+        self._id = last_event_id
+
+    def feed(self, chunk):
+        """Decode a chunk of bytes; returns the events it completed"""
+        if not chunk:
+            return []
+        if self._skip_lf:
+            # The previous chunk ended in CR; an LF here completes that CRLF
+            self._skip_lf = False
+            if chunk[:1] == b"\n":
+                chunk = chunk[1:]
+
+        buffer = self._buffer
+        scan_from = len(buffer)  # the buffered tail holds no line ending
+        buffer += chunk
+        end = max(buffer.rfind(b"\n", scan_from), buffer.rfind(b"\r", scan_from))
+        if end < 0:
+            return []
+
+        # Decode every completed line at once; terminators are ASCII, so no
+        # multi-byte character is split
+        cut = end
+        if buffer[end] == 13:
+            self._skip_lf = end == len(buffer) - 1
+        elif end and buffer[end - 1] == 13:
+            cut = end - 1
+        text = buffer[:cut].decode("utf-8", errors="replace")
+        del buffer[:end + 1]
+
+        if not self._started:
+            self._started = True
+            if text.startswith("\ufeff"):
+                text = text[1:]
+
+        events = []
+        data = self._data
+        for line in text.split("\n") if "\r" not in text else _LINE_END_TEXT.split(text):
+            if not line:
+                event = self._dispatch()
+                if event is not None:
+                    events.append(event)
+                data = self._data
+            elif line[0] == ":":
+                continue  # comment (keepalive pings)
+            elif line[:5] == "data:":
+                # Fast path for the most common field
+                data.append(line[6:] if line[5:6] == " " else line[5:])
+            else:
+                self._process_field(line)
+        return events
+
+    def close(self):
+        """End of stream: an unterminated trailing event is discarded per spec"""
+        self._buffer.clear()
+        self._data = []
+        self._event = ""
+
+    def _process_field(self, line):
+        field, colon, value = line.partition(":")
+        if colon and value[:1] == " ":
+            value = value[1:]
+
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\x00" not in value:
+                self._id = value
+        elif field == "retry":
+            if value.isascii() and value.isdigit():
+                self.retry = int(value)
+
+    def _dispatch(self):
+        self.last_event_id = self._id
+        if not self._data:
+            self._event = ""
+            return None
+
+        event = ServerSentEvent(
+            event=self._event or "message",
+            data="\n".join(self._data),
+            id=self.last_event_id,
+            retry=self.retry,
+        )
+        self._data = []
+        self._event = ""
+        return event
+
+
+def iter_sse(chunks, last_event_id=""):
+    """Yield events from an iterable of byte chunks (e.g. response.iter_content(None))"""
+    decoder = SSEDecoder(last_event_id)
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    decoder.close()
+
+
+async def aiter_sse(chunks, last_event_id=""):
+    """Yield events from an async iterable of byte chunks (e.g. httpx aiter_bytes())"""
+    decoder = SSEDecoder(last_event_id)
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            yield event
+    decoder.close()
+
+
+def resume_headers(last_event_id=""):
+    """Request headers for an SSE connection, resuming after last_event_id if set"""
+    headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+    if last_event_id:
+        headers["Last-Event-ID"] = last_event_id
+    return headers
+
+
+def iter_sse_with_resume(open_stream, last_event_id="", max_reconnects=3, retry_ms=3000, sleep=time.sleep):
+    """Yield events, reconnecting with Last-Event-ID when the connection drops.
+
+    Args:
+        open_stream: callable(headers) -> iterable of byte chunks for one connection
+        last_event_id: id to resume after on the first connection
+        max_reconnects: consecutive failed connections before giving up
+        retry_ms: reconnect delay until the server sends a retry field
+
+    The stream ends when the server closes it cleanly.
+    """
+    failures = 0
+    while True:
+        decoder = SSEDecoder(last_event_id)
+        try:
+            for chunk in open_stream(resume_headers(last_event_id)):
+                for event in decoder.feed(chunk):
+                    failures = 0
+                    yield event
+            return
+        except OSError:  # includes requests' ConnectionError / ChunkedEncodingError
+            if failures >= max_reconnects:
+                raise
+            failures += 1
+            last_event_id = decoder.last_event_id
+            sleep((decoder.retry or retry_ms) / 1000)
@@ -1,5 +1,15 @@
 # symptom_db.py - CORRECTED with proper diabetes symptom mapping
+import os
 import requests
+from tracing import span
+
+# Point FDA_API_URL at a local stub (see fda_stub_server.py) for offline runs and benchmarks
+FDA_API_URL = os.getenv("FDA_API_URL", "https://api.fda.gov").rstrip("/")
+FDA_TIMEOUT = 5
+
+# "api" (live openFDA) or "mirror" (local label database built with fda_mirror.py)
+FDA_BACKEND = os.getenv("FDA_BACKEND", "api").lower()
+FDA_MIRROR_DB = os.getenv("FDA_MIRROR_DB", "fda_labels.db")
 
 # CORRECTED medical symptom-to-condition mapping
 MEDICAL_SYMPTOM_MAP = {
@@ -165,81 +175,85 @@ MEDICAL_SYMPTOM_MAP = {
 }
 
 
-def get_medications_for_symptoms(symptoms_text):
-    # print(f"\n=== DEBUG: Searching for '{symptoms_text}' ===")
-
+def lookup_conditions(symptoms_text):
+    """Map a symptom description to the conditions to search FDA labels for"""
     symptoms_lower = symptoms_text.lower().strip()
-    # print(f"Lowercase version: '{symptoms_lower}'")
 
-    # Check mapping
+    # Check mapping FIRST; with no mapping, search for the symptom directly
     if symptoms_lower in MEDICAL_SYMPTOM_MAP:
-        conditions = MEDICAL_SYMPTOM_MAP[symptoms_lower]
+        return MEDICAL_SYMPTOM_MAP[symptoms_lower]
+    return [symptoms_text]
 
-    else:
-        # print(f"❌ No mapping found for '{symptoms_lower}'")
-        conditions = [symptoms_text]
 
-    """FIXED: Simple lookup + FDA search"""
-    if not symptoms_text or not symptoms_text.strip():
-        return []
+def fetch_fda_labels(condition, session=None):
+    """Raw FDA label results whose purpose mentions the condition (raises on network errors)"""
+    if FDA_BACKEND == "mirror":
+        from fda_mirror import get_mirror
 
-    symptoms_lower = symptoms_text.lower().strip()
+        with span("fda.label_search", condition=condition, backend="mirror"):
+            return get_mirror(FDA_MIRROR_DB).search(condition)
 
-    # STEP 1: Check mapping FIRST
-    if symptoms_lower in MEDICAL_SYMPTOM_MAP:
-        conditions = MEDICAL_SYMPTOM_MAP[symptoms_lower]
-        # print(f"✅ MAPPING FOUND: '{symptoms_lower}' → {conditions}")
-    else:
-        # No mapping found, search for the symptom directly
-        conditions = [symptoms_text]
-        # print(f"⚠️  No mapping, searching directly for: '{symptoms_text}'")
+    with span("fda.label_search", "client", condition=condition) as current:
+        response = (session or requests).get(
+            f'{FDA_API_URL}/drug/label.json?search=purpose:"{condition}"&limit=3',
+            timeout=FDA_TIMEOUT,
+        )
+        current.set("http.status_code", response.status_code)
 
-    # STEP 2: Search FDA for EACH condition
-    all_medications = []
+        if response.status_code != 200:
+            print(f"   ❌ FDA API error: {response.status_code}")
+            return []
+        return response.json().get("results", [])
 
-    for condition in conditions:
-        # print(f"🔍 Searching FDA for: '{condition}'")
 
-        try:
-            # SIMPLE FDA API call
-            response = requests.get(
-                f'https://api.fda.gov/drug/label.json?search=purpose:"{condition}"&limit=3',
-                timeout=5,
-            )
+def shape_results(condition, results, source="FDA Condition Search"):
+    """Turn raw FDA label results into medication entries"""
+    medications = []
+    for result in results:
+        # Get medication name
+        brand = result["openfda"].get("brand_name", ["Generic medication"])[0]
 
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get("results", [])
-                # print(f"   Found {len(results)} results for '{condition}'")
+        # Get purpose/description
+        purpose = result.get("purpose", ["No description"])[0]
 
-                for result in results:
-                    # Get medication name
-                    brand = result["openfda"].get("brand_name", ["Generic medication"])[
-                        0
-                    ]
+        medications.append(
+            {
+                "name": brand,
+                "purpose": (purpose[:150] + "..." if len(purpose) > 150 else purpose),
+                "condition": condition,
+                "source": source,
+            }
+        )
+    return medications
 
-                    # Get purpose/description
-                    purpose = result.get("purpose", ["No description"])[0]
 
-                    all_medications.append(
-                        {
-                            "name": brand,
-                            "purpose": (
-                                purpose[:150] + "..." if len(purpose) > 150 else purpose
-                            ),
-                            "condition": condition,
-                            "source": "FDA Condition Search",
-                        }
-                    )
-            else:
-                print(f"   ❌ FDA API error: {response.status_code}")
+def get_medications_for_symptoms(symptoms_text, session=None):
+    """Simple lookup + FDA search"""
+    if not symptoms_text or not symptoms_text.strip():
+        return []
+
+    with span("fda.symptom_search") as current:
+        # STEP 1: Check mapping
+        conditions = lookup_conditions(symptoms_text)
+        current.set("conditions", len(conditions))
+
+        # STEP 2: Search FDA for EACH condition
+        all_medications = []
+        source = "FDA Label Mirror" if FDA_BACKEND == "mirror" else "FDA Condition Search"
+
+        for condition in conditions:
+            try:
+                results = fetch_fda_labels(condition, session)
+                # STEP 3: Shape the labels into medication entries
+                all_medications.extend(shape_results(condition, results, source))
+            except Exception as e:
+                print(f"   ❌ Error searching for '{condition}': {e}")
+                continue
 
-        except Exception as e:
-            print(f"   ❌ Error searching for '{condition}': {e}")
-            continue
+        current.set("medications", len(all_medications))
 
     print(f"📊 Total medications found: {len(all_medications)}")
-    return all_medications[:15]  # Return up to 8 results
+    return all_medications[:15]  # Return up to 15 results
 
 
 # Test function
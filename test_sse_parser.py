@@ -0,0 +1,114 @@
+"""
+Tests for the incremental SSE decoder: randomized streams (fixed seeds) must
+decode the same however the bytes are chunked, plus a few edge cases.
+"""
+import random
+
+import pytest
+
+from sse_parser import ServerSentEvent, SSEDecoder, iter_sse
+
+ALPHABET = "abcxyz019 :;=-_{}\"'éü€😀\x00\t"
+SEEDS = range(5)
+STREAMS_PER_SEED = 200
+
+
+def random_text(rng, max_len=40):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+def random_stream(rng, n_events):
+    """Serialize random events with random line endings; returns (bytes, expected events, last id)"""
+    lines, expected = [], []
+    last_id, retry = "", None
+    if rng.random() < 0.2:
+        lines.append("\ufeff:bom")
+
+    for _ in range(n_events):
+        event_name = rng.choice(["", "endpoint", "message", "update", "ping"])
+        data_lines = [random_text(rng) for _ in range(rng.randint(0, 4))]
+        event_id = rng.choice([None, None, str(rng.randint(0, 10 ** 6)), ""])
+
+        if rng.random() < 0.3:
+            lines.append(":" + random_text(rng))
+        if event_name:
+            lines.append(f"event: {event_name}")
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+            last_id = event_id
+        if rng.random() < 0.1:
+            retry = rng.randint(0, 10000)
+            lines.append(f"retry: {retry}")
+        for value in data_lines:
+            if value == "" and rng.random() < 0.5:
+                lines.append("data")
+            elif value.startswith(" ") or rng.random() < 0.5:
+                lines.append(f"data: {value}")
+            else:
+                lines.append(f"data:{value}")
+        if rng.random() < 0.1:
+            lines.append(f"unknown: {random_text(rng)}")
+        lines.append("")
+
+        if data_lines:
+            expected.append(ServerSentEvent(
+                event=event_name or "message",
+                data="\n".join(data_lines),
+                id=last_id,
+                retry=retry,
+            ))
+
+    out, ending = [], ""
+    for line in lines:
+        # CR then an empty LF-terminated line would read back as one CRLF
+        choices = ["\r", "\r\n"] if ending == "\r" and not line else ["\n", "\r", "\r\n"]
+        ending = rng.choice(choices)
+        out.append(line + ending)
+    return "".join(out).encode("utf-8"), expected, last_id
+
+
+def random_chunks(rng, payload):
+    chunks, pos = [], 0
+    while pos < len(payload):
+        size = rng.choice([1, 2, 3, 7, 64, 1024, 4096])
+        chunks.append(payload[pos:pos + size])
+        pos += size
+    return chunks
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_streams_decode_across_random_chunkings(seed):
+    rng = random.Random(seed)
+    for i in range(STREAMS_PER_SEED):
+        payload, expected, last_id = random_stream(rng, rng.randint(0, 30))
+        assert list(iter_sse(random_chunks(rng, payload))) == expected, f"stream {i}"
+
+        # The id to resume from includes ids of events without data
+        decoder = SSEDecoder()
+        for chunk in random_chunks(rng, payload):
+            decoder.feed(chunk)
+        assert decoder.last_event_id == last_id, f"stream {i}"
+
+
+def test_crlf_split_across_chunks_is_one_line_end():
+    events = list(iter_sse([b"data: a\r", b"\n", b"data: b\r", b"\n\r", b"\n"]))
+    assert events == [ServerSentEvent(data="a\nb")]
+
+
+def test_multibyte_character_split_across_chunks():
+    payload = "data: €😀\n\n".encode("utf-8")
+    assert list(iter_sse([payload[i:i + 1] for i in range(len(payload))])) == [
+        ServerSentEvent(data="€😀")
+    ]
+
+
+def test_unterminated_trailing_event_is_discarded():
+    assert list(iter_sse([b"data: done\n\ndata: partial\n"])) == [ServerSentEvent(data="done")]
+
+
+def test_last_event_id_resumes_from_constructor():
+    decoder = SSEDecoder(last_event_id="41")
+    (event,) = decoder.feed(b"data: x\n\n")
+    assert event.id == "41"
+    decoder.feed(b"id: 42\n\n")
+    assert decoder.last_event_id == "42"
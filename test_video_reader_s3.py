@@ -0,0 +1,86 @@
+"""
+Tests for the S3 upload path of video_reader (content-hash keys, upload
+skipping and bucket verification) against moto's in-memory S3.
+"""
+from unittest import mock
+
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import aws_clients
+import video_reader
+from video_cache import file_sha256
+
+REGION = 'us-west-2'
+BUCKET = 'video-reader-test-bucket'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', REGION)
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    with mock_aws():
+        # Clients and verified buckets must not leak between tests
+        aws_clients._clients.clear()
+        aws_clients._sessions.clear()
+        video_reader._verified_buckets.clear()
+        yield aws_clients.get_client('s3', REGION)
+        aws_clients._clients.clear()
+        aws_clients._sessions.clear()
+        video_reader._verified_buckets.clear()
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b'\x00\x00\x00\x18ftypmp42' + b'frame' * 1000)
+    return path
+
+
+def _keys(s3):
+    return [obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+
+
+def test_upload_once_then_skip_unchanged_content(s3, video):
+    s3_uri, uploaded = video_reader._upload_to_s3(str(video), BUCKET, REGION)
+    assert s3_uri == f"s3://{BUCKET}/videos/{file_sha256(str(video))}.mp4"
+    assert uploaded == video.stat().st_size
+
+    again = video_reader._upload_to_s3(str(video), BUCKET, REGION)
+    assert again == (s3_uri, 0)
+    assert len(_keys(s3)) == 1
+
+
+def test_changed_content_gets_a_new_key(s3, video):
+    first_uri, _ = video_reader._upload_to_s3(str(video), BUCKET, REGION)
+
+    video.write_bytes(video.read_bytes() + b'more frames')
+    second_uri, uploaded = video_reader._upload_to_s3(str(video), BUCKET, REGION)
+
+    assert second_uri != first_uri
+    assert uploaded == video.stat().st_size
+    assert len(_keys(s3)) == 2
+
+
+def test_missing_bucket_is_created(s3, video):
+    assert BUCKET not in [b['Name'] for b in s3.list_buckets()['Buckets']]
+
+    assert video_reader._upload_to_s3(str(video), BUCKET, REGION)
+
+    assert BUCKET in [b['Name'] for b in s3.list_buckets()['Buckets']]
+    assert s3.get_bucket_location(Bucket=BUCKET)['LocationConstraint'] == REGION
+    assert (REGION, BUCKET) in video_reader._verified_buckets
+
+
+def test_bucket_not_recorded_when_create_fails(s3, video):
+    denied = ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}}, 'CreateBucket')
+    with mock.patch.object(s3, 'create_bucket', side_effect=denied):
+        assert video_reader._upload_to_s3(str(video), BUCKET, REGION) is None
+    assert (REGION, BUCKET) not in video_reader._verified_buckets
+
+    # The next call checks again instead of trusting a bucket that was never made
+    assert video_reader._upload_to_s3(str(video), BUCKET, REGION)
+    assert (REGION, BUCKET) in video_reader._verified_buckets
@@ -0,0 +1,180 @@
+# tool_registry.py - Tool registry and JSON-RPC dispatcher for the SSE tool server
+import asyncio
+import functools
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tracing import span
+
+# JSON-RPC 2.0 error codes
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+_JSON_TYPES = {
+    "number": (int, float),
+    "integer": (int,),
+    "string": (str,),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+class Tool:
+    """A registered tool: callable plus its MCP description and input schema"""
+
+    __slots__ = ("name", "func", "description", "input_schema", "cpu_bound")
+
+    def __init__(self, name, func, description, input_schema, cpu_bound):
+        self.name = name
+        self.func = func
+        self.description = description
+        self.input_schema = input_schema
+        self.cpu_bound = cpu_bound
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputSchema": self.input_schema,
+        }
+
+    def validate(self, arguments):
+        """Return an error message if the arguments do not match the schema"""
+        if not isinstance(arguments, dict):
+            return "arguments must be an object"
+        for key in self.input_schema.get("required", []):
+            if key not in arguments:
+                return f"missing required argument '{key}'"
+        for key, value in arguments.items():
+            spec = self.input_schema.get("properties", {}).get(key)
+            if spec is None:
+                return f"unexpected argument '{key}'"
+            types = _JSON_TYPES.get(spec.get("type"))
+            # bool is an int subclass; do not accept it for numbers
+            if types and (not isinstance(value, types) or
+                          (isinstance(value, bool) and spec["type"] != "boolean")):
+                return f"argument '{key}' must be of type {spec['type']}"
+            if "enum" in spec and value not in spec["enum"]:
+                return f"argument '{key}' must be one of {spec['enum']}"
+            if "minimum" in spec and value < spec["minimum"]:
+                return f"argument '{key}' must be >= {spec['minimum']}"
+            if "maximum" in spec and value > spec["maximum"]:
+                return f"argument '{key}' must be <= {spec['maximum']}"
+        return None
+
+
+class ToolRegistry:
+    """Registers tools and dispatches JSON-RPC requests (single or batch) to them.
+
+    Plain functions run inline, coroutine functions are awaited, and tools
+    registered with cpu_bound=True run in a process pool so they do not block
+    the event loop. Batch arrays run their calls concurrently.
+    """
+
+    def __init__(self, process_workers=None):
+        self.tools = {}
+        self.process_workers = process_workers or int(os.getenv("MCP_PROCESS_WORKERS", "0")) or None
+        self._pool = None
+
+    def register(self, name=None, description=None, input_schema=None, cpu_bound=False):
+        """Decorator that registers a function as a tool (the function is returned unchanged)"""
+
+        def decorator(func):
+            tool_name = name or func.__name__
+            self.tools[tool_name] = Tool(
+                tool_name,
+                func,
+                description or inspect.getdoc(func) or "",
+                input_schema or {"type": "object", "properties": {}},
+                cpu_bound,
+            )
+            return func
+
+        return decorator
+
+    def list_tools(self):
+        return [tool.describe() for tool in self.tools.values()]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def call_tool(self, name, arguments):
+        """Run one tool; returns (result, executor used)"""
+        tool = self.tools[name]
+        with span(f"mcp.tool {name}", "server") as current:
+            if tool.cpu_bound:
+                current.set("mcp.executor", "process")
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.process_workers)
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._pool, functools.partial(tool.func, **arguments))
+                return result, "process"
+            if inspect.iscoroutinefunction(tool.func):
+                current.set("mcp.executor", "async")
+                return await tool.func(**arguments), "async"
+            current.set("mcp.executor", "inline")
+            return tool.func(**arguments), "inline"
+
+    async def dispatch(self, payload):
+        """Handle a JSON-RPC request object or batch array; returns the response(s)"""
+        if isinstance(payload, list):
+            if not payload:
+                return _error(None, INVALID_REQUEST, "Empty batch")
+            return list(await asyncio.gather(*(self.handle(request) for request in payload)))
+        return await self.handle(payload)
+
+    async def handle(self, request):
+        """Handle one JSON-RPC request"""
+        if not isinstance(request, dict):
+            return _error(None, INVALID_REQUEST, "Request must be an object")
+
+        request_id = request.get("id", 1)
+        method = request.get("method")
+        params = request.get("params") or {}
+
+        if method == "tools/list":
+            return {"jsonrpc": "2.0", "id": request_id, "result": {"tools": self.list_tools()}}
+        if method != "tools/call":
+            return _error(request_id, METHOD_NOT_FOUND, f"Unknown method: {method}")
+
+        if not isinstance(params, dict):
+            return _error(request_id, INVALID_PARAMS, "params must be an object")
+
+        name = params.get("name")
+        tool = self.tools.get(name)
+        if tool is None:
+            return _error(request_id, INVALID_PARAMS, f"Unknown tool: {name}")
+
+        arguments = params.get("arguments", {})
+        problem = tool.validate(arguments)
+        if problem:
+            return _error(request_id, INVALID_PARAMS, f"{name}: {problem}")
+
+        started = time.perf_counter()
+        try:
+            content, executor = await self.call_tool(name, arguments)
+        except Exception as e:
+            return _error(request_id, INTERNAL_ERROR, f"{name} failed: {e}")
+
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "name": name,
+                "content": content,
+                "_meta": {
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "executor": executor,
+                },
+            },
+        }
+
+
+def _error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
@@ -0,0 +1,371 @@
+# tracing.py - Lightweight spans, latency timers and an OTLP-JSON exporter
+#
+# Every span feeds the in-process latency stats (cheap: a perf_counter pair and a
+# deque append). Whole traces are sampled at the root with TRACE_SAMPLE_RATE; only
+# sampled spans are kept for trace breakdowns and sent to the exporter.
+#
+#   TRACE_SAMPLE_RATE   fraction of root spans whose trace is recorded (default 0.1)
+#   TRACE_EXPORTER      "file" (OTLP JSON lines), "console" (stderr) or unset (off)
+#   TRACE_FILE          file exporter path (default traces.jsonl)
+#   TRACE_SERVICE_NAME  service.name resource attribute (default med_tracker)
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+EXPORTER = os.getenv("TRACE_EXPORTER", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "med_tracker")
+
+# OTLP enum values
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; attributes are only kept when the trace is sampled"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "duration_ms", "attributes", "error", "sampled")
+
+    def __init__(self, name, kind, trace_id, parent_id, sampled):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex() if sampled else None
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.duration_ms = None
+        self.attributes = {}
+        self.error = None
+        self.sampled = sampled
+
+    def set(self, key, value):
+        if self.sampled:
+            self.attributes[key] = value
+        return self
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class ConsoleExporter:
+    """One line per span on stderr"""
+
+    def export(self, spans):
+        for span in spans:
+            status = f" ERROR {span.error}" if span.error else ""
+            attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+            print(f"[trace {span.trace_id[:8]}] {span.name} {span.duration_ms:.1f}ms {attributes}{status}",
+                  file=sys.stderr)
+
+
+class FileExporter:
+    """OTLP/JSON lines (one ExportTraceServiceRequest per trace), as the collector's file exporter writes"""
+
+    def __init__(self, path=TRACE_FILE, service_name=SERVICE_NAME):
+        self.path = path
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        line = json.dumps({"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+EXPORTERS = {
+    "console": ConsoleExporter,
+    "file": FileExporter,
+}
+
+
+# Latency stats for span names beyond Tracer.max_names are pooled under this name
+OVERFLOW_NAME = "(other spans)"
+
+
+class Tracer:
+    """Creates spans, keeps per-name latency windows and the most recent sampled spans"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, exporter=None, window=200, keep_spans=1000, max_names=500):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.window = window
+        self.max_names = max_names
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=self.window))
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._recent = deque(maxlen=keep_spans)
+        # Sampled spans of traces whose root is still open, exported when it ends
+        self._open_traces = {}
+        self._listeners = []
+
+    @contextmanager
+    def span(self, name, kind="internal", **attributes):
+        """Time a block as a child of the current span (or as a new root)"""
+        parent = _current_span.get()
+        if parent is None:
+            sampled = random.random() < self.sample_rate
+            trace_id = os.urandom(16).hex() if sampled else None
+            current = Span(name, kind, trace_id, None, sampled)
+        else:
+            current = Span(name, kind, parent.trace_id, parent.span_id, parent.sampled)
+        if current.sampled:
+            current.attributes.update(attributes)
+            if parent is None:
+                with self._lock:
+                    self._open_traces[current.trace_id] = []
+
+        token = _current_span.set(current)
+        started = time.perf_counter()
+        try:
+            yield current
+        except BaseException as e:
+            if not _is_control_flow(e):
+                current.error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            current.duration_ms = (time.perf_counter() - started) * 1000
+            _current_span.reset(token)
+            self._finish(current, root=parent is None)
+
+    def traced(self, name=None, kind="internal"):
+        """Decorator form of span() for sync and async functions"""
+        def decorate(func):
+            span_name = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, kind):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def add_listener(self, listener):
+        """Call listener(span) as every span ends, sampled or not (e.g. to feed metrics)"""
+        self._listeners.append(listener)
+
+    def _finish(self, span, root):
+        for listener in self._listeners:
+            listener(span)
+        with self._lock:
+            # Bounded however many distinct names callers generate
+            name = span.name if span.name in self._calls or len(self._calls) < self.max_names else OVERFLOW_NAME
+            self._latencies[name].append(span.duration_ms)
+            self._calls[name] += 1
+            if span.error:
+                self._errors[name] += 1
+            if not span.sampled:
+                return
+            span.end_ns = span.start_ns + int(span.duration_ms * 1e6)
+            self._recent.append(span)
+
+            if root:
+                batch = self._open_traces.pop(span.trace_id, [])
+                batch.append(span)
+            elif span.trace_id in self._open_traces:
+                self._open_traces[span.trace_id].append(span)
+                return
+            else:
+                batch = [span]  # finished after its root (e.g. a background task)
+
+        if self.exporter:
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                print(f"Trace export failed: {e}", file=sys.stderr)
+
+    def latency_summary(self):
+        """Per span name: calls, errors and last/p50/p95/max over the recent window, slowest first"""
+        with self._lock:
+            windows = {name: list(values) for name, values in self._latencies.items()}
+            calls, errors = dict(self._calls), dict(self._errors)
+
+        summary = []
+        for name, values in windows.items():
+            ordered = sorted(values)
+            summary.append({
+                "span": name,
+                "calls": calls[name],
+                "errors": errors.get(name, 0),
+                "last_ms": round(values[-1], 2),
+                "p50_ms": round(_percentile(ordered, 50), 2),
+                "p95_ms": round(_percentile(ordered, 95), 2),
+                "max_ms": round(ordered[-1], 2),
+            })
+        summary.sort(key=lambda row: row["p95_ms"], reverse=True)
+        return summary
+
+    def recent_traces(self, root_name=None, limit=10):
+        """Most recent sampled traces as [(depth, span)] lists in start order, newest first"""
+        with self._lock:
+            spans = list(self._recent)
+
+        by_trace = defaultdict(list)
+        for span in spans:
+            by_trace[span.trace_id].append(span)
+
+        traces = []
+        for span in reversed(spans):
+            if span.parent_id is None and (root_name is None or span.name == root_name):
+                traces.append(_tree(span, by_trace[span.trace_id]))
+                if len(traces) >= limit:
+                    break
+        return traces
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._calls.clear()
+            self._errors.clear()
+            self._recent.clear()
+            self._open_traces.clear()
+
+
+def _is_control_flow(error):
+    """Streamlit's st.rerun()/st.stop() raise ScriptControlException subclasses; those are not failures"""
+    # Matched by name so tracing does not import streamlit
+    return any(cls.__name__ == "ScriptControlException" for cls in type(error).__mro__)
+
+
+def _percentile(ordered, pct):
+    index = max(0, -(-pct * len(ordered) // 100) - 1)
+    return ordered[int(index)]
+
+
+def _tree(root, spans):
+    children = defaultdict(list)
+    for span in spans:
+        if span.parent_id:
+            children[span.parent_id].append(span)
+
+    rows = []
+
+    def walk(span, depth):
+        rows.append((depth, span))
+        for child in sorted(children[span.span_id], key=lambda s: s.start_ns):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return rows
+
+
+def get_exporter(name=None):
+    """Build the exporter named by TRACE_EXPORTER (None when tracing export is off)"""
+    name = (name if name is not None else EXPORTER).lower()
+    if not name:
+        return None
+    if name not in EXPORTERS:
+        raise ValueError(f"Unknown trace exporter '{name}'. Available: {', '.join(EXPORTERS)}")
+    return EXPORTERS[name]()
+
+
+tracer = Tracer(exporter=get_exporter())
+span = tracer.span
+traced = tracer.traced
+latency_summary = tracer.latency_summary
+recent_traces = tracer.recent_traces
+
+
+def in_current_trace(coro):
+    """Wrap a coroutine so it runs under the caller's current span on another thread's loop"""
+    parent = _current_span.get()
+
+    async def run():
+        token = _current_span.set(parent)
+        try:
+            return await coro
+        finally:
+            _current_span.reset(token)
+
+    return run()
+
+
+# --- SQLite ---
+
+_WHITESPACE = re.compile(r"\s+")
+# Literals inlined into SQL text; replaced so one statement shape gets one span name
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \(\?(?: ?, ?\?)*\)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def _statement_label(sql):
+    statement = _WHITESPACE.sub(" ", sql).strip()
+    statement = _IN_LIST.sub("IN (?)", _LITERALS.sub("?", statement))
+    return "sqlite " + (statement[:60] + "..." if len(statement) > 60 else statement)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor whose execute calls are spans named after the statement"""
+
+    def execute(self, sql, parameters=()):
+        with span(_statement_label(sql), "client", **{"db.system": "sqlite"}):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with span(_statement_label(sql), "client", **{"db.system": "sqlite"}):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute builds a plain cursor internally; route through ours
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect with every query timed"""
+    return sqlite3.connect(database, factory=TracedConnection, **kwargs)
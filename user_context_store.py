@@ -0,0 +1,216 @@
+# user_context_store.py - Bounded per-user action history for the agent
+import collections
+import sqlite3
+import threading
+import time
+
+DOSE_LOG = "dose_log"
+OTHER = "other"
+
+
+def classify_action(action):
+    """Bucket an action once at insert time so lookups never rescan history"""
+    action = str(action).lower()
+    if "log" in action or "taken" in action:
+        return DOSE_LOG
+    return OTHER
+
+
+class ActionRecord:
+    """One logged action"""
+
+    __slots__ = ("action", "outcome", "kind", "timestamp")
+
+    def __init__(self, action, outcome, kind, timestamp):
+        self.action = action
+        self.outcome = outcome
+        self.kind = kind
+        self.timestamp = timestamp
+
+    def as_dict(self):
+        return {
+            "action": self.action,
+            "outcome": self.outcome,
+            "timestamp": self.timestamp,
+        }
+
+
+class UserContext:
+    """Recent actions (ring buffer) plus running counters for one user"""
+
+    __slots__ = ("actions", "counts", "last_seen")
+
+    def __init__(self, max_actions):
+        self.actions = collections.deque(maxlen=max_actions)
+        self.counts = collections.Counter()
+        self.last_seen = time.time()
+
+
+class UserContextStore:
+    """Per-user contexts with LRU / idle eviction and optional SQLite persistence.
+
+    Memory is bounded by max_users * max_actions records. With a db_path,
+    every action is written through, so evicted users are restored
+    (counters and recent actions) the next time they are seen. The database
+    keeps the same max_actions recent actions per user plus one counter row
+    per user and kind, so it stays bounded too.
+    """
+
+    def __init__(self, max_users=1000, max_actions=50, idle_ttl=24 * 3600, db_path=None):
+        self.max_users = max_users
+        self.max_actions = max_actions
+        self.idle_ttl = idle_ttl
+        self.db_path = db_path
+        self._users = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_actions (
+                    user_id TEXT NOT NULL,
+                    action TEXT,
+                    outcome TEXT,
+                    kind TEXT,
+                    timestamp REAL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_user_actions_user "
+                "ON user_actions (user_id, timestamp)"
+            )
+            has_counts = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'user_action_counts'"
+            ).fetchone()
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_action_counts (
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, kind)
+                )
+                """
+            )
+            if not has_counts:
+                # Databases from before pruning: counters come from the full history
+                self._conn.execute(
+                    "INSERT INTO user_action_counts (user_id, kind, count) "
+                    "SELECT user_id, kind, COUNT(*) FROM user_actions GROUP BY user_id, kind"
+                )
+                self._prune_all()
+            self._conn.commit()
+
+    def log_action(self, user_id, action, outcome):
+        """Record an action for a user"""
+        now = time.time()
+        record = ActionRecord(action, outcome, classify_action(action), now)
+
+        with self._lock:
+            context = self._get(user_id, create=True)
+            context.actions.append(record)
+            context.counts[record.kind] += 1
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO user_actions (user_id, action, outcome, kind, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (str(user_id), str(action), str(outcome), record.kind, now),
+                )
+                self._conn.execute(
+                    "INSERT INTO user_action_counts (user_id, kind, count) VALUES (?, ?, 1) "
+                    "ON CONFLICT (user_id, kind) DO UPDATE SET count = count + 1",
+                    (str(user_id), record.kind),
+                )
+                self._prune(str(user_id))
+                self._conn.commit()
+
+    def count(self, user_id, kind=None):
+        """Running count of a user's actions, optionally of one kind (O(1))"""
+        with self._lock:
+            context = self._get(user_id, create=False)
+            if context is None:
+                return 0
+            if kind is None:
+                return sum(context.counts.values())
+            return context.counts[kind]
+
+    def recent_actions(self, user_id):
+        """Most recent actions for a user, oldest first"""
+        with self._lock:
+            context = self._get(user_id, create=False)
+            if context is None:
+                return []
+            return [record.as_dict() for record in context.actions]
+
+    def __contains__(self, user_id):
+        return self.count(user_id) > 0
+
+    def __len__(self):
+        return len(self._users)
+
+    def _get(self, user_id, create):
+        context = self._users.get(user_id)
+        if context is not None:
+            self._users.move_to_end(user_id)
+        else:
+            context = self._load(user_id)
+            if context is None and create:
+                context = UserContext(self.max_actions)
+            if context is not None:
+                self._users[user_id] = context
+
+        # Access order and last_seen stay in sync, so eviction only checks the head
+        if context is not None:
+            context.last_seen = time.time()
+            self._evict(context.last_seen)
+        return context
+
+    def _load(self, user_id):
+        """Restore an evicted user's context from SQLite"""
+        if self._conn is None:
+            return None
+
+        rows = self._conn.execute(
+            "SELECT kind, count FROM user_action_counts WHERE user_id = ?",
+            (str(user_id),),
+        ).fetchall()
+        if not rows:
+            return None
+
+        context = UserContext(self.max_actions)
+        context.counts.update(dict(rows))
+        recent = self._conn.execute(
+            "SELECT action, outcome, kind, timestamp FROM user_actions "
+            "WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (str(user_id), self.max_actions),
+        ).fetchall()
+        for action, outcome, kind, timestamp in reversed(recent):
+            context.actions.append(ActionRecord(action, outcome, kind, timestamp))
+        return context
+
+    def _prune(self, user_id):
+        """Keep only the max_actions most recent rows for a user (what _load restores)"""
+        self._conn.execute(
+            "DELETE FROM user_actions WHERE user_id = ? AND rowid NOT IN "
+            "(SELECT rowid FROM user_actions WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?)",
+            (user_id, user_id, self.max_actions),
+        )
+
+    def _prune_all(self):
+        for (user_id,) in self._conn.execute("SELECT DISTINCT user_id FROM user_actions").fetchall():
+            self._prune(user_id)
+
+    def _evict(self, now):
+        # OrderedDict is kept in access order, so only the oldest entries need checking
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+        while self._users:
+            oldest = next(iter(self._users.values()))
+            if now - oldest.last_seen <= self.idle_ttl:
+                break
+            self._users.popitem(last=False)
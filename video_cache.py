@@ -0,0 +1,119 @@
+"""
+Persistent analysis-result cache for the video reader tools.
+
+Results are keyed on (content hash of the video, text prompt, system prompt,
+model id), so repeating an analysis returns instantly without a Bedrock call.
+Entries expire after a TTL and the table is trimmed to a maximum size by
+least-recent access.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+MB = 1024 * 1024
+
+DEFAULT_CACHE_PATH = os.path.expanduser('~/.cache/strands-video-reader/results.db')
+
+
+def file_sha256(file_path: str, chunk_size: int = MB) -> str:
+    """SHA-256 of a file, read in chunks so large videos are never loaded whole."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class VideoResultCache:
+    """SQLite-backed result cache with TTL and LRU size limit."""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.db_path = db_path or os.getenv('VIDEO_READER_CACHE_DB', DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds or float(os.getenv('VIDEO_READER_CACHE_TTL', str(7 * 24 * 3600)))
+        self.max_entries = max_entries or int(os.getenv('VIDEO_READER_CACHE_MAX_ENTRIES', '1000'))
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS video_results (
+                cache_key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_video_results_access ON video_results (last_access)'
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(content_id: str, text_prompt: str, system_prompt: str, model_id: str) -> str:
+        """Cache key for one (video content, prompts, model) combination."""
+        raw = '\x00'.join([content_id, text_prompt, system_prompt or '', model_id])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Tuple[str, float]]:
+        """Return (result, age in seconds) or None if missing/expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, created_at FROM video_results WHERE cache_key = ?',
+                (cache_key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            result, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM video_results WHERE cache_key = ?', (cache_key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                'UPDATE video_results SET last_access = ? WHERE cache_key = ?',
+                (now, cache_key)
+            )
+            self._conn.commit()
+            return result, now - created_at
+
+    def put(self, cache_key: str, result: str) -> None:
+        """Store a result and enforce the TTL / size limits."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO video_results (cache_key, result, created_at, last_access) '
+                'VALUES (?, ?, ?, ?)',
+                (cache_key, result, now, now)
+            )
+            self._conn.execute(
+                'DELETE FROM video_results WHERE created_at < ?',
+                (now - self.ttl_seconds,)
+            )
+            self._conn.execute(
+                'DELETE FROM video_results WHERE cache_key IN ('
+                'SELECT cache_key FROM video_results ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+
+_cache: Optional[VideoResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> VideoResultCache:
+    """Process-wide cache instance."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = VideoResultCache()
+        return _cache
@@ -0,0 +1,121 @@
+"""
+Request handling shared by the video reader tools (video_reader and
+video_reader_local): prompt and format checks, the result-cache lookup and
+store, and the tool result dictionaries.
+
+A request is tracked in a job dict: the resolved region and system_prompt,
+whatever the reader adds, and the cache state: cache and cache_key (None
+when caching is off), cached_text (None on a miss) and cache_details.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from video_cache import get_cache
+
+DEFAULT_SYSTEM_PROMPT = (
+    "Always answer in the same language you are asked. "
+    "Note: I can only analyze visual content, not audio."
+)
+
+VIDEO_FORMATS = {
+    '.mp4': 'mp4',
+    '.mov': 'mov',
+    '.avi': 'avi',
+    '.mkv': 'mkv',
+    '.webm': 'webm'
+}
+
+
+def error_result(message: str) -> Dict[str, Any]:
+    """Tool result for a failed request."""
+    return {"status": "error", "content": [{"text": f"❌ {message}"}]}
+
+
+def check_request(video_path: str, text_prompt: str) -> Optional[Dict[str, Any]]:
+    """Error result for a prompt or file type the models cannot handle, else None."""
+    # Validate Nova model limitations
+    if "identify" in text_prompt.lower() or "who is" in text_prompt.lower():
+        return error_result("Nova models cannot identify or name people in videos")
+    if not get_video_format(video_path):
+        return error_result("Unsupported video format. Supported: mp4, mov, avi, mkv, webm")
+    return None
+
+
+def get_video_format(file_path: str) -> Optional[str]:
+    """Get video format from file extension (local path or S3 URI)."""
+    _, ext = os.path.splitext(os.path.basename(file_path).lower())
+    return VIDEO_FORMATS.get(ext)
+
+
+def new_job(region: Optional[str], system_prompt: Optional[str], **fields: Any) -> Dict[str, Any]:
+    """Job dict with defaults filled in and caching disabled."""
+    return {
+        'region': region or os.getenv('AWS_REGION', 'us-west-2'),
+        'system_prompt': system_prompt or DEFAULT_SYSTEM_PROMPT,
+        **fields,
+        'cache': None,
+        'cache_key': None,
+        'cached_text': None,
+        'cache_details': "- Cache: disabled",
+    }
+
+
+def lookup_cache(job: Dict[str, Any], content_id: str, text_prompt: str, model_id: str) -> None:
+    """Enable caching for the job and load a stored result for this content, if any."""
+    cache = get_cache()
+    job['cache'] = cache
+    job['cache_key'] = cache.make_key(content_id, text_prompt, job['system_prompt'], model_id)
+    cached = cache.get(job['cache_key'])
+    if cached:
+        job['cached_text'], age = cached
+        job['cache_details'] = f"- Cache: HIT (stored {age:.0f}s ago, no model call)"
+    else:
+        job['cache_details'] = "- Cache: MISS"
+
+
+def truncated(stop_reason: Optional[str]) -> Optional[str]:
+    """Why a model answer should not be cached, if it was cut off."""
+    return "output truncated at max_tokens" if stop_reason == 'max_tokens' else None
+
+
+def store_result(job: Dict[str, Any], text_response: str, skip_reason: Optional[str] = None) -> None:
+    """Cache a fresh result, unless skip_reason says it is incomplete."""
+    if job['cache'] is None:
+        return
+    if skip_reason:
+        job['cache_details'] = f"- Cache: MISS (not stored, {skip_reason})"
+    else:
+        job['cache'].put(job['cache_key'], text_response)
+
+
+def format_result(
+    job: Dict[str, Any],
+    text_response: str,
+    model_id: str,
+    video_path: str,
+    source: str,
+    details: str,
+    timeline: str = ""
+) -> Dict[str, Any]:
+    """Success result: the analysis followed by the Technical Details.
+
+    source holds the reader's lines about where the video went (S3 URI, or
+    file size for inline bytes); details ends with a newline when not empty.
+    """
+    detailed_response = f"""🎥 Video Analysis Results:
+
+**Analysis:** {text_response}
+{timeline}
+---
+**Technical Details:**
+- Model Used: {model_id}
+- Region: {job['region']}
+- Video Path: {video_path}
+{source}
+{details}{job['cache_details']}
+"""
+
+    return {
+        "status": "success",
+        "content": [{"text": detailed_response}]
+    }
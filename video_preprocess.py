@@ -0,0 +1,165 @@
+"""
+Local video pre-processing so large clips fit Bedrock's inline-bytes limit.
+
+Uses the ffmpeg / ffprobe binaries in a subprocess to downscale resolution and
+frame rate, drop audio (Nova only analyzes visual content) and trim to a
+duration budget. ffmpeg streams the input and writes a temporary file, so
+memory use stays bounded regardless of the source size.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+MB = 1024 * 1024
+
+# Progressively more aggressive (max height, frames per second) settings
+_LADDER = [(720, 15), (480, 10), (360, 5), (240, 2)]
+
+# Below this video bitrate the output is not worth analyzing; trim instead
+_MIN_KBPS = 150
+
+
+def ffmpeg_available() -> bool:
+    """True when both ffmpeg and ffprobe are on PATH."""
+    return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    """Duration of a video in seconds, or None if ffprobe cannot tell."""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', video_path],
+            capture_output=True, text=True, timeout=60, check=True
+        )
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (subprocess.SubprocessError, OSError, KeyError, ValueError):
+        return None
+
+
+def fit_to_size(
+    video_path: str,
+    max_bytes: int,
+    max_duration_s: Optional[float] = None
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Transcode a video into a temporary mp4 no larger than max_bytes.
+
+    Tries the quality ladder from best to worst at a bitrate that fits the
+    duration budget; if even the lowest rung would drop below a useful
+    bitrate, the duration budget is shortened instead. A video that is
+    already small enough and only needs trimming to max_duration_s is cut
+    with a stream copy, without re-encoding.
+
+    Returns:
+        (output_path, info) on success - the caller must delete output_path -
+        or None when ffmpeg is unavailable or nothing fits.
+
+    Raises:
+        RuntimeError: ffmpeg rejected the input (corrupt file, missing codec);
+            lower rungs would fail the same way, so none are tried.
+    """
+    if not ffmpeg_available():
+        return None
+
+    duration = probe_duration(video_path)
+    if not duration:
+        return None
+
+    wanted_s = min(duration, max_duration_s) if max_duration_s else duration
+    # 90% of the limit for the video stream leaves room for container overhead
+    max_budget_s = (max_bytes * 8 * 0.9) / (_MIN_KBPS * 1000)
+    budget_s = min(wanted_s, max_budget_s)
+
+    fd, out_path = tempfile.mkstemp(suffix='.mp4', prefix='video_fit_')
+    os.close(fd)
+
+    try:
+        if os.path.getsize(video_path) <= max_bytes and _trim_copy(video_path, out_path, wanted_s):
+            size = os.path.getsize(out_path)
+            if size <= max_bytes:
+                return out_path, {
+                    'height': None,
+                    'fps': None,
+                    'bitrate_kbps': None,
+                    'duration_s': round(wanted_s, 1),
+                    'source_duration_s': round(duration, 1),
+                    'trimmed': wanted_s < duration,
+                    'stream_copy': True,
+                    'size_bytes': size,
+                }
+
+        while budget_s >= 1:
+            target_kbps = int((max_bytes * 8 * 0.9) / budget_s / 1000)
+            for height, fps in _LADDER:
+                if _transcode(video_path, out_path, height, fps, target_kbps, budget_s):
+                    size = os.path.getsize(out_path)
+                    if size <= max_bytes:
+                        return out_path, {
+                            'height': height,
+                            'fps': fps,
+                            'bitrate_kbps': target_kbps,
+                            'duration_s': round(budget_s, 1),
+                            'source_duration_s': round(duration, 1),
+                            'trimmed': budget_s < duration,
+                            'stream_copy': False,
+                            'size_bytes': size,
+                        }
+            # Still too large at the lowest rung: halve the duration budget
+            budget_s /= 2
+    except BaseException:
+        os.remove(out_path)
+        raise
+
+    os.remove(out_path)
+    return None
+
+
+def _trim_copy(src: str, dst: str, duration_s: float) -> bool:
+    """Cut the first duration_s seconds without re-encoding; False if the streams cannot be copied."""
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-i', src,
+        '-t', f'{duration_s:.2f}',
+        '-map', '0:v:0', '-c', 'copy',
+        '-movflags', '+faststart',
+        dst,
+    ]
+    try:
+        subprocess.run(command, capture_output=True, timeout=600, check=True)
+        return True
+    except (subprocess.SubprocessError, OSError):
+        # e.g. a codec the mp4 container cannot hold; the transcode ladder still can
+        return False
+
+
+def _transcode(src: str, dst: str, height: int, fps: int, kbps: int, duration_s: float) -> bool:
+    """Run one ffmpeg pass; returns True when ffmpeg succeeded, False when it timed out.
+
+    Raises RuntimeError when ffmpeg exits with an error: that is a problem
+    with the input or the ffmpeg build, not with the size settings.
+    """
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-i', src,
+        '-t', f'{duration_s:.2f}',
+        '-vf', f"scale=-2:'min({height},ih)',fps={fps}",
+        '-c:v', 'libx264', '-preset', 'veryfast',
+        '-b:v', f'{kbps}k', '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k',
+        '-an',
+        '-movflags', '+faststart',
+        dst,
+    ]
+    try:
+        subprocess.run(command, capture_output=True, timeout=600, check=True)
+        return True
+    except subprocess.TimeoutExpired:
+        # Lower rungs encode faster
+        return False
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode(errors='replace').strip().splitlines()
+        raise RuntimeError(f"ffmpeg failed (exit {e.returncode}): {message[-1] if message else 'no output'}") from e
+    except OSError as e:
+        raise RuntimeError(f"ffmpeg could not be run: {e}") from e
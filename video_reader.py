@@ -1,11 +1,33 @@
 """
 Video Reader Tool for Strands Agents
 """
-import boto3
+import asyncio
+import logging
 import os
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
-from typing import Dict, Any, Optional
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
 from strands import tool
+from aws_clients import get_client
+from tracing import span
+from bedrock_stream import aconverse_stream_events, format_stream_details
+from video_cache import MB, file_sha256
+from video_common import (check_request, error_result, format_result, get_video_format,
+                          lookup_cache, new_job, store_result, truncated)
+from video_segments import converse_text, format_segment_details, run_segmented_analysis
+
+logger = logging.getLogger(__name__)
+
+# Buckets already checked (or created) in this process, keyed by (region, bucket)
+_verified_buckets = set()
+
+# Large videos go up as parallel multipart uploads
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=int(os.getenv('VIDEO_READER_MULTIPART_CHUNK_MB', '16')) * MB,
+    max_concurrency=int(os.getenv('VIDEO_READER_UPLOAD_CONCURRENCY', '8')),
+    use_threads=True
+)
 
 
 @tool
@@ -15,7 +37,10 @@ def video_reader(
     model_id: str = "us.amazon.nova-pro-v1:0",
     region: Optional[str] = None,
     s3_bucket: Optional[str] = None,
-    system_prompt: Optional[str] = None
+    system_prompt: Optional[str] = None,
+    use_cache: bool = True,
+    segment_seconds: Optional[float] = None,
+    max_parallel_segments: int = 4
 ) -> Dict[str, Any]:
     """
     Analyze video content using AWS Bedrock's multimodal capabilities.
@@ -43,155 +68,294 @@ def video_reader(
         region: AWS region for Bedrock client
         s3_bucket: S3 bucket name for uploading local videos
         system_prompt: Custom system prompt for analysis
+        use_cache: Reuse a stored result for the same video content, prompts and model
+        segment_seconds: Split a long local video into segments of this length, analyze
+            them concurrently and merge the results into one timeline (requires ffmpeg)
+        max_parallel_segments: Maximum segments analyzed at once
         
     Returns:
         Dictionary with video analysis results
     """
-    # Validate Nova model limitations
-    if "identify" in text_prompt.lower() or "who is" in text_prompt.lower():
-        return {
-            "status": "error",
-            "content": [{"text": "❌ Nova models cannot identify or name people in videos"}]
-        }
-    
     try:
-        # Get defaults from environment if not provided
-        if not region:
-            region = os.getenv('AWS_REGION', 'us-west-2')
-        
-        if not system_prompt:
-            system_prompt = "Always answer in the same language you are asked. Note: I can only analyze visual content, not audio."
+        job = _prepare(video_path, text_prompt, model_id, region, s3_bucket,
+                       system_prompt, use_cache, segment_seconds)
+        if 'error' in job:
+            return job['error']
         
-        # Initialize Bedrock client
-        session = boto3.Session(region_name=region)
-        bedrock_client = session.client('bedrock-runtime')
-        
-        # Determine video format
-        video_format = _get_video_format(video_path)
-        if not video_format:
-            return {
-                "status": "error",
-                "content": [{"text": "❌ Unsupported video format. Supported: mp4, mov, avi, mkv, webm"}]
-            }
-        
-        # Handle S3 URI or upload local file
-        if video_path.startswith('s3://'):
-            s3_uri = video_path
+        text_response = job['cached_text']
+        details = ""
+        timeline = ""
+        if text_response is not None:
+            s3_uri = video_path if video_path.startswith('s3://') else "not needed (cached result)"
+        elif segment_seconds:
+            text_response, timeline, details, failed = _analyze_segmented(
+                video_path, text_prompt, model_id, job['region'], job['s3_bucket'],
+                job['system_prompt'], segment_seconds, max_parallel_segments
+            )
+            s3_uri = f"s3://{job['s3_bucket']}/videos/ (one object per segment)"
+            
+            # A timeline with gaps is not reused; the next call retries the failed segments
+            store_result(job, text_response, f"{failed} segment(s) failed" if failed else None)
         else:
-            # Upload local file to S3
-            if not s3_bucket:
-                s3_bucket = os.getenv('VIDEO_READER_S3_BUCKET', 'strands-agents-samples-bucket')
+            resolved = _resolve_s3_uri(video_path, job)
+            if not resolved:
+                return error_result("Failed to upload video to S3")
+            s3_uri, details = resolved
+            
+            # Shared Bedrock client (reused across calls and threads)
+            bedrock_client = get_client('bedrock-runtime', job['region'])
+            response = bedrock_client.converse(
+                modelId=model_id,
+                messages=[{"role": "user", "content": _video_content(text_prompt, job['video_format'], s3_uri)}],
+                system=[{"text": job['system_prompt']}]
+            )
             
-            s3_uri = _upload_to_s3(video_path, s3_bucket, session)
-            if not s3_uri:
-                return {
-                    "status": "error", 
-                    "content": [{"text": "❌ Failed to upload video to S3"}]
-                }
+            text_response = response['output']['message']['content'][0]['text']
+            store_result(job, text_response, truncated(response.get('stopReason')))
         
-        # Prepare message for Converse API
-        media_content = {
-            'video': {
-                "format": video_format,
-                "source": {
-                    's3Location': {
-                        'uri': s3_uri
-                    }
-                }
-            }
-        }
+        return format_result(job, text_response, model_id, video_path, f"- S3 URI: {s3_uri}", details, timeline)
         
-        message = {
-            "role": "user",
-            "content": [
-                {"text": text_prompt},
-                media_content
-            ]
-        }
+    except ClientError as e:
+        return error_result(f"AWS Error: {e.response['Error']['Message']}")
+    except Exception as e:
+        return error_result(f"Error processing video: {str(e)}")
+
+
+@tool
+async def video_reader_stream(
+    video_path: str,
+    text_prompt: str = "Describe what you see in this video",
+    model_id: str = "us.amazon.nova-pro-v1:0",
+    region: Optional[str] = None,
+    s3_bucket: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    use_cache: bool = True
+) -> AsyncGenerator[Any, None]:
+    """
+    Streaming variant of video_reader: yields the analysis as it is generated.
+    
+    Uses Bedrock's ConverseStream API, so the first words of the analysis
+    arrive seconds before the full answer is ready. Time-to-first-token and
+    token usage are reported in the Technical Details. Same model limitations
+    as video_reader; segmented analysis is not available in streaming mode.
+    
+    Args:
+        video_path: Path to video file (local path or S3 URI like s3://bucket/video.mp4)
+        text_prompt: Question or instruction for analyzing the video
+        model_id: Bedrock model ID to use for analysis
+        region: AWS region for Bedrock client
+        s3_bucket: S3 bucket name for uploading local videos
+        system_prompt: Custom system prompt for analysis
+        use_cache: Reuse a stored result for the same video content, prompts and model
         
-        # Call Bedrock Converse API
-        response = bedrock_client.converse(
-            modelId=model_id,
-            messages=[message],
-            system=[{"text": system_prompt}]
+    Returns:
+        Streams text deltas, then a dictionary with the full video analysis results
+    """
+    try:
+        # Hashing, HEAD and upload are blocking; keep them off the event loop
+        job = await asyncio.to_thread(
+            _prepare, video_path, text_prompt, model_id, region, s3_bucket, system_prompt, use_cache
         )
+        if 'error' in job:
+            yield job['error']
+            return
         
-        # Extract response content
-        text_response = response['output']['message']['content'][0]['text']
-        
-        # Format detailed response with metadata in the text content
-        detailed_response = f"""🎥 Video Analysis Results:
-
-**Analysis:** {text_response}
-
----
-**Technical Details:**
-- Model Used: {model_id}
-- Region: {region}
-- Video Path: {video_path}
-- S3 URI: {s3_uri}
-"""
+        text_response = job['cached_text']
+        details = ""
+        if text_response is not None:
+            s3_uri = video_path if video_path.startswith('s3://') else "not needed (cached result)"
+            yield text_response
+        else:
+            resolved = await asyncio.to_thread(_resolve_s3_uri, video_path, job)
+            if not resolved:
+                yield error_result("Failed to upload video to S3")
+                return
+            s3_uri, details = resolved
+            
+            chunks = []
+            metrics = {}
+            bedrock_client = get_client('bedrock-runtime', job['region'])
+            content = _video_content(text_prompt, job['video_format'], s3_uri)
+            async for kind, value in aconverse_stream_events(bedrock_client, model_id, job['system_prompt'], content):
+                if kind == 'delta':
+                    chunks.append(value)
+                    yield value
+                else:
+                    metrics = value
+            
+            text_response = ''.join(chunks)
+            details += format_stream_details(metrics) + "\n"
+            store_result(job, text_response, truncated(metrics.get('stop_reason')))
         
-        return {
-            "status": "success",
-            "content": [{"text": detailed_response}]
-        }
+        yield format_result(job, text_response, model_id, video_path, f"- S3 URI: {s3_uri}", details)
         
     except ClientError as e:
-        return {
-            "status": "error",
-            "content": [{"text": f"❌ AWS Error: {e.response['Error']['Message']}"}]
-        }
+        yield error_result(f"AWS Error: {e.response['Error']['Message']}")
     except Exception as e:
-        return {
-            "status": "error",
-            "content": [{"text": f"❌ Error processing video: {str(e)}"}]
-        }
+        yield error_result(f"Error processing video: {str(e)}")
 
 
-def _get_video_format(file_path: str) -> Optional[str]:
-    """Get video format from file extension."""
-    formats = {
-        '.mp4': 'mp4', '.mov': 'mov', '.avi': 'avi', 
-        '.mkv': 'mkv', '.webm': 'webm'
-    }
+def _prepare(
+    video_path: str,
+    text_prompt: str,
+    model_id: str,
+    region: Optional[str],
+    s3_bucket: Optional[str],
+    system_prompt: Optional[str],
+    use_cache: bool,
+    segment_seconds: Optional[float] = None
+) -> Dict[str, Any]:
+    """Validate a request, fill in defaults and look up a cached result.
     
-    if file_path.startswith('s3://'):
-        filename = file_path.split('/')[-1]
-    else:
-        filename = os.path.basename(file_path)
+    Returns {'error': tool_result} for a rejected request, otherwise a job
+    (see video_common) that also holds s3_bucket, video_format and
+    content_hash.
+    """
+    rejected = check_request(video_path, text_prompt)
+    if rejected:
+        return {'error': rejected}
     
-    _, ext = os.path.splitext(filename.lower())
-    return formats.get(ext)
+    if segment_seconds and video_path.startswith('s3://'):
+        return {'error': error_result("Segmented analysis needs a local video file")}
+    
+    job = new_job(
+        region, system_prompt,
+        s3_bucket=s3_bucket or os.getenv('VIDEO_READER_S3_BUCKET', 'strands-agents-samples-bucket'),
+        video_format=get_video_format(video_path),
+        # Streamed SHA-256 of local files: cache identity and S3 object key
+        content_hash=None if video_path.startswith('s3://') else file_sha256(video_path),
+    )
+    
+    # A stored result means no upload and no model call
+    if use_cache:
+        content_id = job['content_hash'] or _s3_content_id(video_path, job['region'])
+        if segment_seconds:
+            content_id += f":seg{segment_seconds}"
+        lookup_cache(job, content_id, text_prompt, model_id)
+    return job
 
 
-def _upload_to_s3(local_path: str, bucket: str, session: boto3.Session) -> Optional[str]:
-    """Upload video to S3 and return URI."""
-    try:
-        s3_client = session.client('s3')
+def _resolve_s3_uri(video_path: str, job: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(S3 URI, upload details) for the video, uploading a local file; None if that fails."""
+    if video_path.startswith('s3://'):
+        return video_path, ""
+    
+    upload = _upload_to_s3(video_path, job['s3_bucket'], job['region'], job['content_hash'])
+    if not upload:
+        return None
+    s3_uri, uploaded_bytes = upload
+    
+    details = f"- Uploaded: {uploaded_bytes / MB:.2f}MB"
+    if not uploaded_bytes:
+        details += " (already in S3, upload skipped)"
+    return s3_uri, details + "\n"
+
+
+def _video_content(text_prompt: str, video_format: str, s3_uri: str) -> List[Dict[str, Any]]:
+    """Converse message content: the prompt plus the video by S3 location."""
+    return [
+        {"text": text_prompt},
+        {'video': {"format": video_format, "source": {'s3Location': {'uri': s3_uri}}}}
+    ]
+
+
+def _analyze_segmented(
+    video_path: str,
+    text_prompt: str,
+    model_id: str,
+    region: str,
+    s3_bucket: str,
+    system_prompt: str,
+    segment_seconds: float,
+    max_workers: int
+) -> Tuple[str, str, str, int]:
+    """Analyze a long video segment by segment; returns (text, timeline, details, failed)."""
+    bedrock_client = get_client('bedrock-runtime', region)
+    video_format = get_video_format(video_path)
+    
+    def analyze_segment(segment_path: str, prompt: str) -> str:
+        upload = _upload_to_s3(segment_path, s3_bucket, region)
+        if not upload:
+            raise RuntimeError("Failed to upload segment to S3")
         
-        # Create bucket if needed
+        return converse_text(bedrock_client, model_id, system_prompt, [
+            {"text": prompt},
+            {'video': {"format": video_format, "source": {'s3Location': {'uri': upload[0]}}}}
+        ])
+    
+    def merge(prompt: str) -> str:
+        return converse_text(bedrock_client, model_id, system_prompt, [{"text": prompt}])
+    
+    result = run_segmented_analysis(
+        video_path, segment_seconds, analyze_segment, merge, text_prompt,
+        max_workers=max_workers
+    )
+    timeline, details = format_segment_details(result, segment_seconds, max_workers)
+    return result['text'], f"\n{timeline}\n", details + "\n", result['failed']
+
+
+def _s3_content_id(s3_uri: str, region: str) -> str:
+    """Content identity of an S3 object from its ETag (avoids downloading it)."""
+    bucket, _, key = s3_uri[len('s3://'):].partition('/')
+    etag = get_client('s3', region).head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+    return f"s3etag:{bucket}/{key}:{etag}"
+
+
+def _ensure_bucket(s3_client, bucket: str, region: str) -> None:
+    """Check (or create) the bucket once per process; raises ClientError on failure."""
+    if (region, bucket) in _verified_buckets:
+        return
+    
+    try:
+        s3_client.head_bucket(Bucket=bucket)
+    except ClientError:
         try:
-            s3_client.head_bucket(Bucket=bucket)
-        except ClientError:
+            if region == 'us-east-1':
+                s3_client.create_bucket(Bucket=bucket)
+            else:
+                s3_client.create_bucket(
+                    Bucket=bucket,
+                    CreateBucketConfiguration={'LocationConstraint': region}
+                )
+        except ClientError as e:
+            # Created by a concurrent caller; anything else is a real failure
+            if e.response['Error']['Code'] != 'BucketAlreadyOwnedByYou':
+                raise
+    
+    # Only remembered once the bucket is known to exist
+    _verified_buckets.add((region, bucket))
+
+
+def _upload_to_s3(local_path: str, bucket: str, region: str,
+                  content_hash: Optional[str] = None) -> Optional[Tuple[str, int]]:
+    """Upload video to S3 under a content-hash key and return (URI, bytes uploaded).
+    
+    The key is derived from the file's SHA-256, so the same footage is uploaded
+    once and different files with the same name never overwrite each other.
+    """
+    try:
+        with span("s3.upload", "client", bucket=bucket) as current:
+            s3_client = get_client('s3', region)
+            _ensure_bucket(s3_client, bucket, region)
+            
+            _, ext = os.path.splitext(local_path.lower())
+            s3_key = f"videos/{content_hash or file_sha256(local_path)}{ext}"
+            s3_uri = f"s3://{bucket}/{s3_key}"
+            
+            # Skip the upload when this content is already in the bucket
             try:
-                if session.region_name == 'us-east-1':
-                    s3_client.create_bucket(Bucket=bucket)
-                else:
-                    s3_client.create_bucket(
-                        Bucket=bucket,
-                        CreateBucketConfiguration={'LocationConstraint': session.region_name}
-                    )
-            except ClientError:
-                pass  # Bucket might already exist
-        
-        # Upload file
-        filename = os.path.basename(local_path)
-        s3_key = f"videos/{filename}"
-        s3_client.upload_file(local_path, bucket, s3_key)
-        
-        return f"s3://{bucket}/{s3_key}"
+                s3_client.head_object(Bucket=bucket, Key=s3_key)
+                current.set("s3.uploaded_bytes", 0)
+                return s3_uri, 0
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                    raise
+            
+            s3_client.upload_file(local_path, bucket, s3_key, Config=_TRANSFER_CONFIG)
+            size = os.path.getsize(local_path)
+            current.set("s3.uploaded_bytes", size)
+            return s3_uri, size
         
     except Exception as e:
-        print(f"Upload error: {e}")
+        logger.warning("Upload of %s to s3://%s failed: %s", local_path, bucket, e)
         return None
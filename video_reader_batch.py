@@ -0,0 +1,202 @@
+"""
+Batch Video Reader Tool for Strands Agents
+
+Analyzes a whole folder (or glob, or list) of clips in one tool call instead of
+one agent round-trip per clip. Clips run on a bounded worker pool behind a
+rate limiter, progress is streamed per clip as each finishes, and a JSON
+manifest summarizing every clip is written at the end.
+"""
+import asyncio
+import datetime
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Dict, List, Optional, Union
+
+from strands import tool
+
+from video_common import get_video_format
+from video_reader import video_reader
+from video_reader_local import video_reader_local
+
+
+class RateLimiter:
+    """Async token bucket: at most `rate` starts per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@tool
+async def video_reader_batch(
+    videos: Union[str, List[str]],
+    text_prompt: str = "Describe what you see in this video",
+    model_id: str = "us.amazon.nova-pro-v1:0",
+    region: Optional[str] = None,
+    s3_bucket: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    use_s3: bool = True,
+    max_workers: int = 8,
+    requests_per_second: float = 2.0,
+    manifest_path: Optional[str] = None
+) -> AsyncGenerator[Any, None]:
+    """
+    Analyze many videos with AWS Bedrock in one call, streaming results per clip.
+
+    Each clip is analyzed exactly like the single-video tools (video_reader, or
+    video_reader_local when use_s3 is False), including their result cache and
+    S3 upload dedup. See those tools for the Amazon Nova model limitations.
+
+    Args:
+        videos: Directory, glob pattern (e.g. "clips/**/*.mp4"), comma-separated
+            paths, or a list of any of these; S3 URIs are accepted with use_s3
+        text_prompt: Question or instruction applied to every video
+        model_id: Bedrock model ID to use for analysis
+        region: AWS region for Bedrock client
+        s3_bucket: S3 bucket name for uploading local videos
+        system_prompt: Custom system prompt for analysis
+        use_s3: Upload via S3 (video_reader) instead of inline bytes (video_reader_local)
+        max_workers: Maximum clips processed at once
+        requests_per_second: Maximum clip starts per second (0 disables the limit),
+            keep this at or below your Bedrock quota
+        manifest_path: Where to write the JSON manifest
+            (default: video_batch_<timestamp>.json in the current directory)
+
+    Returns:
+        Streams one progress line per finished clip, then a dictionary with the
+        batch summary and manifest path
+    """
+    paths = _expand_videos(videos)
+    if not paths:
+        yield {
+            "status": "error",
+            "content": [{"text": f"❌ No supported videos found for: {videos}"}]
+        }
+        return
+
+    if not manifest_path:
+        stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        manifest_path = f"video_batch_{stamp}.json"
+
+    reader_kwargs = {
+        "text_prompt": text_prompt,
+        "model_id": model_id,
+        "region": region,
+        "system_prompt": system_prompt,
+    }
+    if use_s3:
+        reader, reader_kwargs["s3_bucket"] = video_reader, s3_bucket
+    else:
+        reader = video_reader_local
+
+    limiter = RateLimiter(requests_per_second, burst=max_workers)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="video-batch")
+    loop = asyncio.get_running_loop()
+    started = time.time()
+
+    async def run_clip(path: str) -> Dict[str, Any]:
+        await limiter.acquire()
+        clip_started = time.time()
+        try:
+            result = await loop.run_in_executor(
+                executor, lambda: reader(video_path=path, **reader_kwargs)
+            )
+        except Exception as e:
+            result = {"status": "error", "content": [{"text": f"❌ Error processing video: {e}"}]}
+
+        text = result["content"][0]["text"]
+        return {
+            "video": path,
+            "status": result["status"],
+            "elapsed_s": round(time.time() - clip_started, 2),
+            "cache_hit": "Cache: HIT" in text,
+            "result": text,
+        }
+
+    clips = []
+    try:
+        # The executor bounds concurrency; as_completed streams clips as they finish
+        for done in asyncio.as_completed([run_clip(path) for path in paths]):
+            clip = await done
+            clips.append(clip)
+            mark = "✅" if clip["status"] == "success" else "❌"
+            cached = ", cached" if clip["cache_hit"] else ""
+            yield f"[{len(clips)}/{len(paths)}] {mark} {clip['video']} ({clip['elapsed_s']}s{cached})"
+    finally:
+        # A cancelled or failed batch must not keep starting queued clips
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    order = {path: i for i, path in enumerate(paths)}
+    succeeded = sum(1 for c in clips if c["status"] == "success")
+    elapsed = time.time() - started
+    manifest = {
+        "generated_at": datetime.datetime.now().isoformat(),
+        "text_prompt": text_prompt,
+        "model_id": model_id,
+        "total": len(clips),
+        "succeeded": succeeded,
+        "failed": len(clips) - succeeded,
+        "cache_hits": sum(1 for c in clips if c["cache_hit"]),
+        "elapsed_s": round(elapsed, 2),
+        "clips_per_minute": round(len(clips) / elapsed * 60, 1) if elapsed else None,
+        "clips": sorted(clips, key=lambda c: order[c["video"]]),
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    yield {
+        "status": "success" if succeeded else "error",
+        "content": [{"text": f"""🎥 Batch Video Analysis Complete:
+
+- Videos: {len(clips)} ({succeeded} succeeded, {len(clips) - succeeded} failed, {manifest['cache_hits']} cached)
+- Elapsed: {elapsed:.1f}s ({manifest['clips_per_minute']} clips/min)
+- Workers: {max_workers}, rate limit: {requests_per_second}/s
+- Manifest: {manifest_path}
+"""}]
+    }
+
+
+def _expand_videos(videos: Union[str, List[str]]) -> List[str]:
+    """Resolve directories, globs, comma-separated strings and lists to video paths."""
+    if isinstance(videos, (list, tuple)):
+        items = list(videos)
+    elif ',' in videos and not os.path.exists(videos):
+        items = [v.strip() for v in videos.split(',') if v.strip()]
+    else:
+        items = [videos]
+
+    paths, seen = [], set()
+    for item in items:
+        if item.startswith('s3://'):
+            candidates = [item]
+        elif os.path.isdir(item):
+            candidates = sorted(os.path.join(item, name) for name in os.listdir(item))
+        elif any(ch in item for ch in '*?['):
+            candidates = sorted(glob.glob(item, recursive=True))
+        else:
+            candidates = [item]
+
+        for path in candidates:
+            if get_video_format(path) and path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
@@ -4,11 +4,21 @@ Video Reader Tool for Strands Agents - Local Version (No S3 Required)
 This version processes videos locally by sending the video bytes directly to Bedrock,
 eliminating the need for S3 bucket configuration and uploads.
 """
-import boto3
+import asyncio
 import os
 from botocore.exceptions import ClientError
-from typing import Dict, Any, Optional
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
 from strands import tool
+from aws_clients import get_client
+from bedrock_stream import aconverse_stream_events, format_stream_details
+from video_cache import MB, file_sha256
+from video_common import (check_request, error_result, format_result, get_video_format,
+                          lookup_cache, new_job, store_result, truncated)
+from video_preprocess import fit_to_size
+from video_segments import converse_text, format_segment_details, run_segmented_analysis
+
+# Bedrock limit for inline video bytes
+MAX_INLINE_BYTES = 20 * MB
 
 
 @tool
@@ -17,7 +27,12 @@ def video_reader_local(
     text_prompt: str = "Describe what you see in this video",
     model_id: str = "us.amazon.nova-pro-v1:0",
     region: Optional[str] = None,
-    system_prompt: Optional[str] = None
+    system_prompt: Optional[str] = None,
+    use_cache: bool = True,
+    preprocess: bool = True,
+    max_duration_s: Optional[float] = None,
+    segment_seconds: Optional[float] = None,
+    max_parallel_segments: int = 4
 ) -> Dict[str, Any]:
     """
     Analyze video content using AWS Bedrock's multimodal capabilities.
@@ -41,7 +56,9 @@ def video_reader_local(
     
     TECHNICAL LIMITATIONS (Local Processing):
     - Maximum video size: ~20MB (Bedrock API limit for inline bytes)
-    - For larger videos, use the S3-based version (video_reader.py)
+    - Larger videos are downscaled (resolution, frame rate) and trimmed with
+      ffmpeg to fit, when ffmpeg is installed; otherwise use the S3-based
+      version (video_reader.py)
     - Video must be in a supported format: mp4, mov, avi, mkv, webm
     
     Args:
@@ -50,6 +67,12 @@ def video_reader_local(
         model_id: Bedrock model ID to use for analysis (default: us.amazon.nova-pro-v1:0)
         region: AWS region for Bedrock client (default: from AWS_REGION env or us-west-2)
         system_prompt: Custom system prompt for analysis (optional)
+        use_cache: Reuse a stored result for the same video content, prompts and model (default: True)
+        preprocess: Transcode videos over the inline limit to fit it instead of rejecting them (default: True)
+        max_duration_s: Only analyze the first N seconds of the video (optional)
+        segment_seconds: Split long videos into segments of this length, analyze them
+            concurrently and merge the results into one timeline (requires ffmpeg)
+        max_parallel_segments: Maximum segments analyzed at once (default: 4)
         
     Returns:
         Dictionary with video analysis results containing:
@@ -63,121 +86,276 @@ def video_reader_local(
         ... )
         >>> print(result['content'][0]['text'])
     """
-    # Validate Nova model limitations
-    if "identify" in text_prompt.lower() or "who is" in text_prompt.lower():
-        return {
-            "status": "error",
-            "content": [{"text": "❌ Nova models cannot identify or name people in videos"}]
-        }
-    
     try:
-        # Get defaults from environment if not provided
-        if not region:
-            region = os.getenv('AWS_REGION', 'us-west-2')
-        
-        if not system_prompt:
-            system_prompt = "Always answer in the same language you are asked. Note: I can only analyze visual content, not audio."
-        
-        # Validate file exists
-        if not os.path.exists(video_path):
-            return {
-                "status": "error",
-                "content": [{"text": f"❌ Video file not found: {video_path}"}]
-            }
-        
-        # Determine video format
-        video_format = _get_video_format(video_path)
-        if not video_format:
-            return {
-                "status": "error",
-                "content": [{"text": "❌ Unsupported video format. Supported: mp4, mov, avi, mkv, webm"}]
-            }
-        
-        # Read video file and encode to base64
-        with open(video_path, 'rb') as video_file:
-            video_bytes = video_file.read()
+        job = _prepare(video_path, text_prompt, model_id, region, system_prompt,
+                       use_cache, preprocess, max_duration_s, segment_seconds)
+        if 'error' in job:
+            return job['error']
         
-        # Check file size (Bedrock has limits, typically ~20MB for videos)
-        file_size_mb = len(video_bytes) / (1024 * 1024)
-        if file_size_mb > 20:
-            return {
-                "status": "error",
-                "content": [{"text": f"❌ Video file too large ({file_size_mb:.1f}MB). Maximum size is ~20MB. Consider compressing the video."}]
-            }
+        text_response = job['cached_text']
+        preprocess_details = "- Preprocessing: none"
+        timeline = ""
+        if text_response is None and segment_seconds:
+            text_response, timeline, preprocess_details, failed = _analyze_segmented(
+                video_path, text_prompt, model_id, job['region'], job['system_prompt'],
+                segment_seconds, max_parallel_segments
+            )
+            
+            # A timeline with gaps is not reused; the next call retries the failed segments
+            store_result(job, text_response, f"{failed} segment(s) failed" if failed else None)
         
-        # Initialize Bedrock client
-        session = boto3.Session(region_name=region)
-        bedrock_client = session.client('bedrock-runtime')
+        elif text_response is None:
+            loaded = _load_video_bytes(video_path, job['video_format'], job['needs_preprocessing'], max_duration_s)
+            if not loaded:
+                return _too_large_error(job)
+            video_bytes, video_format, preprocess_details = loaded
+            
+            # Shared Bedrock client (reused across calls and threads)
+            bedrock_client = get_client('bedrock-runtime', job['region'])
+            response = bedrock_client.converse(
+                modelId=model_id,
+                messages=[{"role": "user", "content": _video_content(text_prompt, video_format, video_bytes)}],
+                system=[{"text": job['system_prompt']}]
+            )
+            
+            text_response = response['output']['message']['content'][0]['text']
+            store_result(job, text_response, truncated(response.get('stopReason')))
         
-        # Prepare message for Converse API with inline video data
-        media_content = {
-            'video': {
-                "format": video_format,
-                "source": {
-                    'bytes': video_bytes
-                }
-            }
-        }
+        return format_result(job, text_response, model_id, video_path, _source(job), preprocess_details + "\n", timeline)
         
-        message = {
-            "role": "user",
-            "content": [
-                {"text": text_prompt},
-                media_content
-            ]
-        }
+    except ClientError as e:
+        return error_result(f"AWS Error: {e.response['Error']['Message']}")
+    except Exception as e:
+        return error_result(f"Error processing video: {str(e)}")
+
+
+@tool
+async def video_reader_local_stream(
+    video_path: str,
+    text_prompt: str = "Describe what you see in this video",
+    model_id: str = "us.amazon.nova-pro-v1:0",
+    region: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    use_cache: bool = True,
+    preprocess: bool = True,
+    max_duration_s: Optional[float] = None
+) -> AsyncGenerator[Any, None]:
+    """
+    Streaming variant of video_reader_local: yields the analysis as it is generated.
+    
+    Uses Bedrock's ConverseStream API with inline video bytes, so the first
+    words of the analysis arrive seconds before the full answer is ready.
+    Time-to-first-token and token usage are reported in the Technical Details.
+    Same model and size limitations as video_reader_local; segmented analysis
+    is not available in streaming mode.
+    
+    Args:
+        video_path: Path to local video file (must exist on filesystem)
+        text_prompt: Question or instruction for analyzing the video
+        model_id: Bedrock model ID to use for analysis (default: us.amazon.nova-pro-v1:0)
+        region: AWS region for Bedrock client (default: from AWS_REGION env or us-west-2)
+        system_prompt: Custom system prompt for analysis (optional)
+        use_cache: Reuse a stored result for the same video content, prompts and model (default: True)
+        preprocess: Transcode videos over the inline limit to fit it instead of rejecting them (default: True)
+        max_duration_s: Only analyze the first N seconds of the video (optional)
         
-        # Call Bedrock Converse API
-        response = bedrock_client.converse(
-            modelId=model_id,
-            messages=[message],
-            system=[{"text": system_prompt}]
+    Returns:
+        Streams text deltas, then a dictionary with the full video analysis results
+    """
+    try:
+        # Hashing and transcoding are blocking; keep them off the event loop
+        job = await asyncio.to_thread(
+            _prepare, video_path, text_prompt, model_id, region, system_prompt,
+            use_cache, preprocess, max_duration_s
         )
+        if 'error' in job:
+            yield job['error']
+            return
         
-        # Extract response content
-        text_response = response['output']['message']['content'][0]['text']
+        text_response = job['cached_text']
+        details = "- Preprocessing: none\n"
+        if text_response is not None:
+            yield text_response
+        else:
+            loaded = await asyncio.to_thread(
+                _load_video_bytes, video_path, job['video_format'], job['needs_preprocessing'], max_duration_s
+            )
+            if not loaded:
+                yield _too_large_error(job)
+                return
+            video_bytes, video_format, preprocess_details = loaded
+            
+            chunks = []
+            metrics = {}
+            bedrock_client = get_client('bedrock-runtime', job['region'])
+            content = _video_content(text_prompt, video_format, video_bytes)
+            async for kind, value in aconverse_stream_events(bedrock_client, model_id, job['system_prompt'], content):
+                if kind == 'delta':
+                    chunks.append(value)
+                    yield value
+                else:
+                    metrics = value
+            
+            text_response = ''.join(chunks)
+            details = f"{preprocess_details}\n{format_stream_details(metrics)}\n"
+            store_result(job, text_response, truncated(metrics.get('stop_reason')))
         
-        # Format detailed response with metadata in the text content
-        detailed_response = f"""🎥 Video Analysis Results:
-
-**Analysis:** {text_response}
-
----
-**Technical Details:**
-- Model Used: {model_id}
-- Region: {region}
-- Video Path: {video_path}
-- File Size: {file_size_mb:.2f}MB
-- Processing: Local (no S3 upload)
-"""
-        
-        return {
-            "status": "success",
-            "content": [{"text": detailed_response}]
-        }
+        yield format_result(job, text_response, model_id, video_path, _source(job), details)
         
     except ClientError as e:
-        return {
-            "status": "error",
-            "content": [{"text": f"❌ AWS Error: {e.response['Error']['Message']}"}]
-        }
+        yield error_result(f"AWS Error: {e.response['Error']['Message']}")
     except Exception as e:
-        return {
-            "status": "error",
-            "content": [{"text": f"❌ Error processing video: {str(e)}"}]
-        }
-
-
-def _get_video_format(file_path: str) -> Optional[str]:
-    """Get video format from file extension."""
-    formats = {
-        '.mp4': 'mp4', 
-        '.mov': 'mov', 
-        '.avi': 'avi', 
-        '.mkv': 'mkv', 
-        '.webm': 'webm'
-    }
-    
-    filename = os.path.basename(file_path)
-    _, ext = os.path.splitext(filename.lower())
-    return formats.get(ext)
+        yield error_result(f"Error processing video: {str(e)}")
+
+
+def _too_large_error(job: Dict[str, Any]) -> Dict[str, Any]:
+    return error_result(
+        f"Video file too large ({job['file_size_mb']:.1f}MB) and could not be transcoded "
+        "to fit ~20MB. Install ffmpeg or compress the video."
+    )
+
+
+def _prepare(
+    video_path: str,
+    text_prompt: str,
+    model_id: str,
+    region: Optional[str],
+    system_prompt: Optional[str],
+    use_cache: bool,
+    preprocess: bool,
+    max_duration_s: Optional[float],
+    segment_seconds: Optional[float] = None
+) -> Dict[str, Any]:
+    """Validate a request, fill in defaults and look up a cached result.
+    
+    Returns {'error': tool_result} for a rejected request, otherwise a job
+    (see video_common) that also holds video_format, file_size_mb and
+    needs_preprocessing.
+    """
+    if not os.path.exists(video_path):
+        return {'error': error_result(f"Video file not found: {video_path}")}
+    
+    rejected = check_request(video_path, text_prompt)
+    if rejected:
+        return {'error': rejected}
+    
+    # Size check from file metadata; nothing is read into memory yet
+    file_size = os.path.getsize(video_path)
+    file_size_mb = file_size / MB
+    if file_size > MAX_INLINE_BYTES and not preprocess and not segment_seconds:
+        return {'error': error_result(
+            f"Video file too large ({file_size_mb:.1f}MB). Maximum size is ~20MB. Consider compressing the video."
+        )}
+    
+    job = new_job(
+        region, system_prompt,
+        video_format=get_video_format(video_path),
+        file_size_mb=file_size_mb,
+        needs_preprocessing=bool(
+            preprocess and not segment_seconds
+            and (file_size > MAX_INLINE_BYTES or max_duration_s is not None)
+        ),
+    )
+    
+    # A stored result means the video is never read and the model is not called
+    if use_cache:
+        content_id = file_sha256(video_path)
+        if segment_seconds:
+            content_id += f":seg{segment_seconds}"
+        elif job['needs_preprocessing']:
+            # The model sees the transcoded clip, which depends on these settings
+            content_id += f":fit{MAX_INLINE_BYTES}:{max_duration_s}"
+        lookup_cache(job, content_id, text_prompt, model_id)
+    return job
+
+
+def _video_content(text_prompt: str, video_format: str, video_bytes: bytes) -> List[Dict[str, Any]]:
+    """Converse message content: the prompt plus the inline video bytes."""
+    return [
+        {"text": text_prompt},
+        {'video': {"format": video_format, "source": {'bytes': video_bytes}}}
+    ]
+
+
+def _source(job: Dict[str, Any]) -> str:
+    """Technical Details lines for a video sent inline."""
+    return f"- File Size: {job['file_size_mb']:.2f}MB\n- Processing: Local (no S3 upload)"
+
+
+def _load_video_bytes(
+    video_path: str,
+    video_format: str,
+    needs_preprocessing: bool,
+    max_duration_s: Optional[float]
+) -> Optional[Tuple[bytes, str, str]]:
+    """Read the video for inline upload, transcoding it first when needed.
+    
+    Returns (video_bytes, video_format, preprocess_details), or None when the
+    video could not be transcoded to fit the inline limit.
+    """
+    if not needs_preprocessing:
+        with open(video_path, 'rb') as video_file:
+            return video_file.read(), video_format, "- Preprocessing: none"
+    
+    fitted = fit_to_size(video_path, MAX_INLINE_BYTES, max_duration_s)
+    if not fitted:
+        return None
+    
+    fitted_path, info = fitted
+    try:
+        with open(fitted_path, 'rb') as video_file:
+            video_bytes = video_file.read()
+    finally:
+        os.remove(fitted_path)
+    
+    encoding = "stream copy" if info['stream_copy'] else f"{info['height']}p @ {info['fps']}fps"
+    details = (
+        f"- Preprocessing: {encoding}, "
+        f"{info['duration_s']}s of {info['source_duration_s']}s, "
+        f"{info['size_bytes'] / MB:.2f}MB sent"
+    )
+    return video_bytes, 'mp4', details
+
+
+def _analyze_segmented(
+    video_path: str,
+    text_prompt: str,
+    model_id: str,
+    region: str,
+    system_prompt: str,
+    segment_seconds: float,
+    max_workers: int
+) -> Tuple[str, str, str, int]:
+    """Analyze a long video segment by segment; returns (text, timeline, details, failed)."""
+    bedrock_client = get_client('bedrock-runtime', region)
+    source_format = get_video_format(video_path)
+    
+    def analyze_segment(segment_path: str, prompt: str) -> str:
+        payload_path, video_format, fitted = segment_path, source_format, None
+        if os.path.getsize(segment_path) > MAX_INLINE_BYTES:
+            fitted = fit_to_size(segment_path, MAX_INLINE_BYTES)
+            if not fitted:
+                raise ValueError("Segment exceeds the inline limit and could not be transcoded")
+            payload_path, video_format = fitted[0], 'mp4'
+        
+        try:
+            with open(payload_path, 'rb') as video_file:
+                video_bytes = video_file.read()
+        finally:
+            if fitted:
+                os.remove(fitted[0])
+        
+        return converse_text(bedrock_client, model_id, system_prompt, [
+            {"text": prompt},
+            {'video': {"format": video_format, "source": {'bytes': video_bytes}}}
+        ])
+    
+    def merge(prompt: str) -> str:
+        return converse_text(bedrock_client, model_id, system_prompt, [{"text": prompt}])
+    
+    result = run_segmented_analysis(
+        video_path, segment_seconds, analyze_segment, merge, text_prompt,
+        max_workers=max_workers
+    )
+    timeline, details = format_segment_details(result, segment_seconds, max_workers)
+    return result['text'], f"\n{timeline}\n", details, result['failed']
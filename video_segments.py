@@ -0,0 +1,178 @@
+"""
+Segmented long-video analysis for the video reader tools.
+
+A long video is split into fixed-length time segments (one ffmpeg pass,
+stream copy, no re-encode), each segment is analyzed concurrently with
+bounded parallelism and per-segment retries, and a final text-only Converse
+call merges the segment summaries into one timeline. Latency then scales
+with segment length instead of total length, and a failure only costs a
+retry of that one segment.
+"""
+import csv
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from video_preprocess import ffmpeg_available
+
+
+def split_video(video_path: str, segment_seconds: float, out_dir: str) -> List[Tuple[str, float, float]]:
+    """Split a video into segments; returns [(path, start_s, end_s), ...]."""
+    _, ext = os.path.splitext(video_path.lower())
+    list_path = os.path.join(out_dir, 'segments.csv')
+    subprocess.run(
+        [
+            'ffmpeg', '-y', '-v', 'error',
+            '-i', video_path,
+            '-map', '0:v:0', '-an', '-c', 'copy',
+            '-f', 'segment',
+            '-segment_time', str(segment_seconds),
+            '-reset_timestamps', '1',
+            '-segment_list', list_path,
+            '-segment_list_type', 'csv',
+            os.path.join(out_dir, f'segment_%04d{ext}'),
+        ],
+        capture_output=True, timeout=600, check=True
+    )
+
+    with open(list_path, newline='') as f:
+        return [
+            (os.path.join(out_dir, name), float(start), float(end))
+            for name, start, end in csv.reader(f)
+        ]
+
+
+def converse_text(client, model_id: str, system_prompt: str, content: List[Dict[str, Any]]) -> str:
+    """One Converse call; returns the first text block of the reply."""
+    response = client.converse(
+        modelId=model_id,
+        messages=[{"role": "user", "content": content}],
+        system=[{"text": system_prompt}]
+    )
+    return response['output']['message']['content'][0]['text']
+
+
+def segment_prompt(text_prompt: str, index: int, total: int, start: float, end: float) -> str:
+    """Per-segment prompt that tells the model where the clip sits in the video."""
+    return (
+        f"{text_prompt}\n\n"
+        f"This clip is segment {index + 1} of {total} of a longer video, "
+        f"covering {format_timestamp(start)}-{format_timestamp(end)}. "
+        f"Describe only what happens in this clip."
+    )
+
+
+def merge_prompt(text_prompt: str, results: List[Dict[str, Any]]) -> str:
+    """Reduce prompt that merges segment summaries into one timeline."""
+    lines = [
+        f"A video was analyzed in {len(results)} consecutive segments for this request: {text_prompt}",
+        "",
+        "Segment summaries:",
+    ]
+    for r in results:
+        summary = r['text'] if r['text'] is not None else f"(analysis failed: {r['error']})"
+        lines.append(f"[{format_timestamp(r['start'])}-{format_timestamp(r['end'])}] {summary}")
+    lines += [
+        "",
+        "Merge these into one answer for the whole video with a concise timeline. "
+        "Do not invent details for failed segments.",
+    ]
+    return "\n".join(lines)
+
+
+def run_segmented_analysis(
+    video_path: str,
+    segment_seconds: float,
+    analyze_segment: Callable[[str, str], str],
+    merge: Callable[[str], str],
+    text_prompt: str,
+    max_workers: int = 4,
+    retries: int = 2,
+    backoff_s: float = 1.0
+) -> Dict[str, Any]:
+    """
+    Split, analyze segments concurrently, then merge.
+
+    Args:
+        analyze_segment: callable(segment_path, prompt) -> text for one segment
+        merge: callable(prompt) -> text for the final reduce call (retried like segments)
+
+    Returns:
+        Dictionary with the merged text, per-segment results and timings
+    """
+    if not ffmpeg_available():
+        raise RuntimeError("Segmented analysis requires ffmpeg and ffprobe on PATH")
+
+    started = time.time()
+    with tempfile.TemporaryDirectory(prefix='video_segments_') as out_dir:
+        segments = split_video(video_path, segment_seconds, out_dir)
+        total = len(segments)
+
+        def run_one(index: int) -> Dict[str, Any]:
+            path, start, end = segments[index]
+            prompt = segment_prompt(text_prompt, index, total, start, end)
+            result = {'index': index, 'start': start, 'end': end, 'text': None, 'error': None, 'attempts': 0}
+            for attempt in range(retries + 1):
+                result['attempts'] = attempt + 1
+                try:
+                    result['text'] = analyze_segment(path, prompt)
+                    result['error'] = None
+                    break
+                except Exception as e:
+                    result['error'] = str(e)
+                    if attempt < retries:
+                        time.sleep(backoff_s * (2 ** attempt))
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            results = list(pool.map(run_one, range(total)))
+
+    if all(r['text'] is None for r in results):
+        raise RuntimeError(f"All {total} segments failed: {results[0]['error'] if results else 'no segments'}")
+
+    prompt = merge_prompt(text_prompt, results)
+    for attempt in range(retries + 1):
+        try:
+            merged = merge(prompt)
+            break
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff_s * (2 ** attempt))
+    return {
+        'text': merged,
+        'segments': results,
+        'failed': sum(1 for r in results if r['text'] is None),
+        'retried': sum(1 for r in results if r['attempts'] > 1),
+        'elapsed_s': time.time() - started,
+    }
+
+
+def format_timestamp(seconds: float) -> str:
+    """Seconds as MM:SS (or H:MM:SS for long videos)."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def format_segment_details(result: Dict[str, Any], segment_seconds: float, max_workers: int) -> Tuple[str, str]:
+    """Timeline preview and Technical Details lines for a segmented run."""
+    lines = ["**Segment Timeline:**"]
+    for r in result['segments']:
+        text = r['text'] if r['text'] is not None else f"(failed: {r['error']})"
+        preview = text[:150] + ("..." if len(text) > 150 else "")
+        lines.append(f"- {format_timestamp(r['start'])}-{format_timestamp(r['end'])}: {preview}")
+    timeline = "\n".join(lines)
+
+    details = (
+        f"- Segments: {len(result['segments'])} x {segment_seconds}s "
+        f"({max_workers} in parallel), {result['retried']} retried, {result['failed']} failed\n"
+        f"- Elapsed: {result['elapsed_s']:.1f}s"
+    )
+    return timeline, details